@@ -0,0 +1,110 @@
+"""
+Event bus
+
+- TopicStats
+- EventBus
+
+Handlers are kept in a table per topic, so publishing an event calls the
+handlers for that topic only, found with one dict lookup, instead of every
+subscriber testing what against a chain of ifs. A Publisher attached to a
+bus (see Publisher.attach) publishes every changed() call on it.
+
+Inside transaction() events are held rather than handled. When the
+outermost transaction ends, repeats are dropped and each topic is handled
+once: handlers subscribed with batch=True get the list of everything
+published on the topic, the others get each of them in turn. Passing
+deliver hands the held events to it instead, to be given to deliver()
+later.
+
+Every topic counts its events and the time spent in its handlers.
+"""
+
+import time
+from contextlib import contextmanager
+
+
+class TopicStats:
+    __slots__ = ('dispatches', 'events', 'total', 'worst')
+
+    def __init__(self):
+        self.dispatches = 0
+        self.events = 0
+        self.total = 0.0
+        self.worst = 0.0
+
+    def add(self, seconds, events):
+        self.dispatches += 1
+        self.events += events
+        self.total += seconds
+        if seconds > self.worst:
+            self.worst = seconds
+
+class EventBus:
+    def __init__(self, name):
+        self.name = name
+        self.handlers = {}
+        self.batch_handlers = {}
+        # events held by a transaction, in order
+        self.held = None
+        self.stats = {}
+        self.trace = False
+
+    def __repr__(self):
+        lines = ["<EventBus %s topics:%s>" % (self.name, len(self.stats))]
+        for topic, stats in sorted(self.stats.items(), key=lambda item: -item[1].total):
+            lines.append("  %-16s %7d events %7d dispatches %9.3fms total %7.3fms worst" % (
+                topic, stats.events, stats.dispatches, 1000 * stats.total, 1000 * stats.worst))
+        return '\n'.join(lines)
+
+    def subscribe(self, topic, handler, batch=False):
+        table = self.batch_handlers if batch else self.handlers
+        table.setdefault(topic, []).append(handler)
+
+    def unsubscribe(self, topic, handler):
+        for table in (self.handlers, self.batch_handlers):
+            if handler in table.get(topic, ()):
+                table[topic].remove(handler)
+
+    def publish(self, topic, etc=None):
+        if self.held is not None:
+            if (topic, etc) not in self.held:
+                self.held.append((topic, etc))
+            return
+        self.handle(topic, [etc])
+
+    def handle(self, topic, etcs):
+        if self.trace:
+            print("begin", self.name, topic, etcs)
+        start = time.perf_counter()
+        for handler in self.batch_handlers.get(topic, ()):
+            handler(etcs)
+        for handler in self.handlers.get(topic, ()):
+            for etc in etcs:
+                handler(etc)
+        stats = self.stats.get(topic)
+        if stats is None:
+            stats = self.stats[topic] = TopicStats()
+        stats.add(time.perf_counter() - start, len(etcs))
+        if self.trace:
+            print("end", self.name, topic)
+
+    def deliver(self, events):
+        # each topic once, in the order topics first came up
+        topics = {}
+        for topic, etc in events:
+            topics.setdefault(topic, []).append(etc)
+        for topic, etcs in topics.items():
+            self.handle(topic, etcs)
+
+    @contextmanager
+    def transaction(self, deliver=None):
+        if self.held is not None:
+            # nested: the outermost transaction handles everything
+            yield
+            return
+        self.held = []
+        try:
+            yield
+        finally:
+            events, self.held = self.held, None
+            (deliver or self.deliver)(events)
@@ -0,0 +1,59 @@
+"""
+Latency histogram
+
+- LatencyHistogram
+
+Records durations into power-of-two microsecond buckets, so recording is
+cheap enough to do on every GO or MIDI note, and reports percentiles.
+"""
+
+import math
+
+
+class LatencyHistogram:
+    def __init__(self, name, buckets=24):
+        self.name = name
+        # bucket i holds samples under 2**i microseconds
+        self.counts = [0] * buckets
+        self.count = 0
+        self.total = 0.0
+        self.worst = 0.0
+        self.last = 0.0
+
+    def __repr__(self):
+        if self.count == 0:
+            return "<LatencyHistogram %s: no samples>" % self.name
+        return "<LatencyHistogram %s: n:%d mean:%.3fms median:<%.3fms 99th:<%.3fms worst:%.3fms>" % (
+            self.name, self.count, 1000 * self.total / self.count,
+            1000 * self.percentile(50), 1000 * self.percentile(99), 1000 * self.worst)
+
+    def record(self, seconds):
+        micros = seconds * 1e6
+        bucket = 0 if micros < 1 else min(int(math.log2(micros)) + 1, len(self.counts) - 1)
+        # last before count: another thread that sees the count move sees this sample
+        self.last = seconds
+        self.counts[bucket] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.worst:
+            self.worst = seconds
+
+    def percentile(self, p):
+        # upper edge, in seconds, of the bucket holding the p-th percentile
+        target = self.count * p / 100
+        seen = 0
+        for i, count in enumerate(self.counts):
+            seen += count
+            if count and seen >= target:
+                return (2 ** i) / 1e6
+        return self.worst
+
+    def rows(self):
+        return [((2 ** i) / 1e6, count) for i, count in enumerate(self.counts) if count]
+
+    def reset(self):
+        self.counts = [0] * len(self.counts)
+        self.count = 0
+        self.total = 0.0
+        self.worst = 0.0
+        self.last = 0.0
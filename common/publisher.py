@@ -1,7 +1,9 @@
 """
 Publisher class
 
-This is a superclass that implements the Observer pattern
+This is a superclass that implements the Observer pattern. A publisher
+attached to an EventBus (common/eventbus.py) also publishes every change
+on it, to the handlers subscribed to that topic.
 
 Author: Eric Sluyter
 Last edited: July 2018
@@ -10,11 +12,16 @@ Last edited: July 2018
 class Publisher:
     def __init__(self):
         self.subscribers = set()
+        self.event_bus = None
+    def attach(self, bus):
+        self.event_bus = bus
     def register(self, who):
         self.subscribers.add(who)
     def unregister(self, who):
         self.subscribers.discard(who)
     def changed(self, what, etc=None):
+        if self.event_bus is not None:
+            self.event_bus.publish(what, etc)
         if self.role == 'model':
             for subscriber in self.subscribers:
                 subscriber.model_update(what, etc)
@@ -0,0 +1,66 @@
+"""
+Network to GUI thread handoff
+
+- Update
+- UpdateBridge
+
+The OSC thread never touches the model or any widget. It appends immutable
+Update records to a deque and, if no delivery is already in flight, emits a
+queued signal. The GUI thread then drains everything that has arrived and
+hands it on as one batch, in arrival order.
+
+A clocked bridge never wakes itself: its owner take()s the queue on its
+own timer instead, under the same lock as the rest of the frame's input.
+"""
+
+from collections import deque, namedtuple
+from PyQt5.QtCore import QObject, pyqtSignal, Qt
+
+Update = namedtuple('Update', ['kind', 'args'])
+
+
+class UpdateBridge(QObject):
+    delivered = pyqtSignal(list)
+    wake = pyqtSignal()
+
+    def __init__(self, clocked=False):
+        super().__init__()
+        self.clocked = clocked
+        self.queue = deque()
+        self.pending = False
+        self.posted = 0
+        self.batches = 0
+        self.wake.connect(self.deliver, Qt.QueuedConnection)
+
+    def __repr__(self):
+        return "<UpdateBridge posted:%s batches:%s queued:%s>" % (self.posted,
+            self.batches, len(self.queue))
+
+    def put(self, kind, *args):
+        # deque.append is atomic, so no lock is needed on either side
+        self.queue.append(Update(kind, args))
+        self.posted += 1
+        if not self.pending and not self.clocked:
+            self.pending = True
+            self.wake.emit()
+
+    def deliver(self):
+        # clear the flag before draining so a put racing with us either
+        # lands in this batch or wakes us up again
+        self.pending = False
+        batch = self.take()
+        if batch:
+            self.delivered.emit(batch)
+
+    def take(self):
+        # everything queued so far, in arrival order
+        batch = []
+        popleft = self.queue.popleft
+        while True:
+            try:
+                batch.append(popleft())
+            except IndexError:
+                break
+        if batch:
+            self.batches += 1
+        return batch
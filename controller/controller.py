@@ -6,27 +6,69 @@ Last edited: July 2018
 """
 
 from controller.midi import MidiWorker
-from PyQt5.QtCore import QThread
+from controller.midimap import MidiMap, ControlLimiter, MapWatcher, DEFAULT_MAP
+from controller.oscserver import OSCServer, OSCRouter
+from controller.mailbox import Mailbox
+from controller.meterbank import MeterBank
+from controller.bridge import UpdateBridge
+from controller.oscclient import OSCEgress, HIGH
+from common.latency import LatencyHistogram
+from common.eventbus import EventBus
+from model.showlibrary import ShowLibrary
+from model.predictor import PositionPredictor
+from PyQt5.QtCore import QThread, QTimer
 from os.path import basename, normpath, expanduser
-from pythonosc import udp_client, osc_server, dispatcher
+from pythonosc import udp_client, dispatcher
 import threading
-import re
+import time
 
 debug = True
+frame_rate = 60
 
 class CueController:
     def __init__(self, model, view):
         self.model = model
         self.view = view
 
-        model.register(self)
+        # GO sends the whole tracked state of the cue rather than its changes
+        self.fire_tracked = False
+        self.go_latency = LatencyHistogram('GO to sendto')
+        # GOs handed to the egress, and which one the status bar is waiting to report
+        self.gos_queued = 0
+        self.go_to_report = None
+        self.midi_latency = LatencyHistogram('MIDI note to sendto')
+        self.cc_latency = LatencyHistogram('MIDI control to sendto')
+        self.midi_errors = 0
+
+        # model and view changes each come through a bus, to one handler per topic
+        self.model_bus = EventBus('model')
+        self.view_bus = EventBus('view')
+        self.model_bus.trace = self.view_bus.trace = debug
+        model.attach(self.model_bus)
         for bus_state in model.bus_states:
-            bus_state.register(self)
-        view.register(self)
-        view.mainwidget.register(self)
-        view.mainwidget.list.register(self)
-        view.mainwidget.buttons.register(self)
-        view.mainwidget.midpanel.register(self)
+            bus_state.attach(self.model_bus)
+        for publisher in [view, view.mainwidget, view.mainwidget.list,
+                view.mainwidget.buttons, view.mainwidget.midpanel]:
+            publisher.attach(self.view_bus)
+        self.subscribe_model()
+        self.subscribe_view()
+
+        # /pos lands here from the OSC thread and is applied once per frame,
+        # with the positions in between predicted
+        self.mailbox = Mailbox()
+        self.predictor = PositionPredictor(model)
+        # /db levels are buffered per channel and the meters move once per frame
+        self.meter_bank = MeterBank(view.mainwidget.sound.meters, lock=self.mailbox.lock)
+        # everything else from the OSC thread is queued and applied in order;
+        # all three are collected together, so a bundle is never split
+        self.bridge = UpdateBridge(clocked=True)
+        self.frame_timer = QTimer()
+        self.frame_timer.setInterval(1000 // frame_rate)
+        self.frame_timer.timeout.connect(self.drain_mailbox)
+        self.frame_timer.start()
+
+        # all outgoing OSC is sent from the egress thread
+        self.egress = OSCEgress()
 
         self.start_osc()
         # this seems necessary to prime the pump
@@ -36,12 +78,23 @@ class CueController:
         except:
             print('OSC error!')
 
-        self.midi_worker = MidiWorker()
+        # every show under data/, for the show switcher
+        self.library = ShowLibrary('data')
+
+        # MIDI controllers move things through the mailbox, at most once per cc_interval
+        self.midi_map = MidiMap(DEFAULT_MAP, self.midi_actions())
+        self.cc_limiter = ControlLimiter(self.midi_map.cc_interval)
+        self.midi_worker = MidiWorker(self.midi_map.ports, self.mailbox)
         self.midi_thread = QThread()
         self.midi_worker.noteOn.connect(self.noteOn)
+        self.midi_worker.programChange.connect(self.programChange)
         self.midi_worker.moveToThread(self.midi_thread)
         self.midi_worker.finished.connect(self.midi_thread.quit)
         self.midi_thread.started.connect(self.midi_worker.listen)
+        # the show's midimap.json, or the station's, reloaded when edited
+        self.map_watcher = MapWatcher()
+        self.map_watcher.changed.connect(self.load_midi_map)
+        self.map_watcher.set_show(model.path)
         self.midi_thread.start()
 
         self.view_media_info()
@@ -57,17 +110,23 @@ class CueController:
             self.client_ip = client_info[0]
             self.client_port = int(client_info[1])
 
+        # anything not routed below can still be mapped on the dispatcher
         self.dispatcher = dispatcher.Dispatcher()
-        self.dispatcher.map('/db/*', self.db_update)
-        self.dispatcher.map('/pos/*', self.pos_update)
-        self.dispatcher.map('/matrix', self.matrix_update)
+        self.router = OSCRouter(self.dispatcher, self.mailbox.atomic)
+        for bus, letter in enumerate(['A', 'B', 'C', 'D', 'E']):
+            self.router.add_route('/pos/' + letter, self.pos_update, bus)
+            self.router.add_route('/db/' + letter + '/l', self.db_update, bus, 'l')
+            self.router.add_route('/db/' + letter + '/r', self.db_update, bus, 'r')
+        self.router.add_route('/matrix', self.matrix_update)
         if start_server:
             # must use 0.0.0.0 to receive OSC from anywhere
-            self.server = osc_server.ThreadingOSCUDPServer(('0.0.0.0', self.server_port), self.dispatcher)
-            self.server_thread = threading.Thread(target=self.server.serve_forever)
+            self.server = OSCServer(('0.0.0.0', self.server_port), self.router)
+            # a daemon, so an exception during startup can't leave the process hanging
+            self.server_thread = threading.Thread(target=self.server.serve_forever, daemon=True)
             self.server_thread.start()
         #self.client = udp_client.SimpleUDPClient('192.168.2.3', 7500)
         self.client = udp_client.SimpleUDPClient(self.client_ip, self.client_port)
+        self.egress.set_client(self.client)
 
     def restart_osc(self, server_port, client_ip, client_port):
         with open(expanduser('data/settings.txt'), 'w') as file:
@@ -75,183 +134,304 @@ class CueController:
             file.write('%s,%d\n' % (client_ip, client_port))
         if server_port != self.server_port:
             self.server.shutdown()
+            self.server.server_close()
             self.start_osc()
         else:
             self.start_osc(False)
 
 
-    def noteOn(self, num, vel):
-        {
-            36: lambda: self.play_bus(0),
-            37: lambda: self.pause_bus(0),
-            38: lambda: self.play_bus(1),
-            39: lambda: self.pause_bus(1),
-            40: lambda: self.rw_bus(0),
-            41: lambda: self.ff_bus(0),
-            42: lambda: self.rw_bus(1),
-            43: lambda: self.ff_bus(1),
-            44: lambda: self.emergency(),
-            45: lambda: self.emergency(0),
-            46: self.pause_all,
-            47: lambda: self.view_update('move_up'),
-            48: self.rw_all,
-            49: self.ff_all,
-            50: self.play_all,
-            51: self.fire_cue
-        }.get(num, lambda: None)()
-
-    def pos_update(self, addr, pos):
-        m = re.split(r'/pos/(\w)', addr)
-        bus = ord(m[1]) - 65
-        self.model.bus_states[bus].set_pos(pos)
-
-    def db_update(self, addr, db):
-        m = re.split(r'/db/(\w)/(\w)', addr)
-        bus = ord(m[1]) - 65
-        chan = m[2]
-        if chan == 'l':
-            self.view.mainwidget.sound.meters[bus].set_left_db(db)
-        elif chan == 'r':
-            self.view.mainwidget.sound.meters[bus].set_right_db(db)
-
-    def matrix_update(self, addr, i, j, state):
-        self.view.mainwidget.sound.set_checkbox(i, j, state == 1)
+    def midi_actions(self):
+        # what a MIDI map can name: action(value, stamp, *args from the map),
+        # given the velocity, controller value or program number
+        scaled = lambda value, low, high: low + value * (high - low) / 127
+        return {
+            'go': lambda value, stamp: self.fire_cue(True, stamp),
+            'play_bus': lambda value, stamp, bus: self.play_bus(bus),
+            'pause_bus': lambda value, stamp, bus: self.pause_bus(bus),
+            'rw_bus': lambda value, stamp, bus: self.rw_bus(bus),
+            'ff_bus': lambda value, stamp, bus: self.ff_bus(bus),
+            'play_all': lambda value, stamp: self.play_all(),
+            'pause_all': lambda value, stamp: self.pause_all(),
+            'rw_all': lambda value, stamp: self.rw_all(),
+            'ff_all': lambda value, stamp: self.ff_all(),
+            'blank_all': lambda value, stamp: self.blank_all(),
+            'emergency': lambda value, stamp, on=1: self.emergency(on),
+            'move_up': lambda value, stamp: self.view_bus.publish('move_up'),
+            'move_down': lambda value, stamp: self.view_bus.publish('move_down'),
+            'goto_cue': lambda value, stamp, first=0: self.goto_cue_number(value + first),
+            'bus_pos': lambda value, stamp, bus: self.bus_pos(bus, scaled(value, 0, 100)),
+            'rwff_speed': lambda value, stamp: self.set_rwff_speed(round(scaled(value, 2, 40)), True),
+        }
+
+    def load_midi_map(self, spec, path):
+        self.midi_map = MidiMap(spec, self.midi_actions(), path)
+        self.cc_limiter.interval = self.midi_map.cc_interval
+        self.midi_worker.set_port_names(self.midi_map.ports)
+        print(self.midi_map)
+
+    def noteOn(self, port, num, vel, stamp):
+        self.midi_action(self.midi_map.action('notes', port, num), vel, stamp, self.midi_latency)
+
+    def programChange(self, port, num, stamp):
+        self.midi_action(self.midi_map.action('program', port, num), num, stamp, self.midi_latency)
+
+    def midi_action(self, action, value, stamp, histogram):
+        if action is not None:
+            # the first message the action sends records how long it took;
+            # an exception out of a slot would take the whole show down
+            try:
+                with self.egress.triggered(stamp, histogram):
+                    action(value, stamp)
+            except Exception as e:
+                self.midi_errors += 1
+                print('MIDI action error!', e)
+
+    def pos_update(self, bus, pos):
+        self.mailbox.post(('pos', bus), pos)
+
+    def db_update(self, bus, chan, db):
+        self.meter_bank.post(bus, chan, db)
+
+    def drain_mailbox(self):
+        now = time.perf_counter()
+        with self.mailbox.atomic():
+            slots = self.mailbox.drain()
+            self.meter_bank.collect()
+            updates = self.bridge.take()
+        self.apply_updates(updates)
+        self.meter_bank.tick(now, collect=False)
+        for key, value in slots.items():
+            if key[0] == 'pos':
+                self.predictor.report(key[1], value, now)
+            elif key[0] == 'cc':
+                self.cc_limiter.put(key, value)
+        positions = self.predictor.tick(now)
+        if positions:
+            self.model.set_positions(positions)
+        for (kind, port, num), (value, stamp) in self.cc_limiter.ready(now):
+            self.midi_action(self.midi_map.action('cc', port, num), value, stamp, self.cc_latency)
+        if self.go_to_report is not None and self.go_latency.count >= self.go_to_report:
+            # the sender thread has sent it by now
+            self.go_to_report = None
+            self.view.statusBar().showMessage('GO sent %.2f ms after trigger' % (1000 * self.go_latency.last))
+
+    def matrix_update(self, i, j, state):
+        self.bridge.put('matrix', i, j, state == 1)
+
+    def apply_updates(self, updates):
+        for update in updates:
+            if update.kind == 'matrix':
+                self.view.mainwidget.sound.set_checkbox(*update.args)
+
+    def subscribe_model(self):
+        bus = self.model_bus
+        cue_list = self.view.mainwidget.list
+        cues = lambda: self.model.cues
+        for topic, handler in {
+            'cue_pointer': lambda etc: self.view_current_cue(),
+            'cues': self.cues_loaded,
+            'cue_inserted': lambda index: cue_list.insert_cue(index, cues()),
+            'cue_removed': lambda index: cue_list.remove_cue(index, cues()),
+            'cue_moved': lambda etc: cue_list.move_cue(*etc, cues()),
+            'cue_replaced': lambda index: cue_list.set_cue_name(index, cues()),
+            'cue_name': self.cue_renamed,
+            'history': lambda etc: self.view.set_history(self.model.can_undo(), self.model.can_redo()),
+            'media_info': lambda etc: self.view_media_info(),
+            'path': self.view_path,
+            'unsaved_changes': lambda etc: self.view.setWindowModified(True),
+            # edits are being written in the background
+            'save_state': lambda state: self.view.setWindowModified(state != 'clean'),
+            'save_failed': lambda message: self.view.statusBar().showMessage(message),
+            'positions': self.view_positions,
+        }.items():
+            bus.subscribe(topic, handler)
+        # each bus state publishes these on a GO; batched, so a GO updates the view once
+        bus.subscribe('pos', self.reset_predictions, batch=True)
+        bus.subscribe('speed', self.set_predicted_speeds, batch=True)
+        bus.subscribe('pos', self.view_positions, batch=True)
+        bus.subscribe('media', self.view_media, batch=True)
+        bus.subscribe('active', self.view_active, batch=True)
+
+    def subscribe_view(self):
+        bus = self.view_bus
+        model = self.model
+        view = self.view
+        confirmed = self.confirmed
+        for topic, handler in {
+            'cue_pointer': self.goto_cue,
+            'move_cue': self.move_cue,
+            'move_up': confirmed(model.decrement_cue),
+            'move_down': confirmed(model.increment_cue),
+            'cue_name': self.rename_cue,
+            'blank_before': confirmed(lambda: model.add_empty_cue_before_current('BLANK')),
+            'blank_after': confirmed(lambda: model.add_empty_cue_after_current('BLANK')),
+            'delete_current': lambda etc: model.delete_current_cue(),
+            'undo': confirmed(model.undo),
+            'redo': confirmed(model.redo),
+            'update': lambda etc: model.replace_current_cue(view.mainwidget.as_cue()),
+            'update_fire': self.update_fire,
+            'insert_before': lambda etc: self.insert_cue(model.add_cue_before_current),
+            'insert_after': lambda etc: self.insert_cue(model.add_cue_after_current),
+            'rwff_speed': self.set_rwff_speed,
+            'edited': lambda etc: view.mainwidget.buttons.setEdited(view.mainwidget.edited()),
+            'capture_all': self.capture_all,
+            'transport': lambda etc: self.egress.send_message('/isadora', [etc, 1]),
+            'play': self.play_bus,
+            'pause': self.pause_bus,
+            'rw': self.rw_bus,
+            'ff': self.ff_bus,
+            'play_all': lambda etc: self.play_all(),
+            'pause_all': lambda etc: self.pause_all(),
+            'rw_all': lambda etc: self.rw_all(),
+            'ff_all': lambda etc: self.ff_all(),
+            'set_bus_pos': lambda etc: self.bus_pos(*etc),
+            'current_matrix': lambda etc: self.egress.send_message('/fromsm', etc, key='current_matrix'),
+            'preset': lambda etc: self.egress.send_message('/preset', etc),
+            'open': model.load_path,
+            'new': lambda etc: model.load_path(None),
+            'switch_show': lambda etc: view.show_switcher(self.library.list(), model.path),
+            'save': self.save,
+            'save_as': model.save_as,
+            'go': lambda stamp: self.fire_cue(True, stamp),
+            'fire_tracked': self.set_fire_tracked,
+            'settings': self.show_settings,
+            'new_settings': self.new_settings,
+            'quit': self.quit,
+        }.items():
+            bus.subscribe(topic, handler)
+
+    def confirmed(self, action):
+        # a handler running action() once any unsaved edits are ok to lose
+        def handler(etc=None):
+            if self.view.confirm_cue_change():
+                action()
+        return handler
+
+    def goto_cue(self, index):
+        if index != self.model.cue_pointer and self.view.confirm_cue_change():
+            self.model.goto_cue(index)
+
+    def goto_cue_number(self, index):
+        # from a program change, which may be past the end of a short show
+        if 0 <= index < len(self.model.cues):
+            self.goto_cue(index)
+
+    def move_cue(self, index):
+        if index != self.model.cue_pointer and self.view.confirm_cue_change():
+            self.model.move_current_cue(index)
+
+    def rename_cue(self, name):
+        if name != self.model.current_cue().name:
+            self.model.rename_current_cue(name)
+
+    def capture_all(self, etc=None):
+        for bus in self.view.mainwidget.buses:
+            bus.current_pos.capture()
+
+    def cues_loaded(self, etc=None):
+        self.view_cues()
+        self.view_current_cue()
 
-    def model_update(self, what, etc=None):
-        if debug:
-            print("begin model_update", what, etc)
-        if what == 'cue_pointer':
-            self.view_current_cue(True)
-        if what == 'cues':
-            self.view_cues(True)
-            self.view_current_cue(True)
-        if what == 'cue_name':
-            self.view_cues()
-            self.view_current_cue_name()
-        if what == 'media_info':
-            self.view_media_info()
-        if what == 'path':
-            if etc is None:
-                self.view.setWindowTitle('New Cue List')
-            else:
-                self.view.setWindowTitle(basename(normpath(etc)))
-                self.view.setWindowModified(False)
-        if what == 'unsaved_changes':
-            self.view.setWindowModified(True)
-        if what == 'pos':
-            pos = self.model.bus_states[etc].pos
-            self.view.mainwidget.buses[etc].set_current_pos(pos)
-        if what == 'media':
-            media_name = self.model.media_info[self.model.bus_states[etc].media_index].name
-            self.view.mainwidget.buses[etc].set_current_media(media_name)
-        if what == 'active':
-            active = self.model.bus_states[etc].active
-            self.view.mainwidget.buses[etc].set_active(active)
-        if debug:
-            print("end model_update", what, etc)
+    def cue_renamed(self, index):
+        self.view.mainwidget.list.set_cue_name(index, self.model.cues)
+        self.view_current_cue_name()
 
-    def view_update(self, what, etc=None):
+    def view_path(self, path):
+        self.map_watcher.set_show(path)
+        if path is None:
+            self.view.setWindowTitle('New Cue List[*]')
+        else:
+            self.view.setWindowTitle(basename(normpath(path)) + '[*]')
+            self.view.setWindowModified(False)
+
+    def reset_predictions(self, buses):
+        # a cue or a scrub has set these outright
+        for bus in set(buses):
+            self.predictor.reset(bus)
+
+    def set_predicted_speeds(self, buses):
+        # a cue has told these how to play
+        for bus in set(buses):
+            self.predictor.set_speed(bus, self.model.bus_states[bus].speed)
+
+    def view_positions(self, buses):
+        for bus in buses:
+            self.view.mainwidget.buses[bus].set_current_pos(self.model.bus_states[bus].pos)
+
+    def view_media(self, buses):
+        for bus in buses:
+            media_name = self.model.media_info[self.model.bus_states[bus].media_index].name
+            self.view.mainwidget.buses[bus].set_current_media(media_name)
+
+    def view_active(self, buses):
+        for bus in buses:
+            self.view.mainwidget.buses[bus].set_active(self.model.bus_states[bus].active)
+
+    def update_fire(self, etc=None):
+        self.model.replace_current_cue(self.view.mainwidget.as_cue())
+        self.fire_cue(False)
+
+    def insert_cue(self, add):
+        name, ok = self.view.get_text('New cue name', 'New cue name:')
+        if ok:
+            add(self.view.mainwidget.as_cue(name))
+
+    def set_rwff_speed(self, speed, show=False):
+        self.model.rwff_speed = speed
+        if show:
+            self.view_rwff_speed()
+
+    def set_fire_tracked(self, tracked):
+        self.fire_tracked = tracked
+
+    def save(self, etc=None):
+        if self.model.path is None:
+            self.view.save_as()
+        elif self.view.mainwidget.edited():
+            self.model.replace_current_cue(self.view.mainwidget.as_cue())
+
+    def show_settings(self, etc=None):
+        if self.model.path is None:
+            show_name = 'New'
+        else:
+            show_name = basename(normpath(self.model.path))
+        self.view.show_settings_dialog([self.server_port, self.client_ip, self.client_port],
+            self.model.media_info, show_name)
+
+    def new_settings(self, settings):
+        osc_settings, media_list = settings
+        server_port, client_ip, client_port = osc_settings
+        self.restart_osc(server_port, client_ip, client_port)
+        self.model.update_media_info(media_list)
+
+    def quit(self, etc=None):
+        self.frame_timer.stop()
         if debug:
-            print("begin view_update", what, etc)
-        model = self.model
-        view = self.view
-        if what == 'cue_pointer' and etc != model.cue_pointer:
-            if view.confirm_cue_change():
-                model.goto_cue(etc)
-        if what == 'move_cue' and etc != model.cue_pointer:
-            if view.confirm_cue_change():
-                model.move_current_cue(etc)
-        if what == 'move_up':
-            if view.confirm_cue_change():
-                model.decrement_cue()
-        if what == 'move_down':
-            if view.confirm_cue_change():
-                model.increment_cue()
-        if what == 'cue_name' and etc != model.current_cue().name:
-            model.rename_current_cue(etc)
-        if what == 'blank_before':
-            if view.confirm_cue_change():
-                model.add_empty_cue_before_current('BLANK')
-        if what == 'blank_after':
-            if view.confirm_cue_change():
-                model.add_empty_cue_after_current('BLANK')
-        if what == 'delete_current':
-            model.delete_current_cue()
-        if what == 'update':
-            model.replace_current_cue(view.mainwidget.as_cue())
-        if what == 'update_fire':
-            model.replace_current_cue(view.mainwidget.as_cue())
-            self.fire_cue(False)
-        if what == 'insert_before':
-            name, ok = view.get_text('New cue name', 'New cue name:')
-            if ok:
-                model.add_cue_before_current(view.mainwidget.as_cue(name))
-        if what == 'insert_after':
-            name, ok = view.get_text('New cue name', 'New cue name:')
-            if ok:
-                model.add_cue_after_current(view.mainwidget.as_cue(name))
-        if what == 'rwff_speed' and etc != model.rwff_speed:
-            model.rwff_speed = etc
-        if what == 'edited':
-            view.mainwidget.buttons.setEdited(view.mainwidget.edited())
-        if what == 'capture_all':
-            for bus in view.mainwidget.buses:
-                bus.current_pos.capture()
-        if what == 'transport':
-            self.client.send_message('/isadora', [etc, 1])
-        if what == 'play':
-            self.play_bus(etc)
-        if what == 'pause':
-            self.pause_bus(etc)
-        if what == 'rw':
-            self.rw_bus(etc)
-        if what == 'ff':
-            self.ff_bus(etc)
-        if what == 'play_all':
-            self.play_all()
-        if what == 'pause_all':
-            self.pause_all()
-        if what == 'rw_all':
-            self.rw_all()
-        if what == 'ff_all':
-            self.ff_all()
-        if what == 'set_bus_pos':
-            bus, pos = etc
-            self.bus_pos(bus, pos)
-        if what == 'current_matrix':
-            self.client.send_message('/fromsm', etc)
-        if what == 'preset':
-            self.client.send_message('/preset', etc)
-        if what == 'open':
-            model.load_path(etc)
-        if what == 'new':
-            model.load_path(None)
-        if what == 'save':
-            if model.path is None:
-                view.save_as()
-            else:
-                if view.mainwidget.edited():
-                    model.replace_current_cue(view.mainwidget.as_cue())
-        if what == 'save_as':
-            model.save_as(etc)
-        if what == 'go':
-            self.fire_cue(True)
-        if what == 'settings':
-            if model.path is None:
-                show_name = 'New'
-            else:
-                show_name = basename(normpath(model.path))
-            view.show_settings_dialog([self.server_port, self.client_ip, self.client_port], model.media_info, show_name)
-        if what == 'new_settings':
-            osc_settings, media_list = etc
-            server_port, client_ip, client_port = osc_settings
-            self.restart_osc(server_port, client_ip, client_port)
-            model.update_media_info(media_list)
-        if what == 'quit':
-            self.server.shutdown()
-            self.midi_worker.stopListening()
+            print(self.go_latency)
+            print(self.midi_latency)
+            print(self.cc_latency)
+            print('MIDI action errors:', self.midi_errors)
+            print(self.midi_map)
+            print(self.cc_limiter)
+            print(self.midi_worker)
+            print(self.mailbox)
+            print(self.meter_bank)
+            print(self.predictor)
+            print(self.bridge)
+            print(self.egress)
+            print(self.model_bus)
+            print(self.view_bus)
+        self.egress.stop()
+        self.server.shutdown()
         if debug:
-            print("end view_update", what, etc)
+            print(self.model.persistence)
+        self.model.close(2.0)
+        self.library.stop()
+        self.map_watcher.timer.stop()
+        self.midi_worker.stopListening()
+        # a polling worker may still be between timeouts
+        self.midi_thread.quit()
+        self.midi_thread.wait(1000)
 
     def play_bus(self, bus):
         bus_state = self.model.bus_states[bus]
@@ -274,51 +454,72 @@ class CueController:
             self.bus_speed(bus, self.model.rwff_speed)
 
     def play_all(self):
-        data = []
-        for bus_state in self.model.bus_states:
-            data += ['n'] * 2 + [str(bus_state.speed) + ' 0' if bus_state.active else 'n'] + ['n'] * 4
-        self.client.send_message('/fromsm', data)
+        self.all_speeds(lambda bus_state: bus_state.speed)
 
     def pause_all(self):
-        data = []
-        for bus_state in self.model.bus_states:
-            data += ['n'] * 2 + ['0 0' if bus_state.active else 'n'] + ['n'] * 4
-        self.client.send_message('/fromsm', data)
+        self.all_speeds(lambda bus_state: 0)
 
     def rw_all(self):
-        data = []
-        for bus_state in self.model.bus_states:
-            data += ['n'] * 2 + [str(-1 * self.model.rwff_speed * bus_state.speed) + ' 0' if bus_state.active else 'n'] + ['n'] * 4
-        self.client.send_message('/fromsm', data)
+        self.all_speeds(lambda bus_state: -1 * self.model.rwff_speed * bus_state.speed)
 
     def ff_all(self):
-        data = []
-        for bus_state in self.model.bus_states:
-            data += ['n'] * 2 + [str(self.model.rwff_speed * bus_state.speed) + ' 0' if bus_state.active else 'n'] + ['n'] * 4
-        self.client.send_message('/fromsm', data)
+        self.all_speeds(lambda bus_state: self.model.rwff_speed * bus_state.speed)
 
-    def fire_cue(self, increment=True):
-        name, data = self.model.fire_current_cue(increment)
-        self.client.send_message('/fromsm', data)
-        self.client.send_message('/cuename', name)
+    def all_speeds(self, speed_of):
+        data = []
+        for bus, bus_state in enumerate(self.model.bus_states):
+            if bus_state.active:
+                speed = speed_of(bus_state)
+                data += ['n'] * 2 + [str(speed) + ' 0'] + ['n'] * 4
+                self.predictor.set_speed(bus, speed)
+            else:
+                data += ['n'] * 7
+        self.egress.send_message('/fromsm', data)
+
+    def fire_cue(self, increment=True, stamp=None):
+        # the packet goes out before any model or widget work
+        fromsm, cuename = self.cue_to_fire().osc_messages()
+        self.egress.send(fromsm, HIGH, stamp=stamp, histogram=self.go_latency)
+        self.egress.send(cuename, HIGH)
+        self.gos_queued += 1
+        if stamp is not None:
+            self.go_to_report = self.gos_queued
+
+        self.library.fired(self.model.path, self.model.cue_pointer, self.model.current_cue().name)
+        # the model changes from the GO are handled together, after the packet is out
+        deliver = lambda events: QTimer.singleShot(0, lambda: self.apply_deferred_updates(events))
+        with self.model_bus.transaction(deliver):
+            self.model.fire_current_cue(increment, self.fire_tracked)
+
+    def apply_deferred_updates(self, events):
+        self.model_bus.deliver(events)
+        # encode the next cue now, while nothing is waiting on it
+        self.cue_to_fire().osc_messages()
+
+    def cue_to_fire(self):
+        if self.fire_tracked:
+            return self.model.tracked_cue()
+        return self.model.current_cue()
 
     def bus_speed(self, bus, speed):
         # there must be a better way.... :)
         data = ['n'] * (bus * 7 + 2) + [str(speed) + ' 0']
-        self.client.send_message('/fromsm', data)
+        self.egress.send_message('/fromsm', data)
+        self.predictor.set_speed(bus, speed)
 
     def bus_pos(self, bus, pos):
         data = ['n'] * (bus * 7 + 1) + [str(pos)]
-        self.client.send_message('/fromsm', data)
+        # scrubbing only ever needs the latest position per bus
+        self.egress.send_message('/fromsm', data, key=('bus_pos', bus))
         self.model.bus_states[bus].set_pos(pos)
 
     def blank_all(self):
         data = (['0'] + (['n'] * 6)) * 5
-        self.client.send_message('/fromsm', data)
+        self.egress.send_message('/fromsm', data)
 
     def emergency(self, on=1):
         print('emergency')
-        self.client.send_message('/emergency', on)
+        self.egress.send_message('/emergency', on, HIGH)
 
     def view_media_info(self):
         self.view.mainwidget.set_media_info(self.model.media_info)
@@ -326,29 +527,13 @@ class CueController:
     def view_rwff_speed(self):
         self.view.mainwidget.midpanel.set_rwff_speed(self.model.rwff_speed)
 
-    def view_cues(self, flush=False):
-        if flush:
-            self.view.mainwidget.list.hide()
-        self.view.mainwidget.list.set_cues([cue.name for cue in self.model.cues])
-        if flush:
-            self.view.mainwidget.list.show()
+    def view_cues(self):
+        self.view.mainwidget.list.set_cues(self.model.cues)
 
-    def view_current_cue_name(self, flush=False):
+    def view_current_cue_name(self):
         self.view.mainwidget.set_cue_name(self.model.current_cue().name)
         self.view.mainwidget.list.set_current_cue(self.model.cue_pointer)
 
-    def view_current_cue(self, flush=False):
-        current_cue = self.model.current_cue()
-        mainwidget = self.view.mainwidget
-
-        if flush:
-            mainwidget.hide()
-
-        self.view_current_cue_name()
-        mainwidget.set_notes(current_cue.notes)
-        for i, bus in enumerate(current_cue.buses):
-            mainwidget.buses[i].set_values(bus)
-        mainwidget.sound.set_cue_routing(current_cue.audio_routing)
-
-        if flush:
-            mainwidget.show()
+    def view_current_cue(self):
+        self.view.mainwidget.set_cue(self.model.current_cue())
+        self.view.mainwidget.list.set_current_cue(self.model.cue_pointer)
@@ -0,0 +1,50 @@
+"""
+Latest-value-wins mailbox
+
+- Mailbox
+
+The OSC and MIDI sides overwrite a slot per key, (kind, bus) or ('cc',
+port, controller), and the GUI side drains every slot once per frame, so
+any number of updates that land between two frames cost one model/widget
+update. Posts made inside atomic() are never split across two drains.
+"""
+
+import threading
+
+
+class Mailbox:
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.slots = {}
+        self.posted = 0
+        self.coalesced = 0
+        self.delivered = 0
+
+    def __repr__(self):
+        return "<Mailbox posted:%s coalesced:%s delivered:%s pending:%s>" % (
+            self.posted, self.coalesced, self.delivered, len(self.slots))
+
+    def post(self, key, value):
+        with self.lock:
+            if key in self.slots:
+                self.coalesced += 1
+            self.slots[key] = value
+            self.posted += 1
+
+    def atomic(self):
+        return self.lock
+
+    def drain(self):
+        with self.lock:
+            if not self.slots:
+                return {}
+            slots = self.slots
+            self.slots = {}
+        self.delivered += len(slots)
+        return slots
+
+    def reset_counters(self):
+        with self.lock:
+            self.posted = 0
+            self.coalesced = 0
+            self.delivered = 0
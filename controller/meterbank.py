@@ -0,0 +1,117 @@
+"""
+Level meter engine
+
+- MeterChannel
+- MeterBank
+
+/db levels from the OSC thread are written into a small ring buffer per
+channel and nothing else happens until the frame tick. Each tick reads
+what came in since the last one, takes the loudest sample as the
+channel's new target, and advances every channel's ballistics (a fast
+attack, a release in dB per second) and peak hold by the real time since
+the last tick. Then every meter is refreshed, and only meters whose bars
+moved by a pixel are repainted. However fast levels arrive, a tick reads
+at most one ring's worth of samples per channel.
+
+The rings can share a lock with the controls mailbox, so the controller
+can collect levels, positions and queued updates in one locked step and
+an OSC bundle carrying /db with /pos lands in a single frame.
+"""
+
+import math
+import time
+import threading
+
+FLOOR = -60.0
+
+
+class MeterChannel:
+    __slots__ = ('ring', 'written', 'read', 'target', 'level', 'peak', 'held')
+
+    def __init__(self, size):
+        self.ring = [FLOOR] * size
+        # samples ever written and ever read; only the last len(ring) are kept
+        self.written = 0
+        self.read = 0
+        # loudest sample of the last tick that had any, what the bar shows,
+        # and the peak line with how long it has left to hold
+        self.target = FLOOR
+        self.level = FLOOR
+        self.peak = FLOOR
+        self.held = 0.0
+
+    def advance(self, dt, attack, release, hold):
+        if self.target > self.level:
+            self.level += (self.target - self.level) * (1 - math.exp(-dt / attack))
+            if self.target - self.level < 0.01:
+                self.level = self.target
+        else:
+            self.level = max(self.target, self.level - release * dt)
+        if self.level >= self.peak:
+            self.peak = self.level
+            self.held = hold
+        elif self.held > 0:
+            self.held -= dt
+        else:
+            self.peak = max(self.level, self.peak - release * dt)
+
+    def settled(self):
+        return self.level == self.target and self.peak == self.level
+
+class MeterBank:
+    def __init__(self, meters, ring_size=32, attack=0.01, release=24.0, hold=1.5, lock=None):
+        # meters are LevelMeters, each showing a left and right channel
+        self.meters = list(meters)
+        self.channels = []
+        for meter in self.meters:
+            left, right = MeterChannel(ring_size), MeterChannel(ring_size)
+            meter.set_channels(left, right)
+            self.channels += [left, right]
+        self.attack = attack
+        self.release = release
+        self.hold = hold
+        self.lock = threading.Lock() if lock is None else lock
+        self.last_tick = None
+        self.posted = 0
+        self.dropped = 0
+        self.ticks = 0
+
+    def __repr__(self):
+        return "<MeterBank channels:%s posted:%s dropped:%s ticks:%s>" % (
+            len(self.channels), self.posted, self.dropped, self.ticks)
+
+    def post(self, bus, chan, db):
+        # from any thread
+        channel = self.channels[2 * bus + (chan == 'r')]
+        with self.lock:
+            channel.ring[channel.written % len(channel.ring)] = db
+            channel.written += 1
+            self.posted += 1
+
+    def collect(self):
+        # each channel's loudest sample since the last collect becomes its target
+        with self.lock:
+            for channel in self.channels:
+                if channel.read == channel.written:
+                    continue
+                size = len(channel.ring)
+                start = max(channel.read, channel.written - size)
+                self.dropped += start - channel.read
+                channel.target = max(channel.ring[k % size] for k in range(start, channel.written))
+                channel.read = channel.written
+
+    def tick(self, now=None, collect=True):
+        now = time.perf_counter() if now is None else now
+        # a stalled frame must not make the bars jump
+        dt = 0.0 if self.last_tick is None else min(now - self.last_tick, 0.25)
+        self.last_tick = now
+        self.ticks += 1
+        if collect:
+            self.collect()
+
+        if dt > 0:
+            for channel in self.channels:
+                if not channel.settled():
+                    channel.advance(dt, self.attack, self.release, self.hold)
+        for meter in self.meters:
+            meter.refresh()
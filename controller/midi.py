@@ -1,47 +1,138 @@
 """
 MIDI implementation
 
+- MidiWorker
+
+Messages come in through rtmidi's callback, on rtmidi's own thread, from
+every input port whose name starts with one of the mapped port names
+(see controller/midimap.py). Each is stamped with time.perf_counter()
+there, as it arrives. Notes and program changes are handed to the GUI
+thread through a signal; controller messages, which a fader sends by the
+hundred, are only posted to the controls mailbox under ('cc', port,
+controller), so the GUI thread sees the latest value of each once per
+frame. Stopping cancels the callbacks and closes the ports, so it takes
+no time. An rtmidi without setCallback is polled from the worker's
+thread instead, with a short timeout.
+
 Author: Eric Sluyter
 Last edited: July 2018
 """
 
 import rtmidi
+import time
 from PyQt5.QtCore import QObject, pyqtSignal
 
 class MidiWorker(QObject):
-    noteOn = pyqtSignal(int, int)
+    # port, note, velocity, time.perf_counter() when the message came in
+    noteOn = pyqtSignal(str, int, int, float)
+    # port, program, time.perf_counter()
+    programChange = pyqtSignal(str, int, float)
     finished = pyqtSignal()
 
-    def __init__(self, portName = 'MPD218'):
+    def __init__(self, portNames=('MPD218',), controls=None, make_input=None, poll_timeout=10):
         super().__init__()
-        self.midiin = rtmidi.RtMidiIn()
-        self.portName = portName
-
-    def listen(self):
+        self.make_input = rtmidi.RtMidiIn if make_input is None else make_input
+        self.portNames = list(portNames)
+        self.controls = controls
+        self.poll_timeout = poll_timeout
+        # [(port name, RtMidiIn)] of the open ports
+        self.inputs = []
         self.alive = False
+        self.callback = False
+        self.reopen = False
+        self.received = 0
+        self.errors = 0
+
+    def __repr__(self):
+        return "<MidiWorker ports:%r %s received:%s errors:%s>" % (
+            [name for name, midiin in self.inputs],
+            'callback' if self.callback else 'polling', self.received, self.errors)
+
+    def open_ports(self):
         print('MIDI ports:')
-        ports = range(self.midiin.getPortCount())
-        if ports:
-            for i in ports:
-                if self.midiin.getPortName(i).startswith(self.portName):
-                    self.alive = True
-                    print(i, self.midiin.getPortName(i), ' - OPENING')
-                    self.midiin.openPort(i)
-                else:
-                    print(i, self.midiin.getPortName(i))
-            if self.alive:
-                print('Port', repr(self.portName), 'open!')
+        scanner = self.make_input()
+        names = [scanner.getPortName(i) for i in range(scanner.getPortCount())]
+        if not names:
+            print('NO MIDI INPUT PORTS!')
+        # RtMidiIn opens one port, so each port gets its own
+        self.inputs = []
+        for i, name in enumerate(names):
+            if any(name.startswith(portName) for portName in self.portNames):
+                print(i, name, ' - OPENING')
+                midiin = scanner if not self.inputs else self.make_input()
+                midiin.openPort(i)
+                self.inputs.append((name, midiin))
             else:
-                print('Port', repr(self.portName), 'not found.')
-            while self.alive:
-                m = self.midiin.getMessage(250) # some timeout in ms
-                if m:
-                    if m.isNoteOn():
-                        self.noteOn.emit(m.getNoteNumber(), m.getVelocity())
+                print(i, name)
+        for portName in self.portNames:
+            if not any(name.startswith(portName) for name, midiin in self.inputs):
+                print('Port', repr(portName), 'not found.')
+        return bool(self.inputs)
+
+    def close_ports(self):
+        for name, midiin in self.inputs:
+            if self.callback:
+                midiin.cancelCallback()
+            midiin.closePort()
+        self.inputs = []
+
+    def set_port_names(self, portNames):
+        # from the GUI thread when the mapping changes
+        portNames = list(portNames)
+        if portNames == self.portNames:
+            return
+        self.portNames = portNames
+        if self.callback and self.alive:
+            self.close_ports()
+            self.listen_callback()
         else:
-            print('NO MIDI INPUT PORTS!')
+            self.reopen = True
 
+    def listen(self):
+        self.alive = True
+        self.callback = hasattr(self.make_input(), 'setCallback')
+        if self.callback:
+            # finished is emitted by stopListening
+            self.listen_callback()
+            return
+        while self.alive:
+            self.reopen = False
+            self.open_ports()
+            while self.alive and not self.reopen:
+                if not self.inputs:
+                    time.sleep(self.poll_timeout / 1000)
+                for name, midiin in self.inputs:
+                    m = midiin.getMessage(self.poll_timeout)
+                    if m:
+                        self.message(name, m)
+            self.close_ports()
         self.finished.emit()
 
+    def listen_callback(self):
+        self.open_ports()
+        for name, midiin in self.inputs:
+            midiin.setCallback(lambda m, name=name: self.message(name, m))
+
+    def message(self, port, m):
+        # on rtmidi's thread; an exception here would be raised
+        # asynchronously in whichever thread opened the port
+        stamp = time.perf_counter()
+        try:
+            self.received += 1
+            if m.isNoteOn():
+                self.noteOn.emit(port, m.getNoteNumber(), m.getVelocity(), stamp)
+            elif m.isController():
+                if self.controls is not None:
+                    self.controls.post(('cc', port, m.getControllerNumber()),
+                        (m.getControllerValue(), stamp))
+            elif m.isProgramChange():
+                self.programChange.emit(port, m.getProgramChangeNumber(), stamp)
+        except Exception as e:
+            self.errors += 1
+            print('MIDI error!', e)
+
     def stopListening(self):
-        self.alive = False
+        was_alive, self.alive = self.alive, False
+        if was_alive and self.callback:
+            self.close_ports()
+            self.finished.emit()
@@ -0,0 +1,260 @@
+"""
+MIDI mapping
+
+- MidiMap
+- ControlLimiter
+- MapWatcher
+
+What each pad, fader and program change does comes from a mapping file:
+midimap.json in the show's folder, or else data/midimap.json for the
+station, or else DEFAULT_MAP (the MPD218 pads as they have always been).
+For example:
+
+    {
+        "ports": ["MPD218", "nanoKONTROL"],
+        "notes": {"36": ["play_bus", 0], "51": ["go"]},
+        "cc": {"nanoKONTROL:0": ["bus_pos", 0], "16": ["rwff_speed"]},
+        "program": {"*": ["goto_cue"]},
+        "cc_interval": 0.033
+    }
+
+Every input port whose name starts with one of "ports" is opened. Keys
+are note, controller or program numbers, or "port:number" for the ports
+whose names start with port only, which wins over a plain number; "*"
+takes any number. An action is a name from the controller's
+midi_actions() and its arguments; it also gets the velocity, controller
+value or program number. The arguments are checked when the map is
+loaded (a bus is 0 to 4), and anything wrong is printed and left out, so
+a typo in a map edited during a show only loses that entry.
+
+The map is compiled into one dict per port and kind, the first time the
+port is heard, so a message costs two lookups. Controller messages are
+coalesced and rate limited: the MIDI thread only keeps the latest value
+of each control, and each control acts at most once every cc_interval
+seconds.
+"""
+
+import os
+import json
+import inspect
+from PyQt5.QtCore import QObject, QTimer, QFileSystemWatcher, pyqtSignal
+
+MAP_NAME = 'midimap.json'
+KINDS = ('notes', 'cc', 'program')
+DEFAULT_MAP = {
+    'ports': ['MPD218'],
+    'notes': {
+        '36': ['play_bus', 0], '37': ['pause_bus', 0],
+        '38': ['play_bus', 1], '39': ['pause_bus', 1],
+        '40': ['rw_bus', 0], '41': ['ff_bus', 0],
+        '42': ['rw_bus', 1], '43': ['ff_bus', 1],
+        '44': ['emergency', 1], '45': ['emergency', 0],
+        '46': ['pause_all'], '47': ['move_up'], '48': ['rw_all'],
+        '49': ['ff_all'], '50': ['play_all'], '51': ['go']},
+    'cc': {},
+    'program': {},
+    'cc_interval': 0.033,
+}
+
+
+def read_map(path):
+    # the mapping in a file, or None if it cannot be read
+    try:
+        with open(path, 'r') as map_file:
+            spec = json.load(map_file)
+    except (OSError, ValueError) as e:
+        print('Could not read the MIDI map %s: %s' % (path, e))
+        return None
+    if not isinstance(spec, dict):
+        print('Could not read the MIDI map %s: not a JSON object' % path)
+        return None
+    return spec
+
+# what the map's arguments must be, by the name of the action's parameter
+ARGUMENTS = {
+    'bus': lambda bus: type(bus) is int and 0 <= bus < 5,
+    'on': lambda on: on in (0, 1) and type(on) is int,
+    'first': lambda first: type(first) is int,
+}
+
+def bind(function, args):
+    # raises TypeError if the action can't be called with these arguments
+    bound = inspect.signature(function).bind(0, 0, *args)
+    for name, arg in bound.arguments.items():
+        check = ARGUMENTS.get(name)
+        if check is not None and not check(arg):
+            raise TypeError('bad %s %r' % (name, arg))
+    return lambda value, stamp: function(value, stamp, *args)
+
+def valid_ports(ports):
+    if isinstance(ports, str):
+        ports = [ports]
+    if not isinstance(ports, list) or not all(isinstance(port, str) and port for port in ports):
+        raise ValueError(ports)
+    return ports
+
+def valid_interval(interval):
+    if type(interval) not in (int, float) or not 0 <= interval < 10:
+        raise ValueError(interval)
+    return float(interval)
+
+class MidiMap:
+    def __init__(self, spec, actions, source=None):
+        # actions is {name: function(value, stamp, *args)}
+        # a bad entry is left out rather than failing when it is played
+        self.source = source
+        self.errors = []
+        self.ports = self.setting(spec, 'ports', valid_ports)
+        self.cc_interval = self.setting(spec, 'cc_interval', valid_interval)
+        self.counts = {}
+        # kind: port prefix (None for any port): {number or '*': action}
+        self.tables = {}
+        for kind in KINDS:
+            self.tables[kind] = self.compile(kind, spec.get(kind, {}), actions)
+        for error in self.errors:
+            print('MIDI map entry ignored:', error)
+        # port name: {kind: table}, worked out the first time the port is heard
+        self.resolved = {}
+
+    def __repr__(self):
+        return "<MidiMap %s ports:%s notes:%s cc:%s program:%s errors:%s>" % (
+            self.source or 'default', self.ports, self.counts['notes'],
+            self.counts['cc'], self.counts['program'], len(self.errors))
+
+    def setting(self, spec, name, valid):
+        try:
+            return valid(spec.get(name, DEFAULT_MAP[name]))
+        except ValueError:
+            self.errors.append('%s: %r' % (name, spec[name]))
+            return valid(DEFAULT_MAP[name])
+
+    def compile(self, kind, entries, actions):
+        tables = {None: {}}
+        self.counts[kind] = 0
+        if not isinstance(entries, dict):
+            self.errors.append('%s: %s' % (kind, entries))
+            return tables
+        for key, entry in entries.items():
+            port, sep, number = str(key).rpartition(':')
+            try:
+                number = number if number == '*' else int(number)
+                name, args = entry[0], entry[1:]
+                action = bind(actions[name], args)
+            except (ValueError, TypeError, IndexError, KeyError):
+                self.errors.append('%s %s: %s' % (kind, key, entry))
+                continue
+            tables.setdefault(port if sep else None, {})[number] = action
+            self.counts[kind] += 1
+        return tables
+
+    def resolve(self, port):
+        # the generic entries, overridden by those of the longest matching prefix
+        resolved = {}
+        for kind in KINDS:
+            prefixes = [prefix for prefix in self.tables[kind]
+                if prefix is not None and port.startswith(prefix)]
+            table = dict(self.tables[kind][None])
+            if prefixes:
+                table.update(self.tables[kind][max(prefixes, key=len)])
+            resolved[kind] = table
+        self.resolved[port] = resolved
+        return resolved
+
+    def action(self, kind, port, number):
+        tables = self.resolved.get(port)
+        if tables is None:
+            tables = self.resolve(port)
+        table = tables[kind]
+        action = table.get(number)
+        if action is None:
+            action = table.get('*')
+        return action
+
+class ControlLimiter:
+    # the latest value of each control, let through at most once per interval
+    def __init__(self, interval):
+        self.interval = interval
+        self.pending = {}
+        self.last = {}
+        self.received = 0
+        self.applied = 0
+
+    def __repr__(self):
+        return "<ControlLimiter interval:%sms received:%s applied:%s pending:%s>" % (
+            round(1000 * self.interval), self.received, self.applied, len(self.pending))
+
+    def put(self, key, item):
+        self.pending[key] = item
+        self.received += 1
+
+    def ready(self, now):
+        ready = []
+        for key, item in self.pending.items():
+            if now - self.last.get(key, 0.0) >= self.interval:
+                ready.append((key, item))
+        for key, item in ready:
+            del self.pending[key]
+            self.last[key] = now
+        self.applied += len(ready)
+        return ready
+
+class MapWatcher(QObject):
+    # the mapping file that applies (None for the default map), each time
+    # it is chosen or its contents change
+    changed = pyqtSignal(object, object)
+
+    def __init__(self, station_path=os.path.join('data', MAP_NAME), debounce=300):
+        super().__init__()
+        self.station_path = station_path
+        self.show_path = None
+        self.path = None
+        self.contents = None
+        self.watcher = QFileSystemWatcher()
+        self.watcher.fileChanged.connect(self.file_changed)
+        self.watcher.directoryChanged.connect(self.file_changed)
+        self.timer = QTimer()
+        self.timer.setSingleShot(True)
+        self.timer.setInterval(debounce)
+        self.timer.timeout.connect(self.reload)
+
+    def set_show(self, show_folder):
+        self.show_path = None if show_folder is None else os.path.join(show_folder, MAP_NAME)
+        self.reload()
+
+    def candidates(self):
+        return [path for path in (self.show_path, self.station_path) if path is not None]
+
+    def file_changed(self, path):
+        self.timer.start()
+
+    def watch(self):
+        # the folders notice a map being created or replaced, the file an edit in place
+        paths = set()
+        for path in self.candidates():
+            paths.add(os.path.dirname(path) or '.')
+            if os.path.isfile(path):
+                paths.add(path)
+        old = set(self.watcher.files() + self.watcher.directories())
+        if old - paths:
+            self.watcher.removePaths(list(old - paths))
+        for path in paths - old:
+            if os.path.exists(path):
+                self.watcher.addPath(path)
+
+    def reload(self):
+        self.watch()
+        path = next((path for path in self.candidates() if os.path.isfile(path)), None)
+        try:
+            contents = None
+            if path is not None:
+                with open(path, 'r') as map_file:
+                    contents = map_file.read()
+        except OSError:
+            return
+        if path == self.path and contents == self.contents:
+            return
+        self.path = path
+        self.contents = contents
+        spec = DEFAULT_MAP if path is None else read_map(path)
+        if spec is not None:
+            self.changed.emit(spec, path)
@@ -0,0 +1,202 @@
+"""
+OSC egress
+
+- Outgoing
+- OSCEgress
+
+Every outgoing OSC message goes through one sender thread so nothing on
+the GUI thread ever blocks in sendto(). There are two lanes: HIGH for GO
+and /emergency, which goes out before anything waiting in NORMAL
+(transport, slider scrubbing, matrix changes) - except that a /fromsm in
+HIGH first lets out every NORMAL message queued before it, so a pause or
+a scrub sent before a GO is never applied on top of the new cue.
+
+Messages sent with a key replace any message with the same key that is
+still waiting, and take their place at the back of the queue, so
+scrubbing a position slider only ever has one /fromsm per bus waiting
+and it never overtakes what was sent after it. NORMAL is bounded; when
+it is full the oldest keyed message is dropped. Messages without a key
+are never dropped.
+
+Inside triggered(), the first message sent records the time from the
+trigger (e.g. a MIDI note coming in) to its sendto() in a histogram.
+"""
+
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from pythonosc import osc_message_builder
+from common.latency import LatencyHistogram
+
+HIGH = 0
+NORMAL = 1
+# HIGH messages to these addresses wait for the NORMAL ones queued before them
+ORDERED = ('/fromsm',)
+
+class Outgoing:
+    __slots__ = ('address', 'message', 'queued', 'triggers', 'key', 'lane', 'seq', 'after')
+
+    def __init__(self, address, message, queued, triggers, key):
+        self.address = address
+        self.message = message
+        self.queued = queued
+        self.triggers = triggers
+        self.key = key
+        self.lane = None
+        self.seq = 0
+        # NORMAL messages up to this sequence number go out first
+        self.after = None
+
+class OSCEgress:
+    def __init__(self, client=None, max_queued=256):
+        self.client = client
+        self.max_queued = max_queued
+
+        self.lock = threading.Lock()
+        self.ready = threading.Condition(self.lock)
+        self.lanes = (deque(), deque())
+        # key -> entry still waiting
+        self.keyed = {}
+        self.seq = 0
+        self.running = True
+        # (stamp, histogram) of a trigger no message has been sent for yet;
+        # GUI thread only
+        self.trigger = None
+
+        self.sent = 0
+        self.coalesced = 0
+        self.dropped = 0
+        self.errors = 0
+        self.max_depth = 0
+        self.latency = (LatencyHistogram('egress high lane'), LatencyHistogram('egress normal lane'))
+
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def __repr__(self):
+        return "<OSCEgress depth:%s max_depth:%s sent:%s coalesced:%s dropped:%s errors:%s %s %s>" % (
+            self.depth(), self.max_depth, self.sent, self.coalesced, self.dropped,
+            self.errors, self.latency[HIGH], self.latency[NORMAL])
+
+    def set_client(self, client):
+        with self.lock:
+            self.client = client
+
+    def depth(self):
+        return len(self.lanes[HIGH]) + len(self.lanes[NORMAL])
+
+    def send_message(self, address, value, lane=NORMAL, key=None):
+        # encoding happens on the sender thread
+        self.put(Outgoing(address, value, time.perf_counter(), self.triggers(), key), lane)
+
+    def send(self, message, lane=NORMAL, key=None, stamp=None, histogram=None):
+        # message is an already built OscMessage; if a histogram is given it
+        # records the time from stamp (e.g. a key press) to the sendto()
+        now = time.perf_counter()
+        triggers = self.triggers()
+        if histogram is not None:
+            triggers.append((stamp if stamp is not None else now, histogram))
+        self.put(Outgoing(None, message, now, triggers, key), lane)
+
+    @contextmanager
+    def triggered(self, stamp, histogram):
+        self.trigger = (stamp, histogram)
+        try:
+            yield
+        finally:
+            self.trigger = None
+
+    def triggers(self):
+        # what the next message has to record its latency in
+        if self.trigger is None:
+            return []
+        trigger, self.trigger = self.trigger, None
+        return [trigger]
+
+    def put(self, entry, lane):
+        key = entry.key
+        address = entry.message.address if entry.address is None else entry.address
+        with self.lock:
+            self.seq += 1
+            entry.seq = self.seq
+            entry.lane = lane
+            if key is not None:
+                waiting = self.keyed.get(key)
+                if waiting is not None:
+                    # the newer one goes to the back, and records for both
+                    self.lanes[waiting.lane].remove(waiting)
+                    entry.triggers = waiting.triggers + entry.triggers
+                    self.coalesced += 1
+                self.keyed[key] = entry
+            queue = self.lanes[lane]
+            if lane == HIGH and address in ORDERED and self.lanes[NORMAL]:
+                entry.after = self.lanes[NORMAL][-1].seq
+            if lane == NORMAL and len(queue) >= self.max_queued:
+                self.drop_keyed(queue)
+            queue.append(entry)
+            depth = len(self.lanes[HIGH]) + len(self.lanes[NORMAL])
+            if depth > self.max_depth:
+                self.max_depth = depth
+            self.ready.notify()
+
+    def drop_keyed(self, queue):
+        # the oldest message that a newer one would have replaced anyway
+        for stale in queue:
+            if stale.key is not None:
+                queue.remove(stale)
+                del self.keyed[stale.key]
+                self.dropped += 1
+                return
+
+    def run(self):
+        high, normal = self.lanes
+        while True:
+            with self.lock:
+                while self.running and not high and not normal:
+                    self.ready.wait()
+                if high and not (normal and high[0].after is not None and normal[0].seq <= high[0].after):
+                    entry, lane = high.popleft(), HIGH
+                elif normal:
+                    entry, lane = normal.popleft(), NORMAL
+                else:
+                    return
+                if entry.key is not None:
+                    del self.keyed[entry.key]
+                client = self.client
+            self.transmit(client, entry, lane)
+
+    def transmit(self, client, entry, lane):
+        address, message = entry.address, entry.message
+        try:
+            if address is not None:
+                message = build_message(address, message)
+            client.send(message)
+        except Exception as e:
+            self.errors += 1
+            if self.errors == 1:
+                print('OSC send error!', e)
+            return
+        now = time.perf_counter()
+        self.sent += 1
+        self.latency[lane].record(now - entry.queued)
+        for stamp, histogram in entry.triggers:
+            histogram.record(now - stamp)
+
+    def stop(self, timeout=1.0):
+        # lets whatever is queued go out first
+        with self.lock:
+            self.running = False
+            self.ready.notify()
+        self.thread.join(timeout)
+
+def build_message(address, value):
+    builder = osc_message_builder.OscMessageBuilder(address=address)
+    if value is None:
+        pass
+    elif isinstance(value, (list, tuple)):
+        for arg in value:
+            builder.add_arg(arg)
+    else:
+        builder.add_arg(value)
+    return builder.build()
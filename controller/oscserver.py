@@ -0,0 +1,211 @@
+"""
+OSC ingress
+
+- OSCRouter
+- OSCServer
+
+A single selector loop receives every datagram: no thread is started per
+packet. Each time the socket becomes readable it is drained in a batch of
+non-blocking reads and the parsed messages are handed straight to their
+handlers.
+
+Known addresses are routed through a table built once at startup, so
+/pos/A or /db/E/r resolve to a precomputed (handler, bus, channel) entry
+with one dict lookup. Anything else falls back to the dispatcher's
+pattern matching, and the result of that is cached per address.
+
+Every element of an OSC bundle is applied as one batch: the router runs
+the whole batch inside its atomic() context, the controls mailbox's lock.
+The meter rings take the same lock, and each frame collects the mailbox,
+the meter rings and the update bridge's queue while holding it, so the
+GUI never sees half a bundle, whether its elements are /pos, /db or
+/matrix. Bundles with a future timetag are held on a heap and released in
+timetag order when they fall due.
+
+A handler that raises (a message with missing or wrong arguments) is
+counted and the message dropped; the loop carries on with the next.
+"""
+
+import heapq
+import itertools
+import selectors
+import socket
+import threading
+import time
+from pythonosc import osc_packet, osc_bundle
+
+
+class OSCRouter:
+    def __init__(self, dispatcher, atomic=None, max_cached=1024):
+        self.dispatcher = dispatcher
+        self.atomic = atomic
+        self.routes = {}
+        self.cache = {}
+        self.max_cached = max_cached
+        self.errors = 0
+
+    def __repr__(self):
+        return "<OSCRouter routes:%s cached:%s errors:%s>" % (
+            len(self.routes), len(self.cache), self.errors)
+
+    def add_route(self, address, handler, *args):
+        # handler is called as handler(*args, *osc_args)
+        self.routes[address] = ((handler, args),)
+
+    def resolve(self, address):
+        route = self.routes.get(address)
+        if route is None:
+            route = self.cache.get(address)
+            if route is None:
+                route = self.match(address)
+                if len(self.cache) >= self.max_cached:
+                    self.cache.clear()
+                self.cache[address] = route
+        return route
+
+    def match(self, address):
+        # dispatcher handlers are called the python-osc way: (address, [args,] *osc_args)
+        route = []
+        for handler in self.dispatcher.handlers_for_address(address):
+            if handler.args:
+                route.append((handler.callback, (address, handler.args)))
+            else:
+                route.append((handler.callback, (address,)))
+        return tuple(route)
+
+    def dispatch(self, message):
+        # a bad message must not end the receive loop
+        try:
+            for callback, args in self.resolve(message.address):
+                callback(*args, *message)
+        except Exception as e:
+            self.errors += 1
+            if self.errors == 1:
+                print('OSC handler error!', message.address, e)
+
+    def dispatch_batch(self, messages):
+        if self.atomic is None:
+            for message in messages:
+                self.dispatch(message)
+        else:
+            with self.atomic():
+                for message in messages:
+                    self.dispatch(message)
+
+
+class OSCServer:
+    def __init__(self, server_address, dispatcher, batch_size=64, max_packet=65535):
+        self.router = dispatcher if isinstance(dispatcher, OSCRouter) else OSCRouter(dispatcher)
+        self.batch_size = batch_size
+        self.max_packet = max_packet
+
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        # give bursts of meter traffic somewhere to wait between drains
+        self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 1 << 20)
+        self.socket.bind(server_address)
+        self.socket.setblocking(False)
+        self.server_address = self.socket.getsockname()
+
+        # writing to this pair wakes the loop up so shutdown() is immediate
+        self.wakeup_recv, self.wakeup_send = socket.socketpair()
+        self.wakeup_recv.setblocking(False)
+
+        self.selector = selectors.DefaultSelector()
+        self.selector.register(self.socket, selectors.EVENT_READ)
+        self.selector.register(self.wakeup_recv, selectors.EVENT_READ)
+
+        self.running = False
+        self.stopped = threading.Event()
+        self.stopped.set()
+
+        # (timetag, sequence, message) for bundle elements that aren't due yet
+        self.held = []
+        self.sequence = itertools.count()
+
+        self.packets_received = 0
+        self.batches = 0
+        self.bundles_received = 0
+        self.parse_errors = 0
+
+    def __repr__(self):
+        return "<OSCServer %s:%s packets:%s batches:%s bundles:%s held:%s>" % (
+            self.server_address[0], self.server_address[1], self.packets_received,
+            self.batches, self.bundles_received, len(self.held))
+
+    def serve_forever(self):
+        self.running = True
+        self.stopped.clear()
+        try:
+            while self.running:
+                timeout = max(0.0, self.held[0][0] - time.time()) if self.held else None
+                for key, mask in self.selector.select(timeout):
+                    if key.fileobj is self.socket:
+                        self.drain()
+                    else:
+                        self.wakeup_recv.recv(64)
+                if self.held:
+                    self.release_held()
+        finally:
+            self.stopped.set()
+
+    def drain(self):
+        recvfrom = self.socket.recvfrom
+        max_packet = self.max_packet
+        packets = []
+        for i in range(self.batch_size):
+            try:
+                packets.append(recvfrom(max_packet))
+            except (BlockingIOError, InterruptedError):
+                break
+        if packets:
+            self.batches += 1
+            self.packets_received += len(packets)
+            for data, client_address in packets:
+                self.handle_packet(data, client_address)
+
+    def handle_packet(self, data, client_address):
+        try:
+            packet = osc_packet.OscPacket(data)
+        except osc_packet.ParseError:
+            self.parse_errors += 1
+            return
+        if not osc_bundle.OscBundle.dgram_is_bundle(data):
+            for timed_msg in packet.messages:
+                self.router.dispatch(timed_msg.message)
+            return
+
+        # messages come out sorted by time; anything in the past is stamped now
+        self.bundles_received += 1
+        now = time.time()
+        due = []
+        for timed_msg in packet.messages:
+            if timed_msg.time > now:
+                heapq.heappush(self.held, (timed_msg.time, next(self.sequence), timed_msg.message))
+            else:
+                due.append(timed_msg.message)
+        if due:
+            self.router.dispatch_batch(due)
+
+    def release_held(self):
+        held = self.held
+        now = time.time()
+        while held and held[0][0] <= now:
+            timetag = held[0][0]
+            batch = []
+            while held and held[0][0] == timetag:
+                batch.append(heapq.heappop(held)[2])
+            self.router.dispatch_batch(batch)
+
+    def shutdown(self):
+        self.running = False
+        try:
+            self.wakeup_send.send(b'\0')
+        except OSError:
+            pass
+        self.stopped.wait()
+
+    def server_close(self):
+        self.selector.close()
+        self.socket.close()
+        self.wakeup_recv.close()
+        self.wakeup_send.close()
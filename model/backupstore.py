@@ -0,0 +1,209 @@
+"""
+Deduplicated cue list backups
+
+- BackupStore
+
+Backups used to be full copies of cues.csv, nearly all of them one cue
+away from the one before. Here each line of a backup is stored once, by
+hash, in an append-only rows file, and a backup is just a manifest listing
+the hashes of its lines in order (zlib compressed if compress is set).
+Restoring a backup gives back the original file byte for byte.
+
+prune() applies the retention policy: everything from today, the last
+backup of each hour for the past week, and the last of each day before
+that. Rows no longer used by any manifest are dropped afterwards.
+"""
+
+import os
+import re
+import json
+import time
+import zlib
+import hashlib
+import threading
+
+STAMP_FORMAT = '%Y:%m:%d %H.%M.%S'
+HASH_LENGTH = 16
+
+
+def row_hash(row):
+    return hashlib.sha1(row).hexdigest()[:HASH_LENGTH]
+
+
+class BackupStore:
+    def __init__(self, path, compress=True, prune_every=3600):
+        # path is a show's backups folder
+        self.path = os.path.join(path, 'store')
+        self.compress = compress
+        self.prune_every = prune_every
+        self.lock = threading.RLock()
+        self.rows = None
+        self.last_prune = 0
+
+    def __repr__(self):
+        return "<BackupStore %s backups:%s rows:%s>" % (self.path, len(self.names()),
+            'not loaded' if self.rows is None else len(self.rows))
+
+    def rows_path(self):
+        return os.path.join(self.path, 'rows.dat')
+
+    def manifests_path(self):
+        return os.path.join(self.path, 'manifests')
+
+    def load_rows(self):
+        if self.rows is None:
+            self.rows = {}
+            if os.path.exists(self.rows_path()):
+                with open(self.rows_path(), 'rb') as file:
+                    for line in file:
+                        if not line.endswith(b'\n'):
+                            break # torn write at the tail
+                        digest, row = json.loads(line.decode())
+                        self.rows[digest] = row.encode('utf-8', 'surrogateescape')
+        return self.rows
+
+    def add(self, data, stamp=None):
+        # stores the bytes of a cues.csv; returns the backup's name
+        if stamp is None:
+            stamp = time.time()
+        with self.lock:
+            rows = self.load_rows()
+            os.makedirs(self.manifests_path(), exist_ok=True)
+            digests = []
+            new = []
+            for row in data.splitlines(keepends=True):
+                digest = row_hash(row)
+                if digest not in rows:
+                    rows[digest] = row
+                    new.append(json.dumps([digest, row.decode('utf-8', 'surrogateescape')]) + '\n')
+                digests.append(digest)
+            if new:
+                with open(self.rows_path(), 'ab') as file:
+                    file.write(''.join(new).encode())
+                    file.flush()
+                    os.fsync(file.fileno())
+
+            name = self.unique_name(name_from_stamp(stamp))
+            manifest = ('%s\n' % ' '.join(digests)).encode()
+            if self.compress:
+                manifest = zlib.compress(manifest)
+            with open(os.path.join(self.manifests_path(), name + self.extension()), 'wb') as file:
+                file.write(manifest)
+
+            if self.prune_every is not None and time.time() - self.last_prune > self.prune_every:
+                self.prune()
+            return name
+
+    def extension(self):
+        return '.manifest.z' if self.compress else '.manifest'
+
+    def unique_name(self, stem):
+        name = stem
+        n = 1
+        while self.exists(name):
+            n += 1
+            name = '%s (%i)' % (stem, n)
+        return name
+
+    def exists(self, name):
+        return any(os.path.exists(os.path.join(self.manifests_path(), name + extension))
+            for extension in ('.manifest.z', '.manifest'))
+
+    def manifest_files(self):
+        # name -> file name, for every backup in the store
+        files = {}
+        if os.path.isdir(self.manifests_path()):
+            for file_name in os.listdir(self.manifests_path()):
+                for extension in ('.manifest.z', '.manifest'):
+                    if file_name.endswith(extension):
+                        files[file_name[:-len(extension)]] = file_name
+                        break
+        return files
+
+    def names(self):
+        return sorted(self.manifest_files(), key=stamp_from_name)
+
+    def digests(self, name):
+        file_name = self.manifest_files()[name]
+        with open(os.path.join(self.manifests_path(), file_name), 'rb') as file:
+            manifest = file.read()
+        if file_name.endswith('.z'):
+            manifest = zlib.decompress(manifest)
+        return manifest.decode().split()
+
+    def restore(self, name):
+        with self.lock:
+            rows = self.load_rows()
+            return b''.join(rows[digest] for digest in self.digests(name))
+
+    def prune(self, now=None):
+        # returns the names of the backups removed
+        if now is None:
+            now = time.time()
+        with self.lock:
+            self.last_prune = now
+            files = self.manifest_files()
+            keep = retained(files, now)
+            doomed = [name for name in files if name not in keep]
+            for name in doomed:
+                os.remove(os.path.join(self.manifests_path(), files[name]))
+            if doomed:
+                self.collect_garbage()
+            return doomed
+
+    def collect_garbage(self):
+        # rewrites the rows file without rows that no manifest uses
+        with self.lock:
+            rows = self.load_rows()
+            used = set()
+            for name in self.names():
+                used.update(self.digests(name))
+            if len(used) == len(rows):
+                return
+            tmp_path = self.rows_path() + '.tmp'
+            with open(tmp_path, 'wb') as file:
+                for digest, row in rows.items():
+                    if digest in used:
+                        file.write((json.dumps([digest, row.decode('utf-8', 'surrogateescape')]) + '\n').encode())
+                file.flush()
+                os.fsync(file.fileno())
+            os.replace(tmp_path, self.rows_path())
+            self.rows = {digest: row for digest, row in rows.items() if digest in used}
+
+    def size(self):
+        # bytes on disk used by the store
+        total = 0
+        for folder, dirs, files in os.walk(self.path):
+            for file_name in files:
+                total += os.path.getsize(os.path.join(folder, file_name))
+        return total
+
+def stamp_from_name(name):
+    # older backups have no colons in the date, or have the private use
+    # character that colons become when copied through some file servers
+    name = name.replace('\uf022', ':')
+    m = re.match(r'cues (\d{4}):?(\d\d):?(\d\d) (\d+\.\d+\.\d+)(?: \((\d+)\))?', name)
+    if m is None:
+        return (0, 0)
+    stamp = time.strptime('%s:%s:%s %s' % m.group(1, 2, 3, 4), STAMP_FORMAT)
+    return (time.mktime(stamp), int(m.group(5) or 1))
+
+def name_from_stamp(stamp):
+    return 'cues ' + time.strftime(STAMP_FORMAT, time.localtime(stamp))
+
+def retained(names, now):
+    # keeps all of today, the newest of each hour for a week, then the newest of each day
+    today = time.localtime(now)[:3]
+    keep = set()
+    newest = {}
+    for name in sorted(names, key=stamp_from_name):
+        stamp = stamp_from_name(name)[0]
+        when = time.localtime(stamp)
+        if when[:3] == today:
+            keep.add(name)
+        elif now - stamp < 7 * 24 * 3600:
+            newest[when[:4]] = name
+        else:
+            newest[when[:3]] = name
+    keep.update(newest.values())
+    return keep
@@ -6,18 +6,19 @@ CueList model classes
 - BusCue
 - AudioRouting
 - Cue
+- TrackedState
 - CueList
 
 Author: Eric Sluyter
 Last edited: July 2018
 """
 
-import os
-import time
-import csv
 import re
+import csv
+from pythonosc import osc_message_builder
 from common.publisher import Publisher
-from common.util import *
+from model.persistence import Persistence, CLEAN
+from model.pseq import PSeq
 
 
 class Media:
@@ -43,10 +44,15 @@ class BusState(Publisher):
         return "BusState(%s, %s, %s, %s, %s)" % (self.index, self.media_index, self.pos, self.speed, self.active)
 
     def set_pos(self, pos):
-        if self.active:
-            if self.pos != pos:
-                self.pos = pos
-                self.changed('pos', self.index)
+        if self.update_pos(pos):
+            self.changed('pos', self.index)
+
+    def update_pos(self, pos):
+        # same as set_pos but leaves notifying to the caller
+        if self.active and self.pos != pos:
+            self.pos = pos
+            return True
+        return False
 
     def set_from_cue(self, media_index, pos, speed):
         if media_index is not None:
@@ -63,17 +69,60 @@ class BusState(Publisher):
             self.active = True
         self.changed('pos', self.index)
         self.changed('media', self.index)
+        # only when the cue tells the bus how to play: a stopped, started or
+        # newly loaded bus, or a speed
+        if media_index is not None or speed is not None:
+            self.changed('speed', self.index)
         self.changed('active', self.index)
 
+# a show repeats the same few values and routings over and over, so cues
+# parsed from csv share one object per distinct string
+SHARED_LIMIT = 4096
+shared_values = {}
+shared_buses = {}
+shared_routings = {}
+
+# where each part of a cue sits in a cues.csv row
+NAME = 0
+BUS_FIELDS = [slice(1 + 6 * j, 7 + 6 * j) for j in range(5)]
+NOTES = 31
+ROUTING = 32
+
+def parse_value(value, kind):
+    if value is None or value == 'n':
+        return None
+    if type(value) is not str:
+        return kind(value)
+    key = (value, kind)
+    parsed = shared_values.get(key)
+    if parsed is None:
+        parsed = kind(value)
+        if len(shared_values) < SHARED_LIMIT:
+            shared_values[key] = parsed
+    return parsed
+
 class BusCue:
+    __slots__ = ('media_index', 'pos', 'speed', 'ramp_time', 'zoom', 'db')
+
     def __init__(self, media_index=None, pos=None, speed=None, ramp_time=None,
             zoom=None, db=None):
-        self.media_index = None if media_index == 'n' or media_index is None else int(media_index)
-        self.pos = None if pos == 'n' or pos is None else float(pos)
-        self.speed = None if speed == 'n' or speed is None else float(speed)
-        self.ramp_time = None if ramp_time == 'n' or ramp_time is None else float(ramp_time)
-        self.zoom = None if zoom == 'n' or zoom is None else float(zoom)
-        self.db = None if db == 'n' or db is None else float(db)
+        self.media_index = parse_value(media_index, int)
+        self.pos = parse_value(pos, float)
+        self.speed = parse_value(speed, float)
+        self.ramp_time = parse_value(ramp_time, float)
+        self.zoom = parse_value(zoom, float)
+        self.db = parse_value(db, float)
+
+    @classmethod
+    def from_csv_fields(cls, fields):
+        # treated as immutable, so buses with the same six fields share one object
+        key = tuple(fields)
+        bus = shared_buses.get(key)
+        if bus is None:
+            bus = cls(*key)
+            if len(shared_buses) < SHARED_LIMIT:
+                shared_buses[key] = bus
+        return bus
 
     def __repr__(self):
         return "BusCue(%s, %s, %s, %s, %s, %s)" % (self.media_index, self.pos,
@@ -94,51 +143,129 @@ class BusCue:
             'n']
 
 class AudioRouting:
-    def __init__(self, matrix_state=None):
-        if matrix_state is None:
-            self.matrix_state = make_2d_list(5, 6, False)
-        else:
-            self.matrix_state = matrix_state
+    # 5 buses x 6 outputs, one bit each: bus i to output j is bit i * 6 + j.
+    # Treated as immutable, so equal routings can share one object.
+    __slots__ = ('bits',)
+
+    def __init__(self, matrix_state=None, bits=0):
+        if matrix_state is not None:
+            bits = 0
+            for i, row in enumerate(matrix_state):
+                for j, state in enumerate(row):
+                    if state:
+                        bits |= 1 << (i * 6 + j)
+        self.bits = bits
 
     @classmethod
     def from_csv_string(cls, string):
-        matrix_state = make_2d_list(5, 6, False)
-        for cell in clump(string.split(' '), 3):
-            if (cell[0] != ''):
-                row = int(cell[0])
-                col = int(cell[1])
-                state = cell[2] == '1'
-                matrix_state[row][col] = state
-        return cls(matrix_state)
+        routing = shared_routings.get(string)
+        if routing is None:
+            bits = 0
+            cells = string.split(' ')
+            for k in range(0, len(cells) - 2, 3):
+                if cells[k + 2] == '1':
+                    bits |= 1 << (int(cells[k]) * 6 + int(cells[k + 1]))
+            routing = cls(bits=bits)
+            if len(shared_routings) < SHARED_LIMIT:
+                shared_routings[string] = routing
+        return routing
+
+    @property
+    def matrix_state(self):
+        return [[self.at(i, j) for j in range(6)] for i in range(5)]
 
     def to_csv_string(self):
         list = []
         for j in range(6):
             for i in range(5):
-                int = 1 if self.matrix_state[i][j] else 0
+                int = 1 if self.at(i, j) else 0
                 list.append('%i %i %i' % (i, j, int))
         return ' '.join(list)
 
     def __repr__(self):
         return "AudioRouting(%s)" % self.matrix_state
 
+    def __eq__(self, other):
+        return isinstance(other, AudioRouting) and self.bits == other.bits
+
+    def __hash__(self):
+        return hash(self.bits)
+
     def at(self, row, col):
-        return self.matrix_state[row][col]
+        return (self.bits >> (row * 6 + col)) & 1 == 1
+
+    def diff(self, other):
+        # the cells that differ between the two, as a routing
+        return AudioRouting(bits=self.bits ^ other.bits)
+
+    def cells(self):
+        return [(i, j) for i in range(5) for j in range(6) if self.at(i, j)]
+
+def build_osc_message(address, args):
+    builder = osc_message_builder.OscMessageBuilder(address=address)
+    for arg in args:
+        builder.add_arg(arg)
+    return builder.build()
 
 class Cue:
+    # row is the undecoded csv row of a lazy cue, see lazy()
+    __slots__ = ('name', 'buses', 'notes', 'audio_routing', 'osc_cache', 'row')
+
     def __init__(self, name='', buses=None, notes='', audio_routing=None):
         self.name = name
-        self.buses = [BusCue() for i in range(5)] if buses is None else buses
+        self.buses = tuple(BusCue() for i in range(5)) if buses is None else tuple(buses)
         self.notes = notes
         self.audio_routing = AudioRouting() if audio_routing is None else audio_routing
+        self.osc_cache = None
+        self.row = None
 
     @classmethod
     def from_csv_row(cls, csv_row):
-        name = csv_row.pop(0)
-        buses = [BusCue(*[csv_row.pop(0) for i in range(6)]) for j in range(5)]
-        notes = csv_row.pop(0)
-        audio_routing = AudioRouting.from_csv_string(csv_row.pop(0))
-        return cls(name, buses, notes, audio_routing)
+        cue = cls.lazy(csv_row)
+        cue.decode()
+        return cue
+
+    @classmethod
+    def lazy(cls, csv_row):
+        # name and notes now, buses and routing the first time they are used
+        cue = cls.__new__(cls)
+        cue.name = csv_row[NAME]
+        cue.notes = csv_row[NOTES]
+        cue.osc_cache = None
+        cue.row = csv_row
+        return cue
+
+    def __getattr__(self, attr):
+        # only called for unset slots, i.e. the undecoded part of a lazy cue
+        if attr in ('buses', 'audio_routing') and self.row is not None:
+            self.decode()
+            return getattr(self, attr)
+        raise AttributeError(attr)
+
+    def decode(self):
+        row = self.row
+        try:
+            buses = tuple(BusCue.from_csv_fields(row[fields]) for fields in BUS_FIELDS)
+            audio_routing = AudioRouting.from_csv_string(row[ROUTING])
+        except (ValueError, IndexError) as e:
+            # rows are checked when the show is read, so only a damaged
+            # cache gets here; a blank cue beats an exception mid-show
+            print('Bad cue %r, left blank: %s' % (self.name, e))
+            buses = tuple(BusCue() for i in range(5))
+            audio_routing = AudioRouting()
+        self.buses = buses
+        self.audio_routing = audio_routing
+        self.row = None
+
+    @staticmethod
+    def check_row(row):
+        # raises ValueError where decode() would fail; the shared buses and
+        # routings it makes on the way are reused by the decode later
+        if len(row) <= ROUTING:
+            raise ValueError('%d fields, expected %d' % (len(row), ROUTING + 1))
+        for fields in BUS_FIELDS:
+            BusCue.from_csv_fields(row[fields])
+        AudioRouting.from_csv_string(row[ROUTING])
 
     def to_csv_row(self):
         list = [self.name]
@@ -147,83 +274,224 @@ class Cue:
         list += [self.notes, self.audio_routing.to_csv_string()]
         return list
 
+    def to_osc_array(self):
+        data = []
+        for bus in self.buses:
+            data += bus.to_osc_array()
+        data += [' ' for i in range(5)]
+        data.append(self.audio_routing.to_csv_string())
+        return data
+
+    def osc_messages(self):
+        # encoded once and kept until the cue is edited; see invalidate()
+        if self.osc_cache is None:
+            self.osc_cache = (build_osc_message('/fromsm', self.to_osc_array()),
+                build_osc_message('/cuename', [self.name]))
+        return self.osc_cache
+
+    def invalidate(self):
+        self.osc_cache = None
+
+    def renamed(self, name):
+        # a lazy cue's copy shares its csv row rather than decoding it
+        if self.row is not None:
+            cue = Cue.lazy(self.row)
+            cue.name = name
+            return cue
+        return Cue(name, self.buses, self.notes, self.audio_routing)
 
     def __repr__(self):
         return "Cue('%s', %s, '%s', %s)" % (self.name, self.buses, self.notes,
             self.audio_routing)
 
+def track(state, cue):
+    # state is five (media, pos, speed, ramp, zoom, db) tuples, None where
+    # nothing has set the field yet; same rules as BusState.set_from_cue
+    new_state = []
+    for old, bus in zip(state, cue.buses):
+        media, pos, speed, ramp, zoom, db = old
+        if bus.media_index is not None:
+            media = bus.media_index
+        if bus.media_index == 0:
+            pos, speed = 0.0, 0.0
+        elif media:
+            if bus.pos is not None:
+                pos = bus.pos
+            if bus.speed is not None:
+                speed = bus.speed
+        if bus.ramp_time is not None:
+            ramp = bus.ramp_time
+        if bus.zoom is not None:
+            zoom = bus.zoom
+        if bus.db is not None:
+            db = bus.db
+        new_state.append((media, pos, speed, ramp, zoom, db))
+    return tuple(new_state)
+
+class TrackedState:
+    # The state of every bus once a cue has run, as if the show had been run
+    # in order from the top: a field left as 'n' keeps whatever the last cue
+    # to set it said. The state before every k-th cue is kept, so a lookup
+    # replays at most k cues and an edit drops only the checkpoints after it.
+    # Routings are not tracked, each cue already has a complete one.
+    NOTHING = ((None,) * 6,) * 5
+
+    def __init__(self, cuelist, k=32):
+        self.cuelist = cuelist
+        self.k = k
+        # checkpoints[m] is the state before cue m * k
+        self.checkpoints = [self.NOTHING]
+        self.cached = None
+
+    def __repr__(self):
+        return "<TrackedState k:%s checkpoints:%s>" % (self.k, len(self.checkpoints))
+
+    def invalidate(self, index=0):
+        # cue index and everything after it may have changed
+        del self.checkpoints[index // self.k + 1:]
+        if self.cached is not None and self.cached[0] >= index:
+            self.cached = None
+
+    def state_at(self, index):
+        cues = self.cuelist.cues
+        m = min(index // self.k, len(self.checkpoints) - 1)
+        state = self.checkpoints[m]
+        for i in range(m * self.k, index + 1):
+            if i == len(self.checkpoints) * self.k:
+                self.checkpoints.append(state)
+            state = track(state, cues[i])
+        return state
+
+    def cue_at(self, index):
+        # cue index with every field filled in from the tracked state
+        if self.cached is None or self.cached[0] != index:
+            cue = self.cuelist.cues[index]
+            buses = [BusCue(media, pos, speed, 0.0 if ramp is None and speed is not None else ramp,
+                zoom, db) for media, pos, speed, ramp, zoom, db in self.state_at(index)]
+            self.cached = (index, Cue(cue.name, buses, cue.notes, cue.audio_routing))
+        return self.cached[1]
+
+def read_cues(csv_lines, lazy=True):
+    # cues from the lines of a cues.csv, one at a time
+    rows = csv.reader(csv_lines)
+    next(rows, None) #skip header row
+    for row in rows:
+        yield Cue.lazy(row) if lazy else Cue.from_csv_row(row)
+
+def journal_record(op):
+    kind, index, arg = op
+    if kind == 'insert' or kind == 'replace':
+        return {'op': kind, 'index': index, 'row': arg.to_csv_row()}
+    if kind == 'delete':
+        return {'op': 'delete', 'index': index}
+    if kind == 'move':
+        return {'op': 'move', 'from': index, 'to': arg}
+    if kind == 'rename':
+        return {'op': 'rename', 'index': index, 'name': arg}
+
+# the entry tuple, its two ops and the PSeq of the new version
+HISTORY_ENTRY_BYTES = 300
+
+def history_cost(entry):
+    # estimated memory an undo step keeps alive; a move copies two paths
+    op, cues = entry[2], entry[4]
+    paths = 2 if op[0] == 'move' else 1
+    return HISTORY_ENTRY_BYTES + paths * cues.path_bytes()
+
 class CueList(Publisher):
     def __init__(self, path=None, rwff_speed=8.0):
         super().__init__()
         self.role = 'model'
+        # started with the first show that has a path; owns all file I/O
+        self.persistence = None
         self.bus_states = [BusState(i) for i in range(5)]
         self.current_routing = AudioRouting()
         self.rwff_speed = rwff_speed
+        # each entry: (cues before, pointer before, op, inverse op, cues after, pointer after)
+        self.undo_stack = []
+        self.redo_stack = []
+        # the oldest undo steps are let go past about this many bytes
+        self.max_history_bytes = 4000000
+        self.history_bytes = 0
+        self.tracked = TrackedState(self)
         self.load_path(path)
 
     def __repr__(self):
         return "<CueList path:'%s', fire_on_update:%s, media_info:%s, bus_states:%s, current_routing:%s, cues:%s>" % (self.path, self.fire_on_update, self.media_info, self.bus_states, self.current_routing, self.cues)
 
     def load_path(self, path):
+        # on failure the worker reports it and the old show stays open
+        rows, media_text = None, None
+        if path is not None or self.persistence is not None:
+            try:
+                rows, media_text = self.start_persistence().load(path)
+            except (OSError, ValueError):
+                return
         self.path = path
         self.changed('path', path)
         self.cue_pointer = 0
-        self.load_media_info()
-        self.load_cues()
+        self.load_media_info(media_text)
+        self.load_cues(rows)
+
+    def start_persistence(self):
+        if self.persistence is None:
+            self.persistence = Persistence(Cue('BLANK').to_csv_row(),
+                lambda state: self.changed('save_state', state),
+                lambda message: self.changed('save_failed', message),
+                check_row=Cue.check_row)
+        return self.persistence
+
+    def save_state(self):
+        return CLEAN if self.persistence is None else self.persistence.state
 
     def default_cue(self):
-        self.cues = [Cue('BLANK', [BusCue() for i in range(5)], '', AudioRouting())]
+        self.cues = PSeq([Cue('BLANK', [BusCue() for i in range(5)], '', AudioRouting())])
 
-    def load_cues(self):
-        if self.path is None:
+    def load_cues(self, rows=None):
+        if rows is None:
             self.default_cue()
         else:
-            self.cues = []
-            with open(os.path.join(self.path, 'cues.csv'), 'r', newline='') as csv_file:
-                reader = csv.reader(csv_file)
-                next(reader) #skip header row
-                for row in reader:
-                    self.cues.append(Cue.from_csv_row(row))
+            self.cues = PSeq(Cue.lazy(row) for row in rows)
+        self.tracked.invalidate()
+        self.undo_stack = []
+        self.redo_stack = []
+        self.history_bytes = 0
         self.changed('cues')
+        self.changed('history')
 
-    def write_backup(self):
-        os.rename(os.path.join(self.path, 'cues.csv'),
-            os.path.join(self.path, 'backups/cues ' + time.strftime('%Y:%m:%d %H.%M.%S') + '.csv'))
-
-    def write_cues(self):
-        header = 'Cue,A media,A pos,A speed,A ramp,A zoom,A db,B media,B pos,B speed,B ramp,B zoom,B db,C media,C pos,C speed,C ramp,C zoom,C db,D media,D pos,D speed,D ramp,D zoom,D db,E media,E pos,E speed,E ramp,E zoom,E db,Notes,Matrix\n'
-
-        with open(os.path.join(self.path, 'cues.csv'), 'w', newline='') as csv_file:
-            csv_file.write(header)
-            writer = csv.writer(csv_file)
-            for cue in self.cues:
-                writer.writerow(cue.to_csv_row())
-
-    def write_if_path(self):
+    def write_if_path(self, op):
         if self.path is None:
             self.changed('unsaved_changes')
         else:
-            self.write_backup()
-            self.write_cues()
+            self.persistence.edit(journal_record(op))
 
     def save_as(self, path):
+        # on failure the worker reports it and the old show stays open
+        try:
+            self.start_persistence().save_as(path, [cue.to_csv_row() for cue in self.cues],
+                self.media_info_text())
+        except (OSError, ValueError):
+            return
         self.path = path
-        os.mkdir(path)
-        os.mkdir(os.path.join(path, 'backups'))
-        self.write_cues()
-        self.write_media_info()
 
-    def load_media_info(self):
+    def close(self, timeout=None):
+        # flushes everything to disk; returns False if that took longer than timeout
+        if self.persistence is None:
+            return True
+        done = self.persistence.stop(timeout)
+        self.persistence = None
+        return done
+
+    def load_media_info(self, media_text=None):
         self.media_info = {0: Media('BLANK', 0)}
-        if self.path is not None:
-            with open(os.path.join(self.path, 'mediainfo.txt'), 'r') as file:
-                for line in file:
-                    m = re.split(r'(\d+), "([^"]+)" ([\d\.]+);', line)
-                    if len(m) > 3:
-                        index = int(m[1])
-                        name = m[2]
-                        duration = float(m[3])
-                        self.media_info[index] = Media(name, duration)
+        if media_text is not None:
+            for line in media_text.splitlines():
+                m = re.split(r'(\d+), "([^"]+)" ([\d\.]+);', line)
+                if len(m) > 3:
+                    index = int(m[1])
+                    name = m[2]
+                    duration = float(m[3])
+                    self.media_info[index] = Media(name, duration)
         self.changed('media_info')
 
     def update_media_info(self, data):
@@ -237,11 +505,19 @@ class CueList(Publisher):
         self.write_media_info()
         self.changed('media_info')
 
+    def media_info_text(self):
+        return ''.join('%i, "%s" %f;\n' % (i, media.name, media.duration)
+            for i, media in self.media_info.items())
+
     def write_media_info(self):
         if self.path is not None:
-            with open(os.path.join(self.path, 'mediainfo.txt'), 'w') as media_file:
-                for i, media in self.media_info.items():
-                    media_file.write('%i, "%s" %f;\n' % (i, media.name, media.duration))
+            self.persistence.write_media_info(self.media_info_text())
+
+    def set_positions(self, positions):
+        # positions is a dict {bus: pos}; one notification covers all of them
+        moved = [bus for bus, pos in positions.items() if self.bus_states[bus].update_pos(pos)]
+        if moved:
+            self.changed('positions', moved)
 
     def goto_cue(self, index):
         self.cue_pointer = index % len(self.cues)
@@ -250,6 +526,9 @@ class CueList(Publisher):
     def current_cue(self):
         return self.cues[self.cue_pointer]
 
+    def tracked_cue(self):
+        return self.tracked.cue_at(self.cue_pointer)
+
     def increment_cue(self):
         self.cue_pointer = (self.cue_pointer + 1) % len(self.cues)
         self.changed('cue_pointer')
@@ -259,63 +538,112 @@ class CueList(Publisher):
         self.changed('cue_pointer')
 
     def replace_current_cue(self, cue):
-        self.cues[self.cue_pointer] = cue
-        self.changed('cues')
-        self.write_if_path()
+        index = self.cue_pointer
+        old = self.current_cue()
+        old.invalidate()
+        self.edit(('replace', index, cue), ('replace', index, old),
+            self.cues.set(index, cue), index)
 
     def add_cue_after_current(self, cue):
-        self.cue_pointer += 1
-        self.cues.insert(self.cue_pointer, cue)
-        self.changed('cues')
-        self.write_if_path()
+        self.insert_cue(self.cue_pointer + 1, cue)
 
     def add_cue_before_current(self, cue):
-        self.cues.insert(self.cue_pointer, cue)
-        self.changed('cues')
-        self.write_if_path()
+        self.insert_cue(self.cue_pointer, cue)
 
     def add_empty_cue_after_current(self, name):
-        self.cue_pointer += 1
-        self.cues.insert(self.cue_pointer, Cue(name))
-        self.changed('cues')
-        self.write_if_path()
+        self.insert_cue(self.cue_pointer + 1, Cue(name))
 
     def add_empty_cue_before_current(self, name):
-        self.cues.insert(self.cue_pointer, Cue(name))
-        self.changed('cues')
-        self.write_if_path()
+        self.insert_cue(self.cue_pointer, Cue(name))
+
+    def insert_cue(self, index, cue):
+        self.edit(('insert', index, cue), ('delete', index, cue),
+            self.cues.insert(index, cue), index)
 
     def rename_current_cue(self, name):
-        self.current_cue().name = name
-        self.changed('cue_name')
-        self.write_if_path()
+        # a renamed copy, so that the cue in older versions keeps its name
+        index = self.cue_pointer
+        old = self.current_cue()
+        self.edit(('rename', index, name), ('rename', index, old.name),
+            self.cues.set(index, old.renamed(name)), index)
 
     def move_current_cue(self, index):
-        cue = self.current_cue()
-        del self.cues[self.cue_pointer]
-        self.cue_pointer = index
-        self.cues.insert(index, cue)
-        self.changed('cues')
-        self.write_if_path()
+        old_index = self.cue_pointer
+        self.edit(('move', old_index, index), ('move', index, old_index),
+            self.cues.move(old_index, index), index)
 
     def delete_current_cue(self):
-        del self.cues[self.cue_pointer]
-        if len(self.cues) == 0:
-            self.default_cue()
-        if self.cue_pointer == len(self.cues):
-            self.cue_pointer -= 1
-        self.changed('cues')
-        self.write_if_path()
-
-    def fire_current_cue(self, increment=False):
-        cue = self.current_cue()
-        name = cue.name
-        data = []
+        index = self.cue_pointer
+        old = self.current_cue()
+        if len(self.cues) == 1:
+            blank = Cue('BLANK')
+            self.edit(('replace', 0, blank), ('replace', 0, old), self.cues.set(0, blank), 0)
+        else:
+            self.edit(('delete', index, old), ('insert', index, old), self.cues.delete(index),
+                min(index, len(self.cues) - 2))
+
+    def edit(self, op, inverse, cues, pointer):
+        # every edit comes through here; op and inverse are (kind, index, arg)
+        entry = (self.cues, self.cue_pointer, op, inverse, cues, pointer)
+        self.undo_stack.append(entry)
+        self.history_bytes += history_cost(entry)
+        while self.history_bytes > self.max_history_bytes and len(self.undo_stack) > 1:
+            self.history_bytes -= history_cost(self.undo_stack.pop(0))
+        self.redo_stack = []
+        self.apply_edit(cues, pointer, op)
+
+    def undo(self):
+        if self.undo_stack:
+            entry = self.undo_stack.pop()
+            self.history_bytes -= history_cost(entry)
+            self.redo_stack.append(entry)
+            cues, pointer, op, inverse = entry[:4]
+            self.apply_edit(cues, pointer, inverse)
+
+    def redo(self):
+        if self.redo_stack:
+            entry = self.redo_stack.pop()
+            self.history_bytes += history_cost(entry)
+            self.undo_stack.append(entry)
+            op, inverse, cues, pointer = entry[2:]
+            self.apply_edit(cues, pointer, op)
+
+    def can_undo(self):
+        return len(self.undo_stack) > 0
+
+    def can_redo(self):
+        return len(self.redo_stack) > 0
+
+    def apply_edit(self, cues, pointer, op):
+        # switches to another version of the list; op says what changed
+        old_cue = self.current_cue()
+        old_pointer = self.cue_pointer
+        self.cues = cues
+        self.cue_pointer = pointer
+        kind, index, arg = op
+        self.tracked.invalidate(min(index, arg) if kind == 'move' else index)
+        if kind == 'insert':
+            self.changed('cue_inserted', index)
+        elif kind == 'delete':
+            self.changed('cue_removed', index)
+        elif kind == 'move':
+            self.changed('cue_moved', (index, arg))
+        elif kind == 'replace':
+            self.changed('cue_replaced', index)
+        elif kind == 'rename':
+            self.changed('cue_name', index)
+        if pointer != old_pointer or (kind != 'rename' and self.current_cue() is not old_cue):
+            self.changed('cue_pointer')
+        self.changed('history')
+        self.write_if_path(op)
+
+    def fire_current_cue(self, increment=False, tracked=False):
+        # returns the ready-to-send /fromsm and /cuename messages; tracked
+        # fires the whole state the show would be in at this cue
+        cue = self.tracked_cue() if tracked else self.current_cue()
+        messages = cue.osc_messages()
         for i, bus in enumerate(cue.buses):
-            data += bus.to_osc_array()
             self.bus_states[i].set_from_cue(bus.media_index, bus.pos, bus.speed)
-        data += [' ' for i in range(5)]
-        data.append(cue.audio_routing.to_csv_string())
         if increment:
             self.increment_cue()
-        return (name, data)
+        return messages
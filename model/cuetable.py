@@ -0,0 +1,209 @@
+"""
+Columnar cue table
+
+- CueTable
+
+An optional NumPy view of a CueList for show-wide questions ("which cues
+use media 22 on bus C", "how much of each media do we play", "which cues
+start a bus too close to the end of its media"). Each BusCue field is an
+(n, 5) array with a matching boolean array that is False where the csv
+says 'n'; routings are one uint32 bitmask per cue. The table subscribes to
+the CueList and applies each cue_inserted / cue_removed / cue_moved /
+cue_replaced in place, so it never has to be rebuilt after an edit.
+
+Queries that depend on what came before (the media a bus is actually
+playing when a cue only sets pos) forward-fill down the list, i.e. they
+assume the cues are run in order.
+
+Needs numpy; the rest of the app does not.
+"""
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+FIELDS = ('media_index', 'pos', 'speed', 'ramp_time', 'zoom', 'db')
+
+
+class CueTable:
+    def __init__(self, cuelist, capacity=64):
+        if np is None:
+            raise ImportError('CueTable needs numpy')
+        self.cuelist = cuelist
+        self.n = 0
+        self.values = {field: np.zeros((capacity, 5), np.int32 if field == 'media_index' else np.float64)
+            for field in FIELDS}
+        self.present = {field: np.zeros((capacity, 5), bool) for field in FIELDS}
+        self.routing = np.zeros(capacity, np.uint32)
+        self.rebuild()
+        cuelist.register(self)
+
+    def __repr__(self):
+        return "<CueTable cues:%s capacity:%s>" % (self.n, len(self.routing))
+
+    def __len__(self):
+        return self.n
+
+    def close(self):
+        self.cuelist.unregister(self)
+
+    def model_update(self, what, etc=None):
+        if what == 'cues':
+            self.rebuild()
+        elif what == 'cue_inserted':
+            self.insert(etc, self.cuelist.cues[etc])
+        elif what == 'cue_removed':
+            self.remove(etc)
+        elif what == 'cue_moved':
+            self.move(*etc)
+        elif what == 'cue_replaced':
+            self.fill(etc, self.cuelist.cues[etc])
+
+    def arrays(self):
+        return list(self.values.values()) + list(self.present.values()) + [self.routing]
+
+    def reserve(self, n):
+        capacity = len(self.routing)
+        if n <= capacity:
+            return
+        while capacity < n:
+            capacity *= 2
+        for table in (self.values, self.present):
+            for field, array in table.items():
+                grown = np.zeros((capacity, 5), array.dtype)
+                grown[:self.n] = array[:self.n]
+                table[field] = grown
+        grown = np.zeros(capacity, np.uint32)
+        grown[:self.n] = self.routing[:self.n]
+        self.routing = grown
+
+    def rebuild(self):
+        cues = self.cuelist.cues
+        self.n = 0
+        self.reserve(len(cues))
+        self.n = n = len(cues)
+        # one list per field rather than one numpy write per value
+        buses = [bus for cue in cues for bus in cue.buses]
+        for field in FIELDS:
+            column = [getattr(bus, field) for bus in buses]
+            self.present[field][:n] = np.fromiter((value is not None for value in column),
+                bool, len(column)).reshape(n, 5)
+            self.values[field][:n] = np.array([0 if value is None else value for value in column],
+                self.values[field].dtype).reshape(n, 5)
+        self.routing[:n] = [cue.audio_routing.bits for cue in cues]
+
+    def fill(self, i, cue):
+        for field in FIELDS:
+            values = self.values[field][i]
+            present = self.present[field][i]
+            for b, bus in enumerate(cue.buses):
+                value = getattr(bus, field)
+                present[b] = value is not None
+                values[b] = 0 if value is None else value
+        self.routing[i] = cue.audio_routing.bits
+
+    def insert(self, i, cue):
+        self.reserve(self.n + 1)
+        for array in self.arrays():
+            array[i + 1:self.n + 1] = array[i:self.n]
+        self.n += 1
+        self.fill(i, cue)
+
+    def remove(self, i):
+        for array in self.arrays():
+            array[i:self.n - 1] = array[i + 1:self.n]
+        self.n -= 1
+
+    def move(self, i, j):
+        for array in self.arrays():
+            row = array[i].copy()
+            if i < j:
+                array[i:j] = array[i + 1:j + 1]
+            else:
+                array[j + 1:i + 1] = array[j:i]
+            array[j] = row
+
+    # queries
+
+    def column(self, field, bus=None):
+        # masked where the cue says 'n'
+        values = self.values[field][:self.n]
+        mask = ~self.present[field][:self.n]
+        if bus is not None:
+            values, mask = values[:, bus], mask[:, bus]
+        return np.ma.MaskedArray(values, mask)
+
+    def cues_using(self, media, bus=None):
+        # indices of the cues that set media on bus (or on any bus)
+        hits = self.present['media_index'][:self.n] & (self.values['media_index'][:self.n] == media)
+        hits = hits[:, bus] if bus is not None else hits.any(axis=1)
+        return np.flatnonzero(hits)
+
+    def media_usage(self):
+        # usage[media, bus] = how many cues set that media on that bus
+        media = self.values['media_index'][:self.n]
+        present = self.present['media_index'][:self.n]
+        size = int(media.max(initial=0)) + 1
+        usage = np.zeros((size, 5), np.int64)
+        for b in range(5):
+            usage[:, b] = np.bincount(media[present[:, b], b], minlength=size)
+        return usage
+
+    def routed(self, bus, output):
+        # indices of the cues that route bus to output
+        bit = np.uint32(1 << (bus * 6 + output))
+        return np.flatnonzero(self.routing[:self.n] & bit)
+
+    def forward_fill(self, field):
+        # for each cue and bus, the value in effect once the cue has run
+        present = self.present[field][:self.n]
+        last = np.where(present, np.arange(self.n)[:, None], -1)
+        np.maximum.accumulate(last, axis=0, out=last)
+        values = np.take_along_axis(self.values[field][:self.n], np.maximum(last, 0), axis=0)
+        return np.where(last >= 0, values, 0), last >= 0
+
+    def durations(self):
+        media_info = self.cuelist.media_info
+        size = max(max(media_info) + 1, int(self.values['media_index'][:self.n].max(initial=0)) + 1)
+        durations = np.zeros(size)
+        for index, media in media_info.items():
+            durations[index] = media.duration
+        return durations
+
+    def playback_time(self):
+        # estimated seconds of each media played: a bus plays from the pos a
+        # cue sets up to the pos the next cue sets on the same media, or to
+        # the end of the media if the next cue changes media
+        durations = self.durations()
+        media, known = self.forward_fill('media_index')
+        speed = self.forward_fill('speed')[0]
+        pos = self.values['pos'][:self.n]
+        pos_set = self.present['pos'][:self.n]
+        changed = np.zeros_like(known)
+        changed[1:] = media[1:] != media[:-1]
+        changed[0] = known[0]
+        total = np.zeros(len(durations))
+        for b in range(5):
+            starts = np.flatnonzero(pos_set[:, b] | changed[:, b])
+            if len(starts) == 0:
+                continue
+            m = media[starts, b]
+            start_pos = np.where(pos_set[starts, b], pos[starts, b], 0.0)
+            end_pos = np.full(len(starts), 100.0)
+            same = m[1:] == m[:-1]
+            end_pos[:-1][same] = pos[starts[1:], b][same]
+            playing = (m != 0) & (speed[starts, b] != 0)
+            played = np.clip(end_pos - start_pos, 0, None) / 100 * durations[m]
+            total += np.bincount(m[playing], weights=played[playing], minlength=len(durations))
+        return {int(i): float(total[i]) for i in np.flatnonzero(total)}
+
+    def past_end(self, seconds=0.0):
+        # (cue, bus) pairs that set a pos with no more than seconds of the
+        # media left after it, including pos past 100%
+        durations = self.durations()
+        media = self.forward_fill('media_index')[0]
+        pos = self.values['pos'][:self.n]
+        left = (100 - pos) / 100 * durations[media]
+        hits = self.present['pos'][:self.n] & (media != 0) & (left <= seconds)
+        return list(zip(*[axis.tolist() for axis in np.nonzero(hits)]))
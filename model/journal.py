@@ -0,0 +1,207 @@
+"""
+Cue list edit journal
+
+- CueJournal
+
+Instead of rewriting cues.csv on every edit, each edit is appended as one
+JSON line to a journal file next to it and fsync'd. Every so often the
+journal is folded into a fresh cues.csv. Only the persistence worker
+thread uses this (see model/persistence.py).
+
+Journals are numbered (cues.journal.1, cues.journal.2, ...). The first
+line of each is a header holding the sha1 of the cues.csv its edits apply
+to. Compacting starts the next journal with the hash of the new snapshot,
+then writes the snapshot out as cues.csv; older journals are deleted once
+it is in place. On load, the edits are replayed from the first journal
+whose base matches cues.csv, so a crash at any point in that sequence
+loses nothing. A journal still empty when the show is closed is removed,
+so a clean quit leaves only cues.csv behind.
+
+Each compaction also hands the new snapshot to the backup store, once it
+is in place (and the cues.csv it replaces first, if that was never backed
+up), so there is a backup at least every compact_every edits rather than
+only when the show is closed.
+"""
+
+import os
+import json
+import hashlib
+
+JOURNAL_NAME = 'cues.journal'
+
+
+def snapshot_hash(data):
+    return hashlib.sha1(data).hexdigest()
+
+def apply_record(rows, record, blank_row):
+    # replays one journal record on a list of csv rows, the same way the
+    # CueList edit methods change the list of cues
+    op = record['op']
+    index = record.get('index')
+    if op == 'replace':
+        rows[index] = list(record['row'])
+    elif op == 'insert':
+        rows.insert(index, list(record['row']))
+    elif op == 'rename':
+        rows[index][0] = record['name']
+    elif op == 'move':
+        rows.insert(record['to'], rows.pop(record['from']))
+    elif op == 'delete':
+        del rows[index]
+        if len(rows) == 0:
+            rows.append(list(blank_row))
+
+
+class CueJournal:
+    def __init__(self, path, backup=None, compact_every=100):
+        self.path = path
+        # backup(data) stores the bytes of a cues.csv
+        self.backup = backup
+        # whether the cues.csv on disk is already in the backups
+        self.backed_up = False
+        self.compact_every = compact_every
+        self.generation = 0
+        # hash of the cues.csv the current journal applies to
+        self.base = None
+        self.file = None
+        self.records = 0
+        self.errors = 0
+
+    def __repr__(self):
+        return "<CueJournal %s generation:%s records:%s errors:%s>" % (self.path,
+            self.generation, self.records, self.errors)
+
+    def journal_path(self, generation):
+        return os.path.join(self.path, '%s.%d' % (JOURNAL_NAME, generation))
+
+    def generations(self):
+        prefix = JOURNAL_NAME + '.'
+        found = []
+        for name in os.listdir(self.path):
+            if name.startswith(prefix) and name[len(prefix):].isdigit():
+                found.append(int(name[len(prefix):]))
+        return sorted(found)
+
+    def read(self, generation):
+        # returns (header, records, end of the last complete line)
+        header = None
+        records = []
+        end = 0
+        with open(self.journal_path(generation), 'rb') as file:
+            for line in file:
+                if not line.endswith(b'\n'):
+                    break # torn write at the tail
+                try:
+                    record = json.loads(line.decode())
+                except ValueError:
+                    break
+                end += len(line)
+                if header is None:
+                    header = record
+                else:
+                    records.append(record)
+        return header, records, end
+
+    def recover(self, base):
+        # returns the edits to replay on top of a cues.csv with hash base
+        generations = self.generations()
+        start = None
+        contents = {}
+        for i, generation in enumerate(generations):
+            contents[generation] = self.read(generation)
+            header = contents[generation][0]
+            if header is not None and header.get('base') == base:
+                start = i
+                break
+
+        if start is None:
+            if generations:
+                print('Journal does not match cues.csv, setting it aside.')
+                for generation in generations:
+                    os.replace(self.journal_path(generation),
+                        self.journal_path(generation) + '.stale')
+            self.generation = generations[-1] if generations else 0
+            self.start(base)
+            return []
+
+        replay = []
+        for generation in generations[start:]:
+            if generation not in contents:
+                contents[generation] = self.read(generation)
+            replay += contents[generation][1]
+        for generation in generations[:start]:
+            os.remove(self.journal_path(generation))
+
+        # keep appending to the newest journal, minus any torn last line
+        self.generation = generations[-1]
+        header, records, end = contents[self.generation]
+        self.base = None if header is None else header.get('base')
+        self.file = open(self.journal_path(self.generation), 'r+b')
+        self.file.truncate(end)
+        self.file.seek(end)
+        self.records = len(records)
+        return replay
+
+    def start(self, base):
+        if self.file is not None:
+            self.file.close()
+        self.generation += 1
+        self.file = open(self.journal_path(self.generation), 'wb')
+        self.base = base
+        self.records = 0
+        self.write_line({'base': base})
+
+    def write_line(self, record):
+        self.write_lines([record])
+
+    def write_lines(self, records):
+        # one write and one fsync however many records there are
+        self.file.write(''.join(json.dumps(record) + '\n' for record in records).encode())
+        self.file.flush()
+        os.fsync(self.file.fileno())
+
+    def append(self, records):
+        self.write_lines(records)
+        self.records += len(records)
+
+    def due(self):
+        return self.records >= self.compact_every
+
+    def compact(self, data):
+        # data is the rendered cues.csv (bytes) as of the last appended record
+        self.start(snapshot_hash(data))
+        self.write_snapshot(data, self.generation)
+
+    def write_snapshot(self, data, generation):
+        csv_path = os.path.join(self.path, 'cues.csv')
+        tmp_path = csv_path + '.tmp'
+        try:
+            with open(tmp_path, 'wb') as file:
+                file.write(data)
+                file.flush()
+                os.fsync(file.fileno())
+            if self.backup is not None and not self.backed_up and os.path.exists(csv_path):
+                with open(csv_path, 'rb') as file:
+                    self.backup(file.read())
+            os.replace(tmp_path, csv_path)
+            for older in self.generations():
+                if older < generation:
+                    os.remove(self.journal_path(older))
+            if self.backup is not None:
+                self.backup(data)
+                self.backed_up = True
+        except OSError:
+            # the journals are all still there, so nothing is lost
+            self.errors += 1
+            raise
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+            # a journal with nothing after its header has nothing to replay
+            if self.records == 0:
+                try:
+                    os.remove(self.journal_path(self.generation))
+                except OSError:
+                    pass
@@ -0,0 +1,423 @@
+"""
+Cue list persistence
+
+- Request
+- PersistenceWorker
+- Persistence
+
+All of a show's file I/O (loading, the edit journal, snapshots, backups
+and mediainfo.txt) happens on one worker thread, so a slow or network
+mounted show folder never stalls the GUI. The CueList hands edits over as
+plain journal records; the worker keeps its own copy of the cue rows, so
+it can render snapshots without touching the model. Edits arriving within
+debounce ms of each other go to disk in one write.
+
+The worker also keeps the rows of the last few shows it closed, so
+switching back to one whose files have not changed since skips reading
+and parsing its cues.csv. Shows not held that way open from their
+cues.cache when it is up to date (see model/showcache.py).
+
+Persistence is the GUI thread side. Its state is DIRTY while edits are
+waiting, FLUSHING while the worker is writing them and CLEAN once they
+are on disk; on_state and on_failed are called on the GUI thread.
+"""
+
+import os
+import io
+import csv
+import threading
+from collections import deque, OrderedDict
+from PyQt5.QtCore import QObject, QThread, QTimer, pyqtSignal, pyqtSlot
+from model.journal import CueJournal, JOURNAL_NAME, snapshot_hash, apply_record
+from model.backupstore import BackupStore
+from model.showcache import read_cache, write_cache, source_key
+
+CSV_HEADER = 'Cue,A media,A pos,A speed,A ramp,A zoom,A db,B media,B pos,B speed,B ramp,B zoom,B db,C media,C pos,C speed,C ramp,C zoom,C db,D media,D pos,D speed,D ramp,D zoom,D db,E media,E pos,E speed,E ramp,E zoom,E db,Notes,Matrix\n'
+
+DIRTY = 'dirty'
+FLUSHING = 'flushing'
+CLEAN = 'clean'
+
+
+def render_rows(rows):
+    csv_file = io.StringIO(newline='')
+    csv_file.write(CSV_HEADER)
+    writer = csv.writer(csv_file)
+    for row in rows:
+        writer.writerow(row)
+    return csv_file.getvalue().encode()
+
+def show_signature(path):
+    # changes whenever any file a load reads from the show folder does
+    signature = []
+    for name in sorted(os.listdir(path)):
+        if name in ('cues.csv', 'mediainfo.txt') or name.startswith(JOURNAL_NAME):
+            stat = os.stat(os.path.join(path, name))
+            signature.append((name, stat.st_mtime_ns, stat.st_size))
+    return tuple(signature)
+
+class Request:
+    # one piece of work for the worker; reply is set for blocking requests
+    def __init__(self, kind, payload, seq, reply=False):
+        self.kind = kind
+        self.payload = payload
+        self.seq = seq
+        self.reply = threading.Event() if reply else None
+        self.result = None
+        self.error = None
+
+class PersistenceWorker(QObject):
+    flushing = pyqtSignal()
+    # sequence number of the last request now on disk
+    saved = pyqtSignal(int)
+    failed = pyqtSignal(str)
+    wake = pyqtSignal()
+
+    def __init__(self, blank_row, debounce=250, warm_shows=4, check_row=None):
+        super().__init__()
+        self.blank_row = blank_row
+        # raises ValueError for a csv row the cues can't be made from
+        self.check_row = check_row
+        self.debounce = debounce
+        # path: (signature, journal base, rows, media text, cache key) of closed shows
+        self.warm = OrderedDict()
+        self.warm_shows = warm_shows
+        self.media_text = None
+        # source_key the show's cues.cache was made for
+        self.cache_key = None
+        self.lock = threading.Lock()
+        self.pending = deque()
+        self.path = None
+        self.rows = None
+        self.journal = None
+        self.backups = None
+        self.timer = None
+        self.writes = 0
+        self.edits = 0
+        # runs on the worker thread once we are moved there
+        self.wake.connect(self.schedule)
+
+    def __repr__(self):
+        return "<PersistenceWorker pending:%s edits:%s writes:%s warm:%s %s>" % (len(self.pending),
+            self.edits, self.writes, len(self.warm), self.journal)
+
+    def start(self):
+        self.timer = QTimer()
+        self.timer.setSingleShot(True)
+        self.timer.setInterval(self.debounce)
+        self.timer.timeout.connect(self.flush)
+
+    def post(self, request):
+        # called from the GUI thread
+        with self.lock:
+            self.pending.append(request)
+        self.wake.emit()
+
+    @pyqtSlot()
+    def schedule(self):
+        with self.lock:
+            urgent = any(request.reply is not None for request in self.pending)
+        if urgent:
+            self.timer.stop()
+            self.flush()
+        else:
+            self.timer.start() # restarts the debounce
+
+    @pyqtSlot()
+    def flush(self):
+        with self.lock:
+            batch = list(self.pending)
+            self.pending.clear()
+        if not batch:
+            return
+        self.flushing.emit()
+        ok = True
+        edits = []
+        for request in batch:
+            if request.kind == 'edit':
+                edits.append(request)
+                continue
+            # anything else goes out in order after the edits before it
+            ok = self.write_edits(edits) and ok
+            edits = []
+            try:
+                request.result = getattr(self, 'do_' + request.kind)(*request.payload)
+            except (OSError, ValueError) as e:
+                request.error = e
+                self.failed.emit('%s failed: %s' % (request.kind, e))
+            if request.reply is not None:
+                request.reply.set()
+        ok = self.write_edits(edits) and ok
+        if ok:
+            self.saved.emit(batch[-1].seq)
+        else:
+            self.timer.start() # try again after the debounce
+
+    def write_edits(self, edits):
+        if not edits:
+            return True
+        if self.journal is None:
+            # the show they were made to could not be reopened; keep them
+            # for the next try, until a show is closed or opened
+            with self.lock:
+                self.pending.extendleft(reversed(edits))
+            self.failed.emit('Saving cues failed: no show is open')
+            return False
+        records = [request.payload for request in edits]
+        try:
+            self.journal.append(records)
+        except OSError as e:
+            # keep them for the next try
+            with self.lock:
+                self.pending.extendleft(reversed(edits))
+            self.failed.emit('Saving cues failed: %s' % e)
+            return False
+        self.writes += 1
+        self.edits += len(records)
+        for record in records:
+            apply_record(self.rows, record, self.blank_row)
+        if self.journal.due():
+            try:
+                self.journal.compact(render_rows(self.rows))
+            except OSError as e:
+                self.failed.emit('Writing cues.csv failed: %s' % e)
+        return True
+
+    def do_load(self, path):
+        # the new show is read, checked and recovered before the old one is
+        # closed, so if it can't be opened the old one is still open and its
+        # edits still go to it; reopening the same show closes it first, as
+        # closing writes the cues.csv about to be read
+        if path is None or path == self.path:
+            self.do_close()
+            self.path = path
+        if path is None:
+            return None, None
+        key = source_key(path)
+        warm = self.warm.pop(path, None)
+        cache_key = None
+        cached = None
+        if warm is not None and warm[0] == show_signature(path):
+            base, rows, media_text, cache_key = warm[1:]
+        else:
+            cached = read_cache(path, key)
+            if cached is not None:
+                rows, base, media_text = cached
+                cache_key = key
+            else:
+                rows, base, media_text = self.read_show(path)
+
+        # replay any edits made since cues.csv was last written
+        backups = BackupStore(os.path.join(path, 'backups'))
+        journal = CueJournal(path, backups.add)
+        replay = journal.recover(base)
+        for record in replay:
+            apply_record(rows, record, self.blank_row)
+        if replay:
+            journal.compact(render_rows(rows))
+            key = None
+
+        self.do_close()
+        self.path = path
+        self.rows = rows
+        self.media_text = media_text
+        self.cache_key = cache_key
+        self.backups = backups
+        self.journal = journal
+        self.update_cache(key)
+        # copies: a CachedRow copy is left undecoded
+        return [row.copy() for row in rows], media_text
+
+    def read_show(self, path):
+        # (rows, sha1 of cues.csv, media text), from the show's own files
+        with open(os.path.join(path, 'cues.csv'), 'rb') as csv_file:
+            data = csv_file.read()
+        reader = csv.reader(io.StringIO(data.decode(), newline=''))
+        next(reader, None) #skip header row
+        rows = list(reader)
+        self.check_rows(path, rows)
+        with open(os.path.join(path, 'mediainfo.txt'), 'r') as file:
+            media_text = file.read()
+        return rows, snapshot_hash(data), media_text
+
+    def check_rows(self, path, rows):
+        # cues are decoded lazily, so a bad number has to be caught here
+        # for the show to fail at open rather than in the middle of it
+        if self.check_row is None:
+            return
+        for number, row in enumerate(rows):
+            try:
+                self.check_row(row)
+            except ValueError as e:
+                raise ValueError('%s, line %d: %s' % (os.path.join(path, 'cues.csv'),
+                    number + 2, e))
+
+    def do_save_as(self, path, rows, media_text):
+        # the new show is written before the old one is closed, so if this
+        # fails the old one is still open and its edits still go to it
+        os.mkdir(path)
+        os.mkdir(os.path.join(path, 'backups'))
+        data = render_rows(rows)
+        with open(os.path.join(path, 'cues.csv'), 'wb') as csv_file:
+            csv_file.write(data)
+        with open(os.path.join(path, 'mediainfo.txt'), 'w') as media_file:
+            media_file.write(media_text)
+        self.do_close()
+        self.path = path
+        self.rows = rows
+        self.media_text = media_text
+        self.backups = BackupStore(os.path.join(path, 'backups'))
+        self.journal = CueJournal(path, self.backups.add)
+        self.journal.recover(snapshot_hash(data))
+
+    def do_media_info(self, media_text):
+        self.media_text = media_text
+        if self.path is not None:
+            with open(os.path.join(self.path, 'mediainfo.txt'), 'w') as media_file:
+                media_file.write(media_text)
+
+    def do_close(self):
+        # folds the journal into cues.csv
+        self.write_stranded()
+        if self.journal is not None:
+            if self.journal.records:
+                self.journal.compact(render_rows(self.rows))
+            self.journal.close()
+            # the rows now match the journal's base with nothing to replay
+            if self.journal.base is not None:
+                self.update_cache()
+                self.keep_warm(self.path, self.journal.base)
+        self.journal = None
+        self.cache_key = None
+        self.backups = None
+        self.rows = None
+
+    def write_stranded(self):
+        # edits put back after a failed write belong to the show being
+        # closed: one last try, then they must not reach the next show
+        with self.lock:
+            stranded = [request for request in self.pending if request.kind == 'edit']
+            if not stranded:
+                return
+            kept = [request for request in self.pending if request.kind != 'edit']
+            self.pending.clear()
+            self.pending.extend(kept)
+        if self.journal is not None:
+            records = [request.payload for request in stranded]
+            try:
+                self.journal.append(records)
+            except OSError:
+                pass
+            else:
+                self.edits += len(records)
+                for record in records:
+                    apply_record(self.rows, record, self.blank_row)
+                return
+        self.failed.emit('%d cue edits could not be saved to %s' % (len(stranded), self.path))
+
+    def update_cache(self, key=None):
+        # key None means the files were last written by us, see write_cache
+        try:
+            if self.cache_key is not None and self.cache_key == source_key(self.path):
+                return
+        except OSError:
+            return
+        if write_cache(self.path, self.rows, self.journal.base, self.media_text, key):
+            self.cache_key = source_key(self.path) if key is None else key
+
+    def keep_warm(self, path, base):
+        try:
+            self.warm[path] = (show_signature(path), base, self.rows, self.media_text,
+                self.cache_key)
+        except OSError:
+            return # the folder has gone, nothing to keep
+        while len(self.warm) > self.warm_shows:
+            self.warm.popitem(last=False)
+
+class Persistence(QObject):
+    def __init__(self, blank_row, on_state=None, on_failed=None, debounce=250, check_row=None):
+        super().__init__()
+        self.on_state = on_state
+        self.on_failed = on_failed
+        self.state = CLEAN
+        self.posted = 0
+        self.saved_seq = 0
+
+        self.worker = PersistenceWorker(blank_row, debounce, check_row=check_row)
+        self.thread = QThread()
+        self.worker.moveToThread(self.thread)
+        self.thread.started.connect(self.worker.start)
+        # queued back onto the GUI thread, where this object lives
+        self.worker.flushing.connect(self.worker_flushing)
+        self.worker.saved.connect(self.worker_saved)
+        self.worker.failed.connect(self.worker_failed)
+        self.thread.start()
+
+    def __repr__(self):
+        return "<Persistence state:%s posted:%s saved:%s %s>" % (self.state, self.posted,
+            self.saved_seq, self.worker)
+
+    def request(self, kind, payload=(), wait=False, timeout=None):
+        self.posted += 1
+        request = Request(kind, payload, self.posted, wait)
+        self.worker.post(request)
+        if not wait:
+            self.set_state(DIRTY)
+        if wait:
+            if not request.reply.wait(timeout):
+                return None
+            if request.error is not None:
+                raise request.error
+        return request
+
+    def edit(self, record):
+        self.request('edit', record)
+
+    def write_media_info(self, media_text):
+        self.request('media_info', (media_text,))
+
+    def load(self, path):
+        # blocks: the show has to be read before there is anything to show
+        return self.request('load', (path,), True).result
+
+    def save_as(self, path, rows, media_text):
+        # blocks, and raises if the new show could not be written
+        self.request('save_as', (path, rows, media_text), True)
+
+    def close(self, timeout=None):
+        # flushes and closes the show; False if that took longer than timeout
+        try:
+            return self.request('close', (), True, timeout) is not None
+        except OSError:
+            return False
+
+    def stop(self, timeout=None):
+        done = self.close(timeout)
+        self.thread.quit()
+        if timeout is None:
+            self.thread.wait()
+        else:
+            self.thread.wait(int(1000 * timeout))
+        return done
+
+    def set_state(self, state):
+        if state != self.state:
+            self.state = state
+            if self.on_state is not None:
+                self.on_state(state)
+
+    @pyqtSlot()
+    def worker_flushing(self):
+        if self.state == DIRTY:
+            self.set_state(FLUSHING)
+
+    @pyqtSlot(int)
+    def worker_saved(self, seq):
+        self.saved_seq = max(self.saved_seq, seq)
+        if self.saved_seq >= self.posted:
+            self.set_state(CLEAN)
+
+    @pyqtSlot(str)
+    def worker_failed(self, message):
+        if self.on_failed is not None:
+            self.on_failed(message)
@@ -0,0 +1,127 @@
+"""
+Bus position predictor
+
+- BusTrack
+- PositionPredictor
+
+Dead reckoning for the current position of each bus, so the readouts
+move smoothly on the frame clock while the playback side only reports
+/pos a few times a second. Each bus is extrapolated from its last known
+position at the rate it was last told to play: the speed of the cue that
+started it, or of the last play/pause/rw/ff, over the media's duration.
+
+The speed is the last one the bus was told to play at. A cue only
+changes it when it sets a speed or starts the bus; a cue or a scrub that
+leaves a paused bus alone leaves it paused.
+
+A /pos report becomes the new starting point. The difference between it
+and what was being shown is not jumped across but kept as an offset that
+dies away over `smoothing` seconds. A report further off than `snap`
+percent (a scrub, a cue on the other end) is jumped to. A bus that has
+not been reported or told anything for `stale` seconds stops moving.
+
+Positions are in percent of the media, like everywhere else.
+"""
+
+import math
+import time
+
+
+class BusTrack:
+    __slots__ = ('anchor', 'anchored_at', 'speed', 'rate', 'offset', 'corrected_at', 'last')
+
+    def __init__(self):
+        # position at a time and percent per second from there (at the last
+        # speed the bus was told), plus what is left of the last correction
+        self.anchor = 0.0
+        self.anchored_at = 0.0
+        self.speed = 0.0
+        self.rate = 0.0
+        self.offset = 0.0
+        self.corrected_at = 0.0
+        # position as last handed out
+        self.last = None
+
+class PositionPredictor:
+    def __init__(self, cuelist, smoothing=0.15, snap=5.0, stale=1.5):
+        self.cuelist = cuelist
+        self.smoothing = smoothing
+        self.snap = snap
+        self.stale = stale
+        self.tracks = [BusTrack() for bus_state in cuelist.bus_states]
+        self.reports = 0
+        self.snaps = 0
+        self.corrections = 0.0
+
+    def __repr__(self):
+        return "<PositionPredictor reports:%s snaps:%s mean correction:%.3f%%>" % (
+            self.reports, self.snaps, self.corrections / max(1, self.reports))
+
+    def rate(self, bus, speed):
+        bus_state = self.cuelist.bus_states[bus]
+        media = self.cuelist.media_info.get(bus_state.media_index)
+        if not bus_state.active or media is None or media.duration <= 0:
+            return 0.0
+        return speed * 100 / media.duration
+
+    def extrapolated(self, track, now):
+        elapsed = min(now - track.anchored_at, self.stale)
+        return min(100.0, max(0.0, track.anchor + track.rate * elapsed))
+
+    def predict(self, bus, now):
+        track = self.tracks[bus]
+        pos = self.extrapolated(track, now)
+        if track.offset:
+            pos += track.offset * math.exp((track.corrected_at - now) / self.smoothing)
+        return min(100.0, max(0.0, pos))
+
+    def reset(self, bus, now=None):
+        # from the bus state's position as it is now, after a cue or a scrub
+        now = time.perf_counter() if now is None else now
+        bus_state = self.cuelist.bus_states[bus]
+        track = self.tracks[bus]
+        track.anchor = bus_state.pos
+        track.anchored_at = now
+        track.rate = self.rate(bus, track.speed)
+        track.offset = 0.0
+        track.last = bus_state.pos
+
+    def set_speed(self, bus, speed, now=None):
+        now = time.perf_counter() if now is None else now
+        track = self.tracks[bus]
+        track.anchor = self.extrapolated(track, now)
+        track.anchored_at = now
+        track.speed = speed
+        track.rate = self.rate(bus, speed)
+
+    def report(self, bus, pos, now=None):
+        now = time.perf_counter() if now is None else now
+        if not self.cuelist.bus_states[bus].active:
+            return
+        track = self.tracks[bus]
+        shown = self.predict(bus, now)
+        self.reports += 1
+        self.corrections += abs(shown - pos)
+        track.anchor = pos
+        track.anchored_at = now
+        if abs(shown - pos) > self.snap:
+            self.snaps += 1
+            track.offset = 0.0
+        else:
+            track.offset = shown - pos
+            track.corrected_at = now
+
+    def tick(self, now=None):
+        # {bus: pos} of the active buses whose position has moved
+        now = time.perf_counter() if now is None else now
+        positions = {}
+        for bus, track in enumerate(self.tracks):
+            if not self.cuelist.bus_states[bus].active:
+                continue
+            if track.offset and now - track.corrected_at > 10 * self.smoothing:
+                track.offset = 0.0
+            pos = self.predict(bus, now)
+            if pos != track.last:
+                track.last = pos
+                positions[bus] = pos
+        return positions
@@ -0,0 +1,163 @@
+"""
+Persistent sequence
+
+- PSeq
+
+An immutable list with structural sharing, for keeping every version of
+the cue list around for undo. It is a B-tree of tuples: leaves hold up to
+CHUNK items, branches hold their size followed by up to CHUNK children.
+set, insert and delete copy only the nodes on the path to the item, about
+one chunk per level, and return a new PSeq; everything else is shared
+with the old one. Indexing is O(log n).
+"""
+
+import sys
+
+CHUNK = 16
+MIN_CHUNK = CHUNK // 4
+# a full node, as copied by an edit
+NODE_BYTES = sys.getsizeof(tuple(range(CHUNK + 1)))
+
+
+class Branch(tuple):
+    # (size, child, child, ...)
+    __slots__ = ()
+
+def size(node):
+    return node[0] if type(node) is Branch else len(node)
+
+def branch(children):
+    return Branch((sum(size(child) for child in children),) + tuple(children))
+
+def split(items, make):
+    # one node if it fits, otherwise two halves
+    if len(items) <= CHUNK:
+        return (make(items),)
+    half = len(items) // 2
+    return (make(items[:half]), make(items[half:]))
+
+def find(node, i):
+    # index of the child holding item i, and i relative to that child
+    k = 0
+    for child in node[1:]:
+        k += 1
+        n = child[0] if type(child) is Branch else len(child)
+        if i < n:
+            return k, i
+        i -= n
+    return k, i + n
+
+def get(node, i):
+    while type(node) is Branch:
+        k, i = find(node, i)
+        node = node[k]
+    return node[i]
+
+def assign(node, i, item):
+    if type(node) is not Branch:
+        return node[:i] + (item,) + node[i + 1:]
+    k, j = find(node, i)
+    return Branch(node[:k] + (assign(node[k], j, item),) + node[k + 1:])
+
+def insert(node, i, item):
+    # returns one or two nodes
+    if type(node) is not Branch:
+        return split(node[:i] + (item,) + node[i:], tuple)
+    k, j = find(node, i)
+    children = node[1:k] + insert(node[k], j, item) + node[k + 1:]
+    return split(children, branch)
+
+def delete(node, i):
+    if type(node) is not Branch:
+        return node[:i] + node[i + 1:]
+    k, j = find(node, i)
+    child = delete(node[k], j)
+    children = list(node[1:])
+    if size(child) == 0:
+        del children[k - 1]
+    elif len(child) - (type(child) is Branch) < MIN_CHUNK and len(children) > 1:
+        # too small: merge with a neighbour and split again if need be
+        left = k - 2 if k > 1 else k - 1
+        first, second = (children[left], child) if left == k - 2 else (child, children[k])
+        if type(child) is Branch:
+            merged = split(first[1:] + second[1:], branch)
+        else:
+            merged = split(first + second, tuple)
+        children[left:left + 2] = merged
+    else:
+        children[k - 1] = child
+    return branch(children)
+
+def walk(node):
+    if type(node) is Branch:
+        for child in node[1:]:
+            yield from walk(child)
+    else:
+        yield from node
+
+def build(items):
+    nodes = [tuple(items[i:i + CHUNK]) for i in range(0, len(items), CHUNK)] or [()]
+    while len(nodes) > 1:
+        nodes = [branch(nodes[i:i + CHUNK]) for i in range(0, len(nodes), CHUNK)]
+    return nodes[0]
+
+class PSeq:
+    __slots__ = ('root',)
+
+    def __init__(self, items=(), root=None):
+        self.root = build(list(items)) if root is None else root
+
+    def __repr__(self):
+        return "PSeq(%s)" % list(self)
+
+    def __len__(self):
+        return size(self.root)
+
+    def __iter__(self):
+        return walk(self.root)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return list(self)[i]
+        n = len(self)
+        if i < 0:
+            i += n
+        if not 0 <= i < n:
+            raise IndexError('PSeq index out of range')
+        return get(self.root, i)
+
+    def set(self, i, item):
+        self[i] # range check
+        return PSeq(root=assign(self.root, i % len(self), item))
+
+    def insert(self, i, item):
+        n = len(self)
+        i = max(0, min(n, i + n if i < 0 else i))
+        nodes = insert(self.root, i, item)
+        return PSeq(root=nodes[0] if len(nodes) == 1 else branch(nodes))
+
+    def delete(self, i):
+        self[i] # range check
+        root = delete(self.root, i % len(self))
+        # drop levels left with a single child
+        while type(root) is Branch and len(root) == 2:
+            root = root[1]
+        if size(root) == 0:
+            root = ()
+        return PSeq(root=root)
+
+    def move(self, i, j):
+        item = self[i]
+        return self.delete(i).insert(j, item)
+
+    def path_bytes(self):
+        # about what one set, insert or delete copies: a full node per level
+        return NODE_BYTES * self.depth()
+
+    def depth(self):
+        n = 1
+        node = self.root
+        while type(node) is Branch:
+            node = node[1]
+            n += 1
+        return n
@@ -0,0 +1,140 @@
+"""
+Parsed show cache
+
+- CachedRow
+
+A binary copy of a show's parsed cues.csv rows and mediainfo.txt, kept as
+cues.cache next to them, so that reopening a show does not have to read
+and parse the csv. cues.csv stays the source of truth: the cache header
+holds the mtime and size of both files as they were when it was made, and
+it is only used while they still match.
+
+The file is memory-mapped and rows are handed out as CachedRows, which
+decode their fields from the map only when something reads them.
+
+Layout (little-endian), version 1:
+    header      magic, version, csv mtime ns, csv size, mediainfo mtime ns,
+                mediainfo size, sha1 of cues.csv, row count, media text size
+    media text  utf-8
+    offsets     row count + 1 u64 file offsets of the rows
+    each row    34 u32 field offsets relative to the row's data, then the
+                33 fields as utf-8
+
+Only the persistence worker thread uses this (see model/persistence.py).
+"""
+
+import os
+import mmap
+import struct
+
+CACHE_NAME = 'cues.cache'
+MAGIC = b'TWGCUES\0'
+VERSION = 1
+FIELDS = 33
+HEADER = struct.Struct('<8sIqqqq40sII')
+FIELD_OFFSETS = struct.Struct('<%dI' % (FIELDS + 1))
+
+
+def source_key(path):
+    # what the cache has to match: mtime and size of cues.csv and mediainfo.txt
+    key = []
+    for name in ('cues.csv', 'mediainfo.txt'):
+        stat = os.stat(os.path.join(path, name))
+        key += [stat.st_mtime_ns, stat.st_size]
+    return tuple(key)
+
+class CachedRow:
+    # a csv row still in the map; a single field is read on its own, anything
+    # else (slices, iteration, writes) decodes the whole row first
+    __slots__ = ('data', 'offset', 'fields')
+
+    def __init__(self, data, offset):
+        self.data = data
+        self.offset = offset
+        self.fields = None
+
+    def __repr__(self):
+        return "CachedRow(%s)" % self.decoded()
+
+    def decoded(self):
+        if self.fields is None:
+            ends = FIELD_OFFSETS.unpack_from(self.data, self.offset)
+            start = self.offset + FIELD_OFFSETS.size
+            self.fields = [self.data[start + a:start + b].decode() for a, b in zip(ends, ends[1:])]
+        return self.fields
+
+    def __getitem__(self, i):
+        if self.fields is None and type(i) is int and 0 <= i < FIELDS:
+            a, b = struct.unpack_from('<II', self.data, self.offset + 4 * i)
+            start = self.offset + FIELD_OFFSETS.size
+            return self.data[start + a:start + b].decode()
+        return self.decoded()[i]
+
+    def __setitem__(self, i, value):
+        self.decoded()[i] = value
+
+    def __len__(self):
+        return FIELDS if self.fields is None else len(self.fields)
+
+    def __iter__(self):
+        return iter(self.decoded())
+
+    def copy(self):
+        if self.fields is None:
+            return CachedRow(self.data, self.offset)
+        return list(self.fields)
+
+def read_cache(path, key):
+    # (rows, sha1 of cues.csv, media text), or None if there is no cache
+    # made from the files as they are now
+    try:
+        with open(os.path.join(path, CACHE_NAME), 'rb') as cache_file:
+            data = mmap.mmap(cache_file.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return None
+    if len(data) < HEADER.size:
+        return None
+    magic, version, *made_from, base, count, media_size = HEADER.unpack_from(data)
+    if magic != MAGIC or version != VERSION or tuple(made_from) != key:
+        return None
+    position = HEADER.size
+    media_text = data[position:position + media_size].decode()
+    position += media_size
+    offsets = struct.unpack_from('<%dQ' % (count + 1), data, position)
+    if offsets[-1] != len(data):
+        return None # cut short
+    return [CachedRow(data, offset) for offset in offsets[:-1]], base.decode(), media_text
+
+def write_cache(path, rows, base, media_text, key=None):
+    # key is source_key(path) as it was when rows were read; None if the
+    # files have only been written by us since
+    if any(len(row) != FIELDS for row in rows):
+        return False
+    media = media_text.encode()
+    records = []
+    offsets = []
+    position = HEADER.size + len(media) + 8 * (len(rows) + 1)
+    for row in rows:
+        fields = [field.encode() for field in row]
+        ends = [0]
+        for field in fields:
+            ends.append(ends[-1] + len(field))
+        record = FIELD_OFFSETS.pack(*ends) + b''.join(fields)
+        offsets.append(position)
+        position += len(record)
+        records.append(record)
+    offsets.append(position)
+
+    cache_path = os.path.join(path, CACHE_NAME)
+    try:
+        if key is None:
+            key = source_key(path)
+        with open(cache_path + '.tmp', 'wb') as cache_file:
+            cache_file.write(HEADER.pack(MAGIC, VERSION, *key, base.encode(), len(rows), len(media)))
+            cache_file.write(media)
+            cache_file.write(struct.pack('<%dQ' % len(offsets), *offsets))
+            cache_file.write(b''.join(records))
+        os.replace(cache_path + '.tmp', cache_path)
+    except OSError:
+        return False # only ever a shortcut, the csv is still there
+    return True
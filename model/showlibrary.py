@@ -0,0 +1,186 @@
+"""
+Show library
+
+- LibraryWorker
+- ShowLibrary
+
+Keeps an index of every show folder under the data root (the folders with
+a cues.csv in them): cue count, media count, when it last changed and the
+last cue fired in it. The index is saved as .library.json in the data
+root, and each entry carries the show's file signature (see
+persistence.show_signature), so a scan only reads the shows that changed
+since. After the first scan, a QFileSystemWatcher on the root and the show
+folders triggers a rescan of just the folders that changed.
+
+Counts are as of cues.csv; edits still in a show's journal show up once
+it is compacted. Scanning and saving the index happen on a worker thread,
+like all other file I/O.
+"""
+
+import os
+import re
+import csv
+import json
+from PyQt5.QtCore import QObject, QThread, QTimer, QFileSystemWatcher, pyqtSignal, pyqtSlot
+from model.persistence import show_signature
+
+INDEX_NAME = '.library.json'
+MEDIA_LINE = re.compile(r'(\d+), "[^"]+" [\d\.]+;')
+
+
+def read_show(path):
+    # cue and media counts of a show folder
+    with open(os.path.join(path, 'cues.csv'), newline='') as csv_file:
+        cues = sum(1 for row in csv.reader(csv_file)) - 1
+    media = 0
+    try:
+        with open(os.path.join(path, 'mediainfo.txt'), 'r') as media_file:
+            media = sum(1 for index in MEDIA_LINE.findall(media_file.read()) if index != '0')
+    except OSError:
+        pass
+    return cues, media
+
+class LibraryWorker(QObject):
+    # {name: entry or None if the show has gone}
+    scanned = pyqtSignal(object)
+    # names to rescan, or None for the whole root
+    scan_requested = pyqtSignal(object)
+    save_requested = pyqtSignal(object)
+
+    def __init__(self, root, signatures):
+        super().__init__()
+        self.root = root
+        # name: signature of every show as last read
+        self.signatures = signatures
+        self.scan_requested.connect(self.scan)
+        self.save_requested.connect(self.save)
+
+    @pyqtSlot(object)
+    def scan(self, names):
+        if names is None:
+            try:
+                names = set(os.listdir(self.root)) | set(self.signatures)
+            except OSError:
+                return
+        changes = {}
+        for name in names:
+            path = os.path.join(self.root, name)
+            try:
+                if not os.path.isfile(os.path.join(path, 'cues.csv')):
+                    raise FileNotFoundError(path)
+                signature = show_signature(path)
+                if self.signatures.get(name) == signature:
+                    continue
+                cues, media = read_show(path)
+            except (OSError, ValueError, csv.Error):
+                if self.signatures.pop(name, None) is not None:
+                    changes[name] = None
+                continue
+            self.signatures[name] = signature
+            changes[name] = {'name': name, 'path': path, 'cues': cues, 'media': media,
+                'modified': max(entry[1] for entry in signature) / 1e9,
+                'signature': signature}
+        if changes:
+            self.scanned.emit(changes)
+
+    @pyqtSlot(object)
+    def save(self, shows):
+        index_path = os.path.join(self.root, INDEX_NAME)
+        try:
+            with open(index_path + '.tmp', 'w') as index_file:
+                json.dump(shows, index_file)
+            os.replace(index_path + '.tmp', index_path)
+        except OSError as e:
+            print('Could not save the show library: %s' % e)
+
+class ShowLibrary(QObject):
+    def __init__(self, root='data', debounce=500):
+        super().__init__()
+        self.root = root
+        self.shows = self.read_index()
+        self.waiting = set()
+
+        self.worker = LibraryWorker(root, {name: show['signature']
+            for name, show in self.shows.items()})
+        self.thread = QThread()
+        self.worker.moveToThread(self.thread)
+        self.worker.scanned.connect(self.update)
+        self.thread.start()
+
+        self.watcher = QFileSystemWatcher()
+        self.watcher.directoryChanged.connect(self.folder_changed)
+        self.timer = QTimer()
+        self.timer.setSingleShot(True)
+        self.timer.setInterval(debounce)
+        self.timer.timeout.connect(self.rescan)
+        if os.path.isdir(root):
+            self.watcher.addPath(root)
+        for show in self.shows.values():
+            if os.path.isdir(show['path']):
+                self.watcher.addPath(show['path'])
+        self.worker.scan_requested.emit(None)
+
+    def __repr__(self):
+        return "<ShowLibrary root:'%s' shows:%s>" % (self.root, len(self.shows))
+
+    def read_index(self):
+        try:
+            with open(os.path.join(self.root, INDEX_NAME), 'r') as index_file:
+                shows = json.load(index_file)
+        except (OSError, ValueError):
+            return {}
+        for show in shows.values():
+            # json has turned the tuples into lists
+            show['signature'] = tuple(tuple(entry) for entry in show['signature'])
+        return shows
+
+    def list(self):
+        return sorted(self.shows.values(), key=lambda show: show['name'].lower())
+
+    def show_for(self, path):
+        if path is None:
+            return None
+        return self.shows.get(os.path.basename(os.path.normpath(path)))
+
+    def fired(self, path, index, name):
+        show = self.show_for(path)
+        if show is not None:
+            show['last_fired'] = [index, name]
+
+    @pyqtSlot(object)
+    def update(self, changes):
+        for name, show in changes.items():
+            if show is None:
+                self.shows.pop(name, None)
+                self.watcher.removePath(os.path.join(self.root, name))
+            else:
+                if name in self.shows:
+                    show['last_fired'] = self.shows[name].get('last_fired')
+                else:
+                    self.watcher.addPath(show['path'])
+                self.shows[name] = show
+        self.save()
+
+    def folder_changed(self, path):
+        if os.path.normpath(path) == os.path.normpath(self.root):
+            self.waiting = None
+        elif self.waiting is not None:
+            self.waiting.add(os.path.basename(os.path.normpath(path)))
+        self.timer.start()
+
+    def rescan(self):
+        self.worker.scan_requested.emit(self.waiting)
+        self.waiting = set()
+
+    def snapshot(self):
+        return {name: dict(show) for name, show in self.shows.items()}
+
+    def save(self):
+        self.worker.save_requested.emit(self.snapshot())
+
+    def stop(self):
+        self.timer.stop()
+        self.thread.quit()
+        self.thread.wait()
+        # the thread is done, so the last save can happen here
+        self.worker.save(self.snapshot())
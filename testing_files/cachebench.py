@@ -0,0 +1,70 @@
+#!/usr/local/bin/python3
+
+"""
+Opening a show from cues.csv against opening it from cues.cache.
+
+Writes a synthetic show of the requested size to a temporary folder and
+opens it through the persistence worker three times: cold (parsing the
+csv and writing the cache), from the cache, and from the cache again
+after touching cues.csv (which must fall back to the csv). Then times
+making lazy cues from the cached rows, reading a hundred of them and
+decoding all of them.
+
+USAGE: cachebench.py [cues]
+"""
+
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import time
+import random
+import tempfile
+from loadbench import synthetic_row
+from model.cuelist import Cue
+from model.persistence import PersistenceWorker, render_rows
+from model.showcache import CachedRow, CACHE_NAME
+
+def timed(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return result, 1000 * (time.perf_counter() - start)
+
+def load(path):
+    # a fresh worker each time, so nothing is held over in memory
+    worker = PersistenceWorker(Cue('BLANK').to_csv_row())
+    (rows, media_text), ms = timed(worker.do_load, path)
+    worker.do_close()
+    return rows, ms
+
+if __name__ == '__main__':
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    random.seed(1)
+
+    with tempfile.TemporaryDirectory() as path:
+        os.mkdir(os.path.join(path, 'backups'))
+        with open(os.path.join(path, 'cues.csv'), 'wb') as csv_file:
+            csv_file.write(render_rows(synthetic_row(i) for i in range(count)))
+        with open(os.path.join(path, 'mediainfo.txt'), 'w') as media_file:
+            media_file.write(''.join('%i, "media %i" %f;\n' % (i, i, 60.0 * i) for i in range(40)))
+
+        cold, cold_ms = load(path)
+        print('%i cues, cache %.1f MB' % (count, os.path.getsize(os.path.join(path, CACHE_NAME)) / 1e6))
+        print('cold load (csv, writes cache): %8.1f ms' % cold_ms)
+        warm, warm_ms = load(path)
+        assert type(warm[0]) is CachedRow
+        print('load from cache:               %8.1f ms' % warm_ms)
+        assert [list(row) for row in warm] == cold
+
+        cues, ms = timed(lambda: [Cue.lazy(row) for row in warm])
+        print('lazy cues:                     %8.1f ms' % ms)
+        some = random.sample(cues, 100)
+        ms = timed(lambda: [cue.buses for cue in some])[1]
+        print('decode 100 cues:               %8.2f ms' % ms)
+        ms = timed(lambda: [cue.buses for cue in cues])[1]
+        print('decode all cues:               %8.1f ms' % ms)
+
+        os.utime(os.path.join(path, 'cues.csv'))
+        stale, ms = load(path)
+        assert type(stale[0]) is list and stale == cold
+        print('after touching cues.csv:       %8.1f ms (csv again)' % ms)
@@ -0,0 +1,82 @@
+#!/usr/local/bin/python3
+
+"""
+Bytes per cue, before and after the slotted cue records.
+
+Parses the rows of a show's cues.csv, repeated up to the requested number
+of cues, once into copies of the old dict-based BusCue / AudioRouting / Cue
+and once into the current classes, and reports the memory each takes.
+
+USAGE: cuememory.py [show path] [cues]
+"""
+
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import csv
+import tracemalloc
+from common.util import clump, make_2d_list
+from model.cuelist import Cue
+
+class OldBusCue:
+    def __init__(self, media_index=None, pos=None, speed=None, ramp_time=None,
+            zoom=None, db=None):
+        self.media_index = None if media_index == 'n' or media_index is None else int(media_index)
+        self.pos = None if pos == 'n' or pos is None else float(pos)
+        self.speed = None if speed == 'n' or speed is None else float(speed)
+        self.ramp_time = None if ramp_time == 'n' or ramp_time is None else float(ramp_time)
+        self.zoom = None if zoom == 'n' or zoom is None else float(zoom)
+        self.db = None if db == 'n' or db is None else float(db)
+
+class OldAudioRouting:
+    def __init__(self, matrix_state):
+        self.matrix_state = matrix_state
+
+    @classmethod
+    def from_csv_string(cls, string):
+        matrix_state = make_2d_list(5, 6, False)
+        for cell in clump(string.split(' '), 3):
+            if (cell[0] != ''):
+                matrix_state[int(cell[0])][int(cell[1])] = cell[2] == '1'
+        return cls(matrix_state)
+
+class OldCue:
+    def __init__(self, name, buses, notes, audio_routing):
+        self.name = name
+        self.buses = buses
+        self.notes = notes
+        self.audio_routing = audio_routing
+        self.osc_cache = None
+
+    @classmethod
+    def from_csv_row(cls, csv_row):
+        name = csv_row.pop(0)
+        buses = [OldBusCue(*[csv_row.pop(0) for i in range(6)]) for j in range(5)]
+        notes = csv_row.pop(0)
+        audio_routing = OldAudioRouting.from_csv_string(csv_row.pop(0))
+        return cls(name, buses, notes, audio_routing)
+
+def measure(cls, rows):
+    tracemalloc.start()
+    cues = [cls.from_csv_row(list(row)) for row in rows]
+    used = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return used / len(cues)
+
+if __name__ == '__main__':
+    path = sys.argv[1] if len(sys.argv) > 1 else 'data/ICA'
+    count = int(sys.argv[2]) if len(sys.argv) > 2 else 10000
+
+    with open(os.path.join(path, 'cues.csv'), newline='') as csv_file:
+        reader = csv.reader(csv_file)
+        next(reader)
+        show = list(reader)
+    # fresh strings for every copy, the way they would come out of a file
+    rows = [[field[:1] + field[1:] for field in show[i % len(show)]] for i in range(count)]
+
+    before = measure(OldCue, rows)
+    after = measure(Cue, rows)
+    print('%i cues from %s' % (count, path))
+    print('before: %6.0f bytes/cue' % before)
+    print('after:  %6.0f bytes/cue (%.0f%% less)' % (after, 100 - 100 * after / before))
@@ -0,0 +1,80 @@
+#!/usr/local/bin/python3
+
+"""
+Cue-step latency of the main widget.
+
+Steps through every cue of a show twice, forward then backward, and times
+each step up to the end of the repaint: first the way the controller used
+to show a cue (hiding the main widget, setting every widget, showing it
+again) and then with MainWidget.set_cue. Reports the median and worst step
+of each. Run with QT_QPA_PLATFORM=offscreen to go without a display.
+
+USAGE: cuestepbench.py [show path]
+"""
+
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import time
+from PyQt5.QtWidgets import QApplication
+from model.cuelist import CueList, read_cues
+
+def old_set_cue(mainwidget, cue):
+    mainwidget.hide()
+    mainwidget.set_cue_name(cue.name)
+    mainwidget.notes.cue_text = None
+    mainwidget.notes.setPlainText(cue.notes)
+    for bus_widget, bus in zip(mainwidget.buses, cue.buses):
+        bus_widget.media.setValue(bus.media_index)
+        bus_widget.position.setValue(bus.pos)
+        bus_widget.speed.setValue(None if bus.speed is None else (bus.speed, bus.ramp_time))
+        bus_widget.zoom.setValue(bus.zoom)
+        bus_widget.volume.setValue(bus.db)
+        bus_widget.shown = None
+    matrix = mainwidget.sound.cue_matrix
+    matrix.cue_routing = cue.audio_routing
+    matrix.setEdited(False)
+    for i, row in enumerate(matrix.matrix):
+        for j, checkbox in enumerate(row):
+            checkbox.setChecked(cue.audio_routing.at(i, j))
+    mainwidget.show()
+
+def new_set_cue(mainwidget, cue):
+    mainwidget.set_cue(cue)
+
+def steps(app, mainwidget, cues, set_cue):
+    samples = []
+    for cue in cues + cues[::-1]:
+        start = time.perf_counter()
+        set_cue(mainwidget, cue)
+        app.processEvents()
+        samples.append(time.perf_counter() - start)
+    samples.sort()
+    return 1000 * samples[len(samples) // 2], 1000 * samples[-1]
+
+if __name__ == '__main__':
+    app = QApplication(sys.argv)
+    from widgets.mainwidgets import MainWidget
+    path = sys.argv[1] if len(sys.argv) > 1 else 'data/ICA'
+    with open(os.path.join(path, 'cues.csv'), newline='') as csv_file:
+        cues = list(read_cues(csv_file, lazy=False))
+    model = CueList()
+    with open(os.path.join(path, 'mediainfo.txt'), 'r') as media_file:
+        model.load_media_info(media_file.read())
+
+    edits = []
+    mainwidget = MainWidget()
+    mainwidget.set_media_info(model.media_info)
+    mainwidget.register(type('EditCounter', (), {'role': 'view',
+        'view_update': lambda self, what, etc: edits.append(what) if what == 'edited' else None})())
+    mainwidget.resize(1400, 800)
+    mainwidget.show()
+    app.processEvents()
+
+    print('%i cues, %i steps' % (len(cues), 2 * len(cues)))
+    for label, set_cue in (('hide/set all/show', old_set_cue), ('set_cue', new_set_cue)):
+        del edits[:]
+        median, worst = steps(app, mainwidget, cues, set_cue)
+        print('%-18s median %7.2f ms  worst %7.2f ms  %5i edited events' % (label, median,
+            worst, len(edits)))
@@ -0,0 +1,112 @@
+#!/usr/local/bin/python3
+
+"""
+Show-wide queries with the columnar cue table.
+
+Makes a synthetic cue list, runs each CueTable query and the Python loop
+over CueList.cues that answers the same question, checks they agree and
+reports how long each took. Then makes random edits and undos and checks
+that the table kept in step with the list.
+
+USAGE: cuetablebench.py [cues] [edits]
+"""
+
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import time
+import random
+from model.cuelist import CueList, Cue, BusCue, AudioRouting, Media
+from model.cuetable import CueTable
+from model.pseq import PSeq
+
+def random_cue(i):
+    buses = []
+    for b in range(5):
+        maybe = lambda value: value if random.random() < 0.4 else None
+        buses.append(BusCue(maybe(random.randrange(36)), maybe(round(random.uniform(0, 105), 2)),
+            maybe(random.choice([0.0, 1.0, 1.0, 2.0])), maybe(1.0), maybe(1.0), maybe(0.0)))
+    return Cue('cue %d' % i, buses, '', AudioRouting(bits=random.getrandbits(30)))
+
+def loop_cues_using(cues, media, bus):
+    return [i for i, cue in enumerate(cues) if cue.buses[bus].media_index == media]
+
+def loop_past_end(cues, media_info, seconds):
+    hits = []
+    media = [0] * 5
+    for i, cue in enumerate(cues):
+        for b, bus in enumerate(cue.buses):
+            if bus.media_index is not None:
+                media[b] = bus.media_index
+        for b, bus in enumerate(cue.buses):
+            if bus.pos is not None and media[b] != 0:
+                duration = media_info[media[b]].duration if media[b] in media_info else 0
+                if (100 - bus.pos) / 100 * duration <= seconds:
+                    hits.append((i, b))
+    return hits
+
+def timed(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return result, 1000 * (time.perf_counter() - start)
+
+def same(table, model):
+    fresh = CueTable(model)
+    fresh.close()
+    if len(table) != len(fresh):
+        return False
+    return all((table.values[field][:len(table)] == fresh.values[field][:len(fresh)]).all()
+        and (table.present[field][:len(table)] == fresh.present[field][:len(fresh)]).all()
+        for field in table.values) and (table.routing[:len(table)] == fresh.routing[:len(fresh)]).all()
+
+if __name__ == '__main__':
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    edits = int(sys.argv[2]) if len(sys.argv) > 2 else 2000
+    random.seed(1)
+
+    model = CueList()
+    model.media_info = {i: Media('media %d' % i, random.uniform(10, 1200)) for i in range(36)}
+    model.media_info[0] = Media('BLANK', 0)
+    model.cues = PSeq(random_cue(i) for i in range(count))
+
+    table, ms = timed(CueTable, model)
+    print('%i cues, built table in %.0f ms' % (count, ms))
+
+    hits, ms = timed(table.cues_using, 22, 2)
+    loop, loop_ms = timed(loop_cues_using, model.cues, 22, 2)
+    assert hits.tolist() == loop
+    print('cues using media 22 on bus C: %6i  %7.2f ms  (loop %.0f ms)' % (len(hits), ms, loop_ms))
+
+    hits, ms = timed(table.past_end, 5.0)
+    loop, loop_ms = timed(loop_past_end, model.cues, model.media_info, 5.0)
+    assert hits == loop
+    print('pos within 5 s of the end:    %6i  %7.2f ms  (loop %.0f ms)' % (len(hits), ms, loop_ms))
+
+    usage, ms = timed(table.media_usage)
+    print('media usage per bus:                 %7.2f ms' % ms)
+    times, ms = timed(table.playback_time)
+    print('playback time per media:             %7.2f ms  (%.0f s in all)' % (ms, sum(times.values())))
+    hits, ms = timed(table.routed, 1, 3)
+    print('cues routing B to 4:          %6i  %7.2f ms' % (len(hits), ms))
+
+    start = time.perf_counter()
+    for i in range(edits):
+        model.goto_cue(random.randrange(len(model.cues)))
+        kind = random.randrange(6)
+        if kind == 0:
+            model.add_cue_after_current(random_cue(i))
+        elif kind == 1:
+            model.replace_current_cue(random_cue(i))
+        elif kind == 2:
+            model.move_current_cue(random.randrange(len(model.cues)))
+        elif kind == 3:
+            model.delete_current_cue()
+        elif kind == 4:
+            model.rename_current_cue('renamed %d' % i)
+        else:
+            model.undo()
+    elapsed = time.perf_counter() - start
+    print('%i edits and undos kept in step: %.0f us/edit' % (edits, 1e6 * elapsed / edits))
+    assert same(table, model)
+    print('table matches a fresh build')
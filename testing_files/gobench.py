@@ -0,0 +1,79 @@
+#!/usr/local/bin/python3
+
+"""
+GO-to-socket latency over a synthetic 1000 cue show.
+
+Times the model side of a GO plus the sendto() for every cue, first the
+old way (format every field and let python-osc encode /fromsm from scratch)
+and then with the per-cue cached datagrams, cold and warm.
+
+USAGE: gobench.py [cues]
+"""
+
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import time
+import random
+import socket
+from pythonosc import udp_client
+from model.cuelist import CueList, Cue, BusCue, AudioRouting
+
+def random_cue(i):
+    buses = []
+    for j in range(5):
+        if random.random() < 0.5:
+            buses.append(BusCue())
+        else:
+            buses.append(BusCue(random.randint(0, 30), random.random() * 100,
+                random.choice([0.0, 1.0, 2.0]), 0.0, 100.0, random.randint(-20, 0)))
+    matrix = [[random.random() < 0.3 for col in range(6)] for row in range(5)]
+    return Cue('cue %d' % i, buses, 'notes for cue %d' % i, AudioRouting(matrix))
+
+def old_fire(model, client, increment):
+    # CueList.fire_current_cue + CueController.fire_cue as they used to be
+    cue = model.current_cue()
+    name = cue.name
+    data = []
+    for i, bus in enumerate(cue.buses):
+        data += bus.to_osc_array()
+        model.bus_states[i].set_from_cue(bus.media_index, bus.pos, bus.speed)
+    data += [' ' for i in range(5)]
+    data.append(cue.audio_routing.to_csv_string())
+    if increment:
+        model.increment_cue()
+    client.send_message('/fromsm', data)
+    client.send_message('/cuename', name)
+
+def new_fire(model, client, increment):
+    fromsm, cuename = model.fire_current_cue(increment)
+    client.send(fromsm)
+    client.send(cuename)
+
+def run(name, fire, model, client):
+    times = []
+    model.goto_cue(0)
+    for i in range(len(model.cues)):
+        start = time.perf_counter()
+        fire(model, client, True)
+        times.append(time.perf_counter() - start)
+    times.sort()
+    print('%-12s median %6.1f us   99th %6.1f us   worst %6.1f us' % (name,
+        1e6 * times[len(times) // 2], 1e6 * times[int(len(times) * 0.99)], 1e6 * times[-1]))
+
+if __name__ == '__main__':
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    random.seed(1)
+
+    sink = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sink.bind(('127.0.0.1', 0))
+    sink.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 1 << 22)
+    client = udp_client.SimpleUDPClient('127.0.0.1', sink.getsockname()[1])
+
+    model = CueList()
+    model.cues = [random_cue(i) for i in range(count)]
+
+    run('before', old_fire, model, client)
+    run('cached/cold', new_fire, model, client)
+    run('cached/warm', new_fire, model, client)
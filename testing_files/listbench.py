@@ -0,0 +1,76 @@
+#!/usr/local/bin/python3
+
+"""
+Edit-to-repaint time of the cue list against its length.
+
+For each list size, inserts a cue in the middle and repaints, first the
+way the list used to do it (clearing a QStandardItemModel and appending a
+row per cue) and then through CueListWidget's list model. Reports the
+median time of each. Run with QT_QPA_PLATFORM=offscreen to go without a
+display.
+
+USAGE: listbench.py [sizes...]
+"""
+
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import time
+from PyQt5.QtWidgets import QApplication, QListView
+from PyQt5.QtGui import QStandardItemModel, QStandardItem
+from model.cuelist import Cue
+from model.pseq import PSeq
+
+def median(samples):
+    return sorted(samples)[len(samples) // 2]
+
+def rebuild_edit(view, item_model, cues, repeats):
+    samples = []
+    for i in range(repeats):
+        start = time.perf_counter()
+        cues = cues.insert(len(cues) // 2, Cue('new %d' % i))
+        item_model.clear()
+        for cue in cues:
+            item_model.appendRow(QStandardItem(cue.name))
+        view.viewport().repaint()
+        samples.append(time.perf_counter() - start)
+    return median(samples)
+
+def incremental_edit(widget, cues, repeats):
+    samples = []
+    for i in range(repeats):
+        start = time.perf_counter()
+        index = len(cues) // 2
+        cues = cues.insert(index, Cue('new %d' % i))
+        widget.insert_cue(index, cues)
+        widget.viewport().repaint()
+        samples.append(time.perf_counter() - start)
+    return median(samples)
+
+if __name__ == '__main__':
+    app = QApplication(sys.argv)
+    from widgets.cuelistwidgets import CueListWidget
+    sizes = [int(arg) for arg in sys.argv[1:]] or [80, 1000, 5000, 20000]
+
+    print('%8s %14s %14s' % ('cues', 'rebuild', 'list model'))
+    for size in sizes:
+        cues = PSeq(Cue('cue %d' % i) for i in range(size))
+        repeats = 20 if size <= 5000 else 5
+
+        view = QListView()
+        item_model = QStandardItemModel(view)
+        view.setModel(item_model)
+        view.resize(200, 600)
+        view.show()
+        old = rebuild_edit(view, item_model, cues, repeats)
+        view.close()
+
+        widget = CueListWidget()
+        widget.resize(200, 600)
+        widget.show()
+        widget.set_cues(cues)
+        widget.set_current_cue(size // 2)
+        new = incremental_edit(widget, cues, repeats)
+        widget.close()
+        print('%8d %12.2fms %12.3fms' % (size, 1000 * old, 1000 * new))
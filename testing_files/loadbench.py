@@ -0,0 +1,88 @@
+#!/usr/local/bin/python3
+
+"""
+Time to parse cues.csv into cues.
+
+For every show in the data folder and for a synthetic cues.csv of the
+requested size, parses the rows the old way (popping fields off the front
+of each row), with Cue.from_csv_row and with lazy cues, and reports the
+time each took. The lazy figure is what building the cues costs; they
+decode themselves when first used. The check figure is the persistence
+worker making sure every row would decode, so a bad file fails at open.
+
+USAGE: loadbench.py [data path] [synthetic cues]
+"""
+
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import io
+import csv
+import time
+import random
+import tempfile
+from model.cuelist import Cue, BusCue, AudioRouting, read_cues
+from model.persistence import render_rows
+
+def old_from_csv_row(csv_row):
+    name = csv_row.pop(0)
+    buses = [BusCue(*[csv_row.pop(0) for i in range(6)]) for j in range(5)]
+    notes = csv_row.pop(0)
+    audio_routing = AudioRouting.from_csv_string(csv_row.pop(0))
+    return Cue(name, buses, notes, audio_routing)
+
+def synthetic_row(i):
+    row = ['cue %d' % i]
+    for j in range(5):
+        if random.random() < 0.5:
+            row += ['n'] * 6
+        else:
+            row += [str(random.randrange(40)), str(round(random.uniform(0, 100), 2)),
+                random.choice(['0.0', '1.0']), '1.0', '1.0', '0.0']
+    routing = AudioRouting(bits=random.getrandbits(30) & 0b100001000010000100001000010000)
+    return row + ['', routing.to_csv_string()]
+
+def timed(parse, text):
+    start = time.perf_counter()
+    rows = csv.reader(io.StringIO(text, newline=''))
+    next(rows)
+    cues = [parse(row) for row in rows]
+    return cues, 1000 * (time.perf_counter() - start)
+
+def bench(label, text):
+    old, old_ms = timed(old_from_csv_row, text)
+    new, new_ms = timed(Cue.from_csv_row, text)
+    start = time.perf_counter()
+    lazy = list(read_cues(io.StringIO(text, newline='')))
+    lazy_ms = 1000 * (time.perf_counter() - start)
+    start = time.perf_counter()
+    for cue in lazy:
+        Cue.check_row(cue.row)
+    check_ms = 1000 * (time.perf_counter() - start)
+    assert [cue.to_csv_row() for cue in lazy] == [cue.to_csv_row() for cue in old]
+    print('%-28s %6i cues  old %8.1f ms  new %8.1f ms  lazy %8.1f ms  check %8.1f ms' % (
+        label, len(old), old_ms, new_ms, lazy_ms, check_ms))
+    return old_ms, new_ms, lazy_ms, check_ms
+
+if __name__ == '__main__':
+    path = sys.argv[1] if len(sys.argv) > 1 else 'data'
+    count = int(sys.argv[2]) if len(sys.argv) > 2 else 100000
+    random.seed(1)
+
+    totals = [0, 0, 0, 0]
+    for show in sorted(os.listdir(path)):
+        csv_path = os.path.join(path, show, 'cues.csv')
+        if os.path.isfile(csv_path):
+            with open(csv_path, newline='') as csv_file:
+                times = bench(show, csv_file.read())
+            totals = [a + b for a, b in zip(totals, times)]
+    print('%-39s  old %8.1f ms  new %8.1f ms  lazy %8.1f ms  check %8.1f ms' % (
+        'all shows', *totals))
+
+    with tempfile.TemporaryDirectory() as folder:
+        csv_path = os.path.join(folder, 'cues.csv')
+        with open(csv_path, 'wb') as csv_file:
+            csv_file.write(render_rows(synthetic_row(i) for i in range(count)))
+        with open(csv_path, newline='') as csv_file:
+            bench('synthetic', csv_file.read())
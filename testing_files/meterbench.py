@@ -0,0 +1,78 @@
+#!/usr/local/bin/python3
+
+"""
+GUI-thread cost of the level meters against the rate /db levels arrive.
+
+Shows the sound patch panel with a MeterBank on its five meters, ticked
+at the controller's frame rate. A second thread posts levels for all ten
+channels at each rate in turn, the way the OSC thread does. For each rate,
+reports the GUI thread's CPU time per second, meter paints per second and
+how many samples the rings dropped. Run with QT_QPA_PLATFORM=offscreen to
+go without a display.
+
+USAGE: meterbench.py [seconds per rate]
+"""
+
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import math
+import time
+import threading
+from PyQt5.QtWidgets import QApplication
+from PyQt5.QtCore import QTimer
+from controller.meterbank import MeterBank
+
+def poster(bank, rate, stop):
+    # rate is levels per second over all channels, posted a millisecond's worth at a time
+    per_ms = rate / 1000
+    owed = 0.0
+    start = time.perf_counter()
+    while not stop.is_set():
+        owed += per_ms
+        while owed >= 1:
+            owed -= 1
+            t = time.perf_counter() - start
+            bank.post(int(t * 7) % 5, 'l' if int(t * 13) % 2 else 'r', -30 + 25 * math.sin(t * 5))
+        time.sleep(0.001)
+
+if __name__ == '__main__':
+    app = QApplication(sys.argv)
+    from widgets.buspanelwidgets import SoundPatchWidget
+    from widgets.painterwidgets import LevelMeter
+    import controller.controller as controller
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 3.0
+
+    paints = [0]
+    paint_event = LevelMeter.paintEvent
+    def counted_paint(meter, event):
+        paints[0] += 1
+        paint_event(meter, event)
+    LevelMeter.paintEvent = counted_paint
+
+    panel = SoundPatchWidget()
+    panel.resize(400, 400)
+    panel.show()
+    bank = MeterBank(panel.meters)
+    frame_timer = QTimer()
+    frame_timer.setInterval(1000 // controller.frame_rate)
+    frame_timer.timeout.connect(bank.tick)
+    frame_timer.start()
+
+    print('%10s %14s %14s %10s' % ('levels/s', 'GUI CPU', 'paints/s', 'dropped'))
+    for rate in [0, 100, 1000, 10000, 50000]:
+        stop = threading.Event()
+        thread = threading.Thread(target=poster, args=(bank, rate, stop))
+        thread.start()
+        paints[0] = 0
+        dropped = bank.dropped
+        cpu = time.thread_time()
+        QTimer.singleShot(int(1000 * seconds), app.quit)
+        app.exec_()
+        cpu = time.thread_time() - cpu
+        stop.set()
+        thread.join()
+        print('%10i %11.1f ms/s %14.1f %10i' % (rate, 1000 * cpu / seconds,
+            paints[0] / seconds, bank.dropped - dropped))
+    print(bank)
@@ -0,0 +1,239 @@
+#!/usr/local/bin/python3
+
+"""
+MIDI note to OSC latency, without a MIDI device.
+
+A synthetic input stands in for rtmidi.RtMidiIn: it has one 'MPD218' port
+and plays notes from its own thread, through the callback the MidiWorker
+sets or, like an rtmidi without setCallback, through a queue the worker
+polls. Each note goes to the GUI thread and through a note table to an
+OSCEgress sending to a local port. For callback mode and for polling with
+the fallback and the old timeouts, reports note-to-sendto latency from
+when the synthetic device played the note and from the worker's arrival
+stamp, and how long stopping the worker took. Then compares dispatching
+through a compiled MidiMap with building the old dict of lambdas per note.
+
+Last, a fader on a second port sends controller messages as fast as it
+can for a second; reports how many reached the mailbox, how many acted
+through the ControlLimiter on a frame clock, and how many OSC messages
+went out, and checks the last value sent is the fader's last value.
+
+USAGE: midibench.py [notes]
+"""
+
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import time
+import threading
+from collections import deque
+from PyQt5.QtCore import QCoreApplication, QThread
+from pythonosc import udp_client
+from common.latency import LatencyHistogram
+from controller.oscclient import OSCEgress, build_message
+from controller.midi import MidiWorker
+from controller.mailbox import Mailbox
+from controller.midimap import MidiMap, ControlLimiter, DEFAULT_MAP
+
+class SyntheticMessage:
+    def __init__(self, note):
+        self.note = note
+
+    def isNoteOn(self):
+        return True
+
+    def isController(self):
+        return False
+
+    def getNoteNumber(self):
+        return self.note
+
+    def getVelocity(self):
+        return 100
+
+class SyntheticInput:
+    def __init__(self):
+        self.callback = None
+        self.queue = deque()
+        self.ready = threading.Condition()
+        # when each note was played, oldest first
+        self.played = deque()
+
+    def getPortCount(self):
+        return 1
+
+    def getPortName(self, i):
+        return 'MPD218 Port A'
+
+    def openPort(self, i):
+        pass
+
+    def closePort(self):
+        pass
+
+    def setCallback(self, callback):
+        self.callback = callback
+
+    def cancelCallback(self):
+        self.callback = None
+
+    def getMessage(self, timeout):
+        with self.ready:
+            if not self.queue:
+                self.ready.wait(timeout / 1000)
+            return self.queue.popleft() if self.queue else None
+
+    def play(self, note):
+        self.played.append(time.perf_counter())
+        if self.callback is not None:
+            self.callback(SyntheticMessage(note))
+        else:
+            with self.ready:
+                self.queue.append(SyntheticMessage(note))
+                self.ready.notify()
+
+class PolledInput(SyntheticInput):
+    # an rtmidi without setCallback
+    setCallback = property()
+
+class SyntheticControl:
+    def __init__(self, value):
+        self.value = value
+
+    def isNoteOn(self):
+        return False
+
+    def isController(self):
+        return True
+
+    def getControllerNumber(self):
+        return 0
+
+    def getControllerValue(self):
+        return self.value
+
+class SyntheticFader(SyntheticInput):
+    def getPortName(self, i):
+        return 'nanoKONTROL2 SLIDER/KNOB'
+
+    def move(self, value):
+        self.callback(SyntheticControl(value))
+
+def play_notes(midiin, count):
+    time.sleep(0.1)
+    for i in range(count):
+        midiin.play(36 + i % 16)
+        time.sleep(0.005)
+
+def run(app, midiin, count, poll_timeout):
+    egress = OSCEgress(udp_client.SimpleUDPClient('127.0.0.1', 9))
+    from_played = LatencyHistogram('played to sendto')
+    from_arrival = LatencyHistogram('arrival to sendto')
+    message = build_message('/fromsm', ['n'] * 7)
+    handled = [0]
+
+    def noteOn(port, num, vel, stamp):
+        handled[0] += 1
+        with egress.triggered(stamp, from_arrival):
+            egress.send(message, stamp=midiin.played.popleft(), histogram=from_played)
+
+    worker = MidiWorker(make_input=lambda: midiin, poll_timeout=poll_timeout)
+    thread = QThread()
+    worker.noteOn.connect(noteOn)
+    worker.moveToThread(thread)
+    worker.finished.connect(thread.quit)
+    thread.started.connect(worker.listen)
+    thread.start()
+
+    player = threading.Thread(target=play_notes, args=(midiin, count))
+    player.start()
+    while player.is_alive() or handled[0] < count:
+        app.processEvents()
+    player.join()
+    egress.stop()
+
+    start = time.perf_counter()
+    worker.stopListening()
+    # a polling worker's finished is queued to this thread
+    while not thread.wait(1):
+        app.processEvents()
+    return from_played, from_arrival, 1000 * (time.perf_counter() - start)
+
+def old_dispatch(num, stamp, sink):
+    {
+        36: lambda: sink(0), 37: lambda: sink(1), 38: lambda: sink(2), 39: lambda: sink(3),
+        40: lambda: sink(4), 41: lambda: sink(5), 42: lambda: sink(6), 43: lambda: sink(7),
+        44: lambda: sink(8), 45: lambda: sink(9), 46: sink, 47: lambda: sink(11),
+        48: sink, 49: sink, 50: sink, 51: lambda: sink(15, stamp)
+    }.get(num, lambda: None)()
+
+def flood(app, seconds=1.0):
+    fader = SyntheticFader()
+    mailbox = Mailbox()
+    limiter = ControlLimiter(DEFAULT_MAP['cc_interval'])
+    sent = []
+    egress = OSCEgress(udp_client.SimpleUDPClient('127.0.0.1', 9))
+    def bus_pos(value, stamp, bus):
+        data = ['n'] * (bus * 7 + 1) + [str(value * 100 / 127)]
+        sent.append(value)
+        egress.send_message('/fromsm', data, key=('bus_pos', bus))
+    midi_map = MidiMap({'ports': ['nanoKONTROL'], 'cc': {'nanoKONTROL:0': ['bus_pos', 0]}},
+        {'bus_pos': bus_pos})
+
+    worker = MidiWorker(midi_map.ports, mailbox, make_input=lambda: fader)
+    worker.listen()
+    moved = [0]
+    def move():
+        end = time.perf_counter() + seconds
+        while time.perf_counter() < end:
+            fader.move(moved[0] % 128)
+            moved[0] += 1
+    player = threading.Thread(target=move)
+    player.start()
+    while True:
+        alive = player.is_alive()
+        now = time.perf_counter()
+        for key, value in mailbox.drain().items():
+            limiter.put(key, value)
+        for (kind, port, num), (value, stamp) in limiter.ready(now):
+            midi_map.action('cc', port, num)(value, stamp)
+        if not alive and not limiter.pending:
+            break
+        time.sleep(1 / 60)
+        app.processEvents()
+    worker.stopListening()
+    egress.stop()
+    print('controller flood: %s moves, %s posted to the mailbox, %s acted, %s OSC sent, last value %s of %s' % (
+        moved[0], mailbox.posted, limiter.applied, egress.sent, sent[-1], (moved[0] - 1) % 128))
+
+if __name__ == '__main__':
+    app = QCoreApplication(sys.argv)
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+
+    for label, midiin, poll_timeout in (('callback', SyntheticInput(), 10),
+            ('polling, 10 ms', PolledInput(), 10), ('polling, 250 ms (old)', PolledInput(), 250)):
+        from_played, from_arrival, stop_ms = run(app, midiin, count, poll_timeout)
+        print('%s: stopped in %.1f ms' % (label, stop_ms))
+        print('  ', from_played)
+        print('  ', from_arrival)
+
+    sink = lambda *args: None
+    actions = {name: sink for name in ['play_bus', 'pause_bus', 'rw_bus', 'ff_bus', 'emergency',
+        'pause_all', 'move_up', 'rw_all', 'ff_all', 'play_all', 'go']}
+    midi_map = MidiMap(DEFAULT_MAP, actions)
+    notes = [36 + i % 16 for i in range(200000)]
+    start = time.perf_counter()
+    for num in notes:
+        old_dispatch(num, 0.0, sink)
+    old = time.perf_counter() - start
+    start = time.perf_counter()
+    for num in notes:
+        action = midi_map.action('notes', 'MPD218 Port A', num)
+        if action is not None:
+            action(100, 0.0)
+    new = time.perf_counter() - start
+    print('dispatch per note: dict of lambdas %.2f us, MIDI map %.2f us' % (
+        1e6 * old / len(notes), 1e6 * new / len(notes)))
+
+    flood(app)
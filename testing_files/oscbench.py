@@ -0,0 +1,87 @@
+#!/usr/local/bin/python3
+
+"""
+Compares the threaded python-osc server with the single loop OSCServer.
+
+A child process blasts /pos and /db datagrams at the server; the parent
+reports packets received per second and its own CPU time.
+
+USAGE: oscbench.py [packets] [packets/sec]
+"""
+
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import time
+import resource
+import socket
+import threading
+import multiprocessing
+from pythonosc import osc_server, dispatcher, osc_message_builder
+from controller.oscserver import OSCServer
+
+PORT = 7499
+
+def build(address, value):
+    builder = osc_message_builder.OscMessageBuilder(address=address)
+    builder.add_arg(value)
+    return builder.build().dgram
+
+def blast(count, rate):
+    dgrams = []
+    for letter in 'ABCDE':
+        dgrams.append(build('/pos/' + letter, 42.5))
+        dgrams.append(build('/db/' + letter + '/l', -12.0))
+        dgrams.append(build('/db/' + letter + '/r', -14.0))
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    start = time.perf_counter()
+    for i in range(count):
+        sock.sendto(dgrams[i % len(dgrams)], ('127.0.0.1', PORT))
+        if i % 64 == 0:
+            ahead = i / rate - (time.perf_counter() - start)
+            if ahead > 0:
+                time.sleep(ahead)
+
+def cpu_time():
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return usage.ru_utime + usage.ru_stime
+
+def run(name, make_server, count, rate):
+    received = [0]
+    def handler(addr, *args):
+        received[0] += 1
+    disp = dispatcher.Dispatcher()
+    disp.map('/pos/*', handler)
+    disp.map('/db/*', handler)
+    server = make_server(disp)
+    thread = threading.Thread(target=server.serve_forever)
+    thread.start()
+
+    cpu_start = cpu_time()
+    start = time.perf_counter()
+    sender = multiprocessing.Process(target=blast, args=(count, rate))
+    sender.start()
+    sender.join()
+
+    # wait for the server to go quiet
+    last = -1
+    while last != received[0]:
+        last = received[0]
+        time.sleep(0.1)
+    elapsed = time.perf_counter() - start - 0.1
+    cpu = cpu_time() - cpu_start
+
+    server.shutdown()
+    server.server_close()
+    thread.join()
+
+    print('%-10s received %6d/%d  %8.0f packets/sec  cpu %.2fs (%.1f%% of wall, %.1f us/packet)' % (
+        name, received[0], count, received[0] / elapsed, cpu, 100 * cpu / elapsed,
+        1e6 * cpu / max(received[0], 1)))
+
+if __name__ == '__main__':
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    rate = float(sys.argv[2]) if len(sys.argv) > 2 else 10000
+    run('threading', lambda d: osc_server.ThreadingOSCUDPServer(('127.0.0.1', PORT), d), count, rate)
+    run('selector', lambda d: OSCServer(('127.0.0.1', PORT), d), count, rate)
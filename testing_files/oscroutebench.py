@@ -0,0 +1,89 @@
+#!/usr/local/bin/python3
+
+"""
+Per-message dispatch cost: the old dispatcher + regex handlers against the
+precompiled OSCRouter table, for known addresses and for addresses that
+have to be pattern matched.
+
+USAGE: oscroutebench.py [iterations]
+"""
+
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import re
+import timeit
+from pythonosc import dispatcher, osc_message_builder
+from controller.oscserver import OSCRouter
+
+def build(address, *values):
+    builder = osc_message_builder.OscMessageBuilder(address=address)
+    for value in values:
+        builder.add_arg(value)
+    return builder.build()
+
+state = {}
+
+# the handlers as they were, splitting the address on every message
+def old_pos_update(addr, pos):
+    m = re.split(r'/pos/(\w)', addr)
+    bus = ord(m[1]) - 65
+    state[('pos', bus)] = pos
+
+def old_db_update(addr, db):
+    m = re.split(r'/db/(\w)/(\w)', addr)
+    bus = ord(m[1]) - 65
+    chan = m[2]
+    if chan == 'l':
+        state[('db', bus, 'l')] = db
+    elif chan == 'r':
+        state[('db', bus, 'r')] = db
+
+def old_dispatch(disp, message):
+    address = message.address
+    for handler in disp.handlers_for_address(address):
+        if handler.args:
+            handler.callback(address, handler.args, *message)
+        else:
+            handler.callback(address, *message)
+
+def pos_update(bus, pos):
+    state[('pos', bus)] = pos
+
+def db_update(bus, chan, db):
+    state[('db', bus, chan)] = db
+
+def other(addr, *args):
+    state[addr] = args
+
+if __name__ == '__main__':
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+
+    old = dispatcher.Dispatcher()
+    old.map('/db/*', old_db_update)
+    old.map('/pos/*', old_pos_update)
+    old.map('/isadora/*', other)
+
+    disp = dispatcher.Dispatcher()
+    disp.map('/isadora/*', other)
+    router = OSCRouter(disp)
+    for bus, letter in enumerate(['A', 'B', 'C', 'D', 'E']):
+        router.add_route('/pos/' + letter, pos_update, bus)
+        router.add_route('/db/' + letter + '/l', db_update, bus, 'l')
+        router.add_route('/db/' + letter + '/r', db_update, bus, 'r')
+
+    known = [build('/pos/C', 12.5), build('/db/E/r', -6.0)]
+    unknown = [build('/isadora/status', 1), build('/nobody/home', 1)]
+
+    for name, messages in [('known', known), ('pattern', unknown)]:
+        for message in messages:
+            t_old = timeit.timeit(lambda: old_dispatch(old, message), number=n) / n
+            t_new = timeit.timeit(lambda: router.dispatch(message), number=n) / n
+            print('%-8s %-16s before %7.2f us  after %6.2f us  (%.0fx)' % (name,
+                message.address, 1e6 * t_old, 1e6 * t_new, t_old / t_new))
+
+    # a pattern-matched address the router has not seen yet pays for the match once
+    message = build('/isadora/fresh', 1)
+    t_first = timeit.timeit(lambda: (router.cache.clear(), router.dispatch(message)), number=n) / n
+    print('%-8s %-16s uncached %5.2f us' % ('pattern', message.address, 1e6 * t_first))
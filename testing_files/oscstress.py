@@ -0,0 +1,121 @@
+#!/usr/local/bin/python3
+
+"""
+Stress test for the OSC to GUI handoff.
+
+Fires /pos updates at 10k/sec (plus some /matrix traffic) at a running
+controller while a timer keeps editing cues, and watches the GUI thread:
+a watchdog thread fails the run if the GUI stops ticking, and the frame
+intervals are reported at the end. Works on a temporary copy of the show.
+
+USAGE: oscstress.py [show path] [seconds]
+"""
+
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+os.chdir(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import time
+import shutil
+import tempfile
+import threading
+import faulthandler
+from pythonosc import udp_client
+from PyQt5.QtWidgets import QApplication
+from PyQt5.QtCore import QTimer
+
+RATE = 10000
+
+def sender(port, seconds, stop):
+    client = udp_client.SimpleUDPClient('127.0.0.1', port)
+    start = time.perf_counter()
+    sent = 0
+    while not stop.is_set() and time.perf_counter() - start < seconds:
+        bus = 'ABCDE'[sent % 5]
+        client.send_message('/pos/' + bus, (sent % 10000) / 100)
+        if sent % 100 == 0:
+            client.send_message('/matrix', [sent % 5, sent % 6, sent % 2])
+        sent += 1
+        if sent % 100 == 0:
+            ahead = sent / RATE - (time.perf_counter() - start)
+            if ahead > 0:
+                time.sleep(ahead)
+    stop.sent = sent
+
+def watchdog(heartbeat, stop, limit=2.0):
+    while not stop.is_set():
+        time.sleep(0.25)
+        if time.perf_counter() - heartbeat[0] > limit:
+            print('GUI thread stalled for more than %s seconds!' % limit)
+            faulthandler.dump_traceback()
+            os._exit(1)
+
+if __name__ == '__main__':
+    show = sys.argv[1] if len(sys.argv) > 1 else 'data/ICA'
+    seconds = float(sys.argv[2]) if len(sys.argv) > 2 else 10
+
+    app = QApplication(sys.argv)
+    from widgets.mainwidgets import MainWindow
+    from model.cuelist import CueList
+    import controller.controller
+    controller.controller.debug = False
+
+    tmp = tempfile.mkdtemp()
+    path = os.path.join(tmp, os.path.basename(os.path.normpath(show)))
+    shutil.copytree(show, path)
+
+    model = CueList()
+    view = MainWindow()
+    ctrl = controller.controller.CueController(model, view)
+    model.load_path(path)
+    # make every bus active so /pos actually reaches the widgets
+    for bus_state in model.bus_states:
+        bus_state.set_from_cue(1, 0.0, 1.0)
+
+    frames = []
+    heartbeat = [time.perf_counter()]
+    def tick():
+        now = time.perf_counter()
+        frames.append(now - heartbeat[0])
+        heartbeat[0] = now
+    frame_timer = QTimer()
+    frame_timer.timeout.connect(tick)
+    frame_timer.start(16)
+
+    edits = [0]
+    def edit():
+        n = edits[0]
+        if n % 4 == 0:
+            model.rename_current_cue('stress %d' % n)
+        elif n % 4 == 1:
+            model.add_cue_after_current(view.mainwidget.as_cue('stress %d' % n))
+        elif n % 4 == 2:
+            model.move_current_cue(n % len(model.cues))
+        else:
+            model.delete_current_cue()
+        edits[0] += 1
+    edit_timer = QTimer()
+    edit_timer.timeout.connect(edit)
+    edit_timer.start(50)
+
+    stop = threading.Event()
+    threads = [threading.Thread(target=sender, args=(ctrl.server_port, seconds, stop)),
+        threading.Thread(target=watchdog, args=(heartbeat, stop), daemon=True)]
+    for thread in threads:
+        thread.start()
+
+    QTimer.singleShot(int(seconds * 1000) + 500, app.quit)
+    app.exec_()
+    stop.set()
+    threads[0].join()
+    ctrl.view_bus.publish('quit')
+    shutil.rmtree(tmp)
+
+    frames = sorted(frames[1:])
+    print('sent %d /pos updates in %.1fs, %d cue edits' % (stop.sent, seconds, edits[0]))
+    print(ctrl.mailbox)
+    print(ctrl.bridge)
+    print('GUI frames: %d (%.1f/sec), median %.1fms, 99th %.1fms, worst %.1fms' % (
+        len(frames), len(frames) / seconds, 1000 * frames[len(frames) // 2],
+        1000 * frames[int(len(frames) * 0.99)], 1000 * frames[-1]))
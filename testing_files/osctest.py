@@ -1,13 +1,16 @@
 #!/usr/local/bin/python3
 
 import sys
-sys.path.append('widgets')
+import os
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
 
 from pythonosc import dispatcher, osc_server, udp_client
 import threading
 
-from painterwidgets import LevelMeter
+from widgets.painterwidgets import LevelMeter
+from controller.meterbank import MeterBank
 from PyQt5.QtWidgets import QApplication
+from PyQt5.QtCore import QTimer
 
 
 
@@ -18,8 +21,10 @@ def quit(addr):
     lm.close()
 
 def db(addr, l, r):
-    global lm
-    lm.set_dbs(l, r)
+    global bank
+    # the meter moves on the next frame tick
+    bank.post(0, 'l', l)
+    bank.post(0, 'r', r)
 
 if __name__ == '__main__':
     dispatcher = dispatcher.Dispatcher()
@@ -37,5 +42,10 @@ if __name__ == '__main__':
 
     app = QApplication(sys.argv)
     lm = LevelMeter()
+    bank = MeterBank([lm])
+    frame_timer = QTimer()
+    frame_timer.setInterval(1000 // 60)
+    frame_timer.timeout.connect(bank.tick)
+    frame_timer.start()
     lm.show()
     sys.exit(app.exec_())
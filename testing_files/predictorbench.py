@@ -0,0 +1,90 @@
+#!/usr/local/bin/python3
+
+"""
+Accuracy and smoothness of the position readouts against the /pos rate.
+
+Simulates a bus playing a 120 second clip: played, paused, fast-forwarded
+and played at half speed, with the playback side reporting its position
+at a given rate, each report a little late. At 60 frames a second,
+compares what the readout would show, holding the last report (as before)
+or with the PositionPredictor, against where the clip really is. Reports
+the mean and worst error in percent and the biggest jump between two
+frames.
+
+USAGE: predictorbench.py [report rates...]
+"""
+
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import random
+from model.cuelist import CueList, Media
+from model.predictor import PositionPredictor
+
+DURATION = 120.0
+FRAME = 1 / 60
+# (from second, speed) of the simulated playback
+SCRIPT = [(0, 1.0), (8, 0.0), (10, 1.0), (14, 8.0), (16, 1.0), (20, 0.5), (26, 1.0)]
+LENGTH = 30.0
+
+def speed_at(t):
+    speed = 0.0
+    for start, script_speed in SCRIPT:
+        if t >= start:
+            speed = script_speed
+    return speed
+
+def run(report_rate, predict):
+    random.seed(1)
+    model = CueList()
+    model.media_info = {0: Media('BLANK', 0), 1: Media('clip', DURATION)}
+    bus_state = model.bus_states[0]
+    bus_state.media_index = 1
+    bus_state.speed = 1.0
+    bus_state.active = True
+    predictor = PositionPredictor(model)
+    predictor.reset(0, 0.0)
+
+    true_pos = 0.0
+    shown = 0.0
+    speed = None
+    next_report = 1 / report_rate
+    in_flight = []
+    errors = []
+    biggest_jump = 0.0
+    t = 0.0
+    while t < LENGTH:
+        t += FRAME
+        # the clip moves on, and the operator's transport commands are known
+        if speed_at(t) != speed:
+            speed = speed_at(t)
+            predictor.set_speed(0, speed, t)
+        true_pos = min(100.0, true_pos + speed * 100 / DURATION * FRAME)
+        if t >= next_report:
+            next_report += 1 / report_rate
+            in_flight.append((t + random.uniform(0.002, 0.02), true_pos))
+        arrived = [report for report in in_flight if report[0] <= t]
+        in_flight = [report for report in in_flight if report[0] > t]
+
+        before = shown
+        for at, pos in arrived:
+            if predict:
+                predictor.report(0, pos, t)
+            else:
+                shown = pos
+        if predict:
+            shown = predictor.tick(t).get(0, shown)
+        biggest_jump = max(biggest_jump, abs(shown - before))
+        errors.append(abs(shown - true_pos))
+    return sum(errors) / len(errors), max(errors), biggest_jump
+
+if __name__ == '__main__':
+    rates = [float(arg) for arg in sys.argv[1:]] or [2, 5, 10, 30]
+    print('%8s %30s %30s' % ('', 'last report', 'predicted'))
+    print('%8s %10s %9s %9s %10s %9s %9s' % ('/pos Hz', 'mean err', 'worst', 'jump',
+        'mean err', 'worst', 'jump'))
+    for rate in rates:
+        held = run(rate, False)
+        predicted = run(rate, True)
+        print('%8g %9.3f%% %8.3f%% %8.3f%% %9.3f%% %8.3f%% %8.3f%%' % (rate, *held, *predicted))
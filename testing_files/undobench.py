@@ -0,0 +1,74 @@
+#!/usr/local/bin/python3
+
+"""
+Memory used by the undo history.
+
+Makes a synthetic cue list of lazy cues, as a loaded show has, runs a mix
+of random edits (rename, insert, replace, move, delete) through CueList
+and reports how much memory the undo history holds, per edit, against
+what keeping a full copy of the list per step would take. The history is
+capped at CueList.max_history_bytes; the run is repeated without the cap
+to show the cost per step.
+
+USAGE: undobench.py [cues] [edits]
+"""
+
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import time
+import random
+import tracemalloc
+from model.cuelist import CueList, Cue
+from model.pseq import PSeq
+
+def run(count, edits, max_history_bytes):
+    random.seed(1)
+    model = CueList()
+    model.cues = PSeq(Cue.lazy(Cue('cue %d' % i).to_csv_row()) for i in range(count))
+    if max_history_bytes is not None:
+        model.max_history_bytes = max_history_bytes
+    new_cues = [Cue('new %d' % i) for i in range(edits)]
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    for i in range(edits):
+        model.goto_cue(random.randrange(len(model.cues)))
+        kind = i % 5
+        if kind == 0:
+            model.rename_current_cue('renamed %d' % i)
+        elif kind == 1:
+            model.add_cue_after_current(new_cues[i])
+        elif kind == 2:
+            model.replace_current_cue(new_cues[i])
+        elif kind == 3:
+            model.move_current_cue(random.randrange(len(model.cues)))
+        else:
+            model.delete_current_cue()
+    elapsed = time.perf_counter() - start
+    used = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return model, used, elapsed
+
+if __name__ == '__main__':
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    edits = int(sys.argv[2]) if len(sys.argv) > 2 else 10000
+
+    model, used, elapsed = run(count, edits, float('inf'))
+    print('%i edits on %i cues: %.1f us/edit' % (edits, count, 1e6 * elapsed / edits))
+    print('uncapped history: %.2f MB (%.0f bytes/edit, estimated %.0f, tree depth %i)' % (
+        used / 1e6, used / edits, model.history_bytes / edits, model.cues.depth()))
+    # a list of pointers per step is what copying the list would cost at the least
+    copies = edits * (56 + 8 * count)
+    print('full copies would be at least %.1f MB' % (copies / 1e6))
+
+    model, used, elapsed = run(count, edits, None)
+    print('capped at %.1f MB: %.2f MB held, %i of %i steps kept' % (
+        model.max_history_bytes / 1e6, used / 1e6, len(model.undo_stack), edits))
+
+    start = time.perf_counter()
+    steps = len(model.undo_stack)
+    while model.can_undo():
+        model.undo()
+    print('undid all %i kept edits in %.1f ms' % (steps, 1000 * (time.perf_counter() - start)))
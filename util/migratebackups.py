@@ -0,0 +1,77 @@
+#!/usr/local/bin/python3
+
+"""
+Moves the old full-copy backups of every show into its backup store.
+
+Each show's backups/*.csv are ingested oldest first (one process per show),
+every one is restored from the store and compared with the original, and
+the disk usage before and after is reported. The original files are only
+deleted with --delete, and only if every backup of that show verified.
+With --prune the retention policy is applied afterwards.
+
+USAGE: migratebackups.py [--delete] [--prune] [data folder]
+"""
+
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from concurrent.futures import ProcessPoolExecutor
+from model.backupstore import BackupStore, stamp_from_name, name_from_stamp
+
+def migrate(show, delete, prune):
+    backups = os.path.join(show, 'backups')
+    files = sorted((name for name in os.listdir(backups) if name.endswith('.csv')),
+        key=stamp_from_name)
+    store = BackupStore(backups, prune_every=None)
+    before = 0
+    ingested = []
+    for file_name in files:
+        path = os.path.join(backups, file_name)
+        with open(path, 'rb') as file:
+            data = file.read()
+        before += os.path.getsize(path)
+        stamp = stamp_from_name(file_name)[0]
+        name = name_from_stamp(stamp)
+        if not store.exists(name): # already ingested by an earlier run
+            name = store.add(data, stamp)
+        ingested.append((path, data, name))
+
+    store.rows = None # verify against what is on disk
+    bad = [path for path, data, name in ingested if store.restore(name) != data]
+    if delete and not bad:
+        for path, data, name in ingested:
+            os.remove(path)
+    pruned = store.prune() if prune else []
+    return show, len(files), before, store.size(), bad, len(pruned)
+
+def human(size):
+    for unit in ['B', 'KB', 'MB', 'GB']:
+        if size < 1024:
+            return '%.1f %s' % (size, unit)
+        size /= 1024
+    return '%.1f TB' % size
+
+if __name__ == '__main__':
+    args = sys.argv[1:]
+    delete = '--delete' in args
+    prune = '--prune' in args
+    args = [arg for arg in args if not arg.startswith('--')]
+    data = args[0] if args else os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data')
+
+    shows = [os.path.join(data, name) for name in sorted(os.listdir(data))
+        if os.path.isdir(os.path.join(data, name, 'backups'))]
+    total_before = 0
+    total_after = 0
+    with ProcessPoolExecutor() as pool:
+        for show, count, before, after, bad, pruned in pool.map(migrate, shows,
+                [delete] * len(shows), [prune] * len(shows)):
+            total_before += before
+            total_after += after
+            print('%-20s %5i backups %10s -> %10s%s%s' % (os.path.basename(show), count,
+                human(before), human(after),
+                ', %i pruned' % pruned if pruned else '',
+                ', %i FAILED TO VERIFY, originals kept' % len(bad) if bad else ''))
+    if total_before:
+        print('%-20s %16s -> %10s (%.1f%% saved)' % ('total', human(total_before),
+            human(total_after), 100 - 100 * total_after / total_before))
@@ -29,6 +29,7 @@ class BusWidget(QWidget, Publisher):
         self.role = 'view'
 
         self.letter = letter
+        self.shown = None
         self.initUI()
         self.set_active(False)
 
@@ -156,11 +157,16 @@ class BusWidget(QWidget, Publisher):
                 thing.hide()
 
     def set_values(self, bus):
-        self.media.setValue(bus.media_index)
-        self.position.setValue(bus.pos)
-        self.speed.setValue(None if bus.speed is None else (bus.speed, bus.ramp_time))
-        self.zoom.setValue(bus.zoom)
-        self.volume.setValue(bus.db)
+        # buses read from a show are shared, so stepping between cues that
+        # leave this bus alone is usually the same object
+        if bus is self.shown and not self.edited():
+            return
+        self.media.apply(bus.media_index)
+        self.position.apply(bus.pos)
+        self.speed.apply(None if bus.speed is None else (bus.speed, bus.ramp_time))
+        self.zoom.apply(bus.zoom)
+        self.volume.apply(bus.db)
+        self.shown = bus
 
     def rw(self):
         self.changed('rw', ord(self.letter) - 65)
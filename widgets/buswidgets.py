@@ -31,12 +31,27 @@ class BusCueComponent(QWidget, Publisher):
 
         self.edited = False
         self.cue_num = None
+        # the value last given to apply, and whether one is being applied
+        self.shown = None
+        self.applying = False
         self.default_bg = QColor('transparent')
         self.edited_bg = QColor(255, 200, 200)
         self.setAutoFillBackground(True)
 
     def numStateChanged(self):
-        self.setEdited(self.getValue() != self.cue_num)
+        if not self.applying:
+            self.setEdited(self.getValue() != self.cue_num)
+
+    def apply(self, value):
+        # shows a cue's value; the widgets are left alone if they already
+        # show it, and the inner widgets' changes are not each checked
+        # against the cue on the way
+        if value == self.shown and not self.edited:
+            return
+        self.applying = True
+        self.setValue(value)
+        self.applying = False
+        self.shown = value
 
     def setEdited(self, edited):
         if edited == self.edited:
@@ -109,7 +124,7 @@ class CurrentPosWidget(BusCueComponent):
     def setValue(self, value):
         self.value = value;
         if not self.locked:
-            self.pos_slider.setValue(value)
+            self.pos_slider.setValue(round(value))
         self.pos_label.setText('%s%%' % str(round(value, 2)))
 
     def setMedia(self, media_name):
@@ -494,7 +509,7 @@ class CueVolumeWidget(BusCueComponent):
         else:
             self.setChecked(True)
             self.db_num.setValue(value)
-            self.db_slider.setValue(value)
+            self.db_slider.setValue(round(value))
 
         self.cue_num = self.getValue()
         self.setEdited(False)
@@ -520,7 +535,7 @@ class CueVolumeWidget(BusCueComponent):
         super().numStateChanged()
 
     def numStateChanged(self):
-        self.db_slider.setValue(self.db_num.value)
+        self.db_slider.setValue(round(self.db_num.value))
         super().numStateChanged()
 
     def sliderStateChanged(self):
@@ -534,7 +549,7 @@ class AudioMatrixWidget(QWidget, Publisher):
         self.role = 'view'
 
         self.edited = False
-        self.cue_matrix = make_2d_list(5, 6, False)
+        self.cue_routing = AudioRouting()
         self.default_bg = QColor('transparent')
         self.edited_bg = QColor(255, 200, 200)
         self.setAutoFillBackground(True)
@@ -568,13 +583,19 @@ class AudioMatrixWidget(QWidget, Publisher):
         self.setLayout(grid)
 
     def set_cue_routing(self, routing):
-        self.cue_matrix = routing.matrix_state
+        # only the boxes that differ are set, with their signals blocked, so
+        # the routing is compared with the cue's once rather than per box
+        if routing == self.cue_routing and not self.edited:
+            return
+        shown = self.as_audio_routing()
+        self.cue_routing = routing
+        for i, j in routing.diff(shown).cells():
+            checkbox = self.matrix[i][j]
+            checkbox.blockSignals(True)
+            checkbox.setChecked(routing.at(i, j))
+            checkbox.blockSignals(False)
         self.setEdited(False)
 
-        for i, row in enumerate(self.matrix):
-            for j, checkbox in enumerate(row):
-                checkbox.setChecked(routing.at(i, j))
-
     def getValue(self):
         temp = make_2d_list(5, 6, False)
         for i, row in enumerate(self.matrix):
@@ -587,7 +608,7 @@ class AudioMatrixWidget(QWidget, Publisher):
         return AudioRouting(self.getValue())
 
     def matrixStateChanged(self):
-        self.setEdited(self.getValue() != self.cue_matrix)
+        self.setEdited(self.as_audio_routing() != self.cue_routing)
 
     def setEdited(self, edited):
         if edited == self.edited:
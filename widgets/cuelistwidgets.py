@@ -1,6 +1,7 @@
 """
 Custom widgets for top panel
 
+- CueListModel
 - CueListWidget
 - CueButtonsLayout
 - CueMidpanelLayout
@@ -13,9 +14,65 @@ from widgets.fonts import UIFonts
 from widgets.littlewidgets import QNumberBox
 from PyQt5.QtWidgets import (QListView, QVBoxLayout, QHBoxLayout, QPushButton,
     QLabel, QSlider, QTextEdit, QAbstractItemView)
-from PyQt5.QtGui import QStandardItemModel, QStandardItem, QColor, QPalette
-from PyQt5.QtCore import Qt
+from PyQt5.QtGui import QColor, QPalette
+from PyQt5.QtCore import Qt, QAbstractListModel, QModelIndex
 from common.publisher import Publisher
+import time
+
+class CueListModel(QAbstractListModel):
+    # Shows the names of a sequence of cues. The cue list hands over each
+    # new version of its (immutable) sequence along with what changed, so
+    # every edit is one begin/end pair rather than a rebuild.
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.cues = ()
+        self.rename = None
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.cues)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole or role == Qt.EditRole:
+            return self.cues[index.row()].name
+        return None
+
+    def flags(self, index):
+        return Qt.ItemIsEnabled | Qt.ItemIsSelectable | Qt.ItemIsEditable
+
+    def setData(self, index, value, role=Qt.EditRole):
+        # the new name goes to the controller; it comes back as a rename
+        if role == Qt.EditRole and self.rename is not None:
+            self.rename(value)
+            return True
+        return False
+
+    def set_cues(self, cues):
+        self.beginResetModel()
+        self.cues = cues
+        self.endResetModel()
+
+    def insert_cue(self, index, cues):
+        self.beginInsertRows(QModelIndex(), index, index)
+        self.cues = cues
+        self.endInsertRows()
+
+    def remove_cue(self, index, cues):
+        self.beginRemoveRows(QModelIndex(), index, index)
+        self.cues = cues
+        self.endRemoveRows()
+
+    def move_cue(self, old_index, index, cues):
+        # Qt wants the row to move in front of, counted before the move
+        if self.beginMoveRows(QModelIndex(), old_index, old_index, QModelIndex(),
+                index + 1 if index > old_index else index):
+            self.cues = cues
+            self.endMoveRows()
+        else:
+            self.cues = cues
+
+    def set_cue(self, index, cues):
+        self.cues = cues
+        self.dataChanged.emit(self.index(index), self.index(index))
 
 class CueListWidget(QListView, Publisher):
     def __init__(self):
@@ -26,27 +83,42 @@ class CueListWidget(QListView, Publisher):
 
     def initUI(self):
         self.setMinimumWidth(150)
-        self.item_model = QStandardItemModel(self)
-        self.setModel(self.item_model)
+        self.setUniformItemSizes(True)
+        self.list_model = CueListModel(self)
+        self.list_model.rename = lambda name: self.changed('cue_name', name)
+        self.setModel(self.list_model)
         self.setFont(UIFonts.cuelist_font)
-        self.set_cues([''])
         self.selectionModel().currentChanged.connect(self.update_cue_pointer)
-        self.itemDelegate().closeEditor.connect(self.name_changed)
         self.lock = False
         self.pressed = False
 
+    # cues is always the cue list's sequence after the change
     def set_cues(self, cues):
-        self.cues = cues
-        self.item_model.clear()
+        self.lock = True
+        self.list_model.set_cues(cues)
+        self.lock = False
+
+    def insert_cue(self, index, cues):
+        self.lock = True
+        self.list_model.insert_cue(index, cues)
+        self.lock = False
+
+    def remove_cue(self, index, cues):
+        self.lock = True
+        self.list_model.remove_cue(index, cues)
+        self.lock = False
+
+    def move_cue(self, old_index, index, cues):
+        self.lock = True
+        self.list_model.move_cue(old_index, index, cues)
+        self.lock = False
 
-        for cue in self.cues:
-            item = QStandardItem(cue)
-            self.item_model.appendRow(item)
+    def set_cue_name(self, index, cues):
+        self.list_model.set_cue(index, cues)
 
     def set_current_cue(self, index):
         self.lock = True
-        index = self.item_model.index(index, 0)
-        self.setCurrentIndex(index)
+        self.setCurrentIndex(self.list_model.index(index))
         self.lock = False
 
     def mouseMoveEvent(self, event):
@@ -65,12 +137,6 @@ class CueListWidget(QListView, Publisher):
         else:
             self.changed('cue_pointer', self.currentIndex().row())
 
-    def name_changed(self):
-        index = self.currentIndex().row()
-        item = self.item_model.item(index, 0)
-        name = item.text()
-        self.changed('cue_name', name)
-
 class CueButtonsLayout(QVBoxLayout, Publisher):
     def __init__(self):
         QVBoxLayout.__init__(self)
@@ -218,7 +284,7 @@ class CueMidpanelLayout(QVBoxLayout, Publisher):
         self.rwff_slider.valueChanged.connect(self.sliderStateChanged)
 
     def go_clicked(self):
-        self.changed('go')
+        self.changed('go', time.perf_counter())
 
     def ff_clicked(self):
         self.changed('ff_all')
@@ -233,7 +299,7 @@ class CueMidpanelLayout(QVBoxLayout, Publisher):
         self.changed('pause_all')
 
     def numStateChanged(self):
-        self.rwff_slider.setValue(self.rwff_num.value)
+        self.rwff_slider.setValue(round(self.rwff_num.value))
         self.changed('rwff_speed', self.rwff_num.value)
 
     def sliderStateChanged(self):
@@ -241,7 +307,7 @@ class CueMidpanelLayout(QVBoxLayout, Publisher):
         self.changed('rwff_speed', self.rwff_num.value)
 
     def set_rwff_speed(self, speed):
-        self.rwff_slider.setValue(speed)
+        self.rwff_slider.setValue(round(speed))
         self.rwff_num.setValue(speed)
 
 class CueNotesWidget(QTextEdit, Publisher):
@@ -265,6 +331,8 @@ class CueNotesWidget(QTextEdit, Publisher):
         self.setEdited(str(self.toPlainText()) != self.cue_text)
 
     def setPlainText(self, text):
+        if text == self.cue_text and not self.edited:
+            return
         self.cue_text = text
         QTextEdit.setPlainText(self, text)
         self.setEdited(False)
@@ -2,6 +2,8 @@
 Custom compound widgets for TWG video cueing main window
 
 - MainWidget
+- SettingsDialog
+- ShowSwitcher
 - MainWindow
 
 Author: Eric Sluyter
@@ -20,6 +22,8 @@ from PyQt5.QtGui import QFont, QIcon
 from common.publisher import Publisher
 from widgets.fonts import UIFonts
 from os.path import expanduser
+from PyQt5.QtCore import Qt
+import time
 
 
 class MainWidget(QWidget, Publisher):
@@ -27,6 +31,7 @@ class MainWidget(QWidget, Publisher):
         QWidget.__init__(self)
         Publisher.__init__(self)
         self.role = 'view'
+        self.applying = False
         self.initUI()
 
     def initUI(self):
@@ -77,7 +82,7 @@ class MainWidget(QWidget, Publisher):
         return edited
 
     def view_update(self, what, etc):
-        if what == 'edited':
+        if what == 'edited' and not self.applying:
             self.changed('edited')
         if what == 'preset':
             self.changed('preset', etc)
@@ -96,8 +101,24 @@ class MainWidget(QWidget, Publisher):
         if what == 'current_matrix':
             self.changed('current_matrix', etc)
 
+    def set_cue(self, cue):
+        # Only the widgets whose values differ from the cue's are touched,
+        # and 'edited' goes out once at the end rather than from every
+        # widget that stops being edited on the way.
+        self.applying = True
+        try:
+            self.set_cue_name(cue.name)
+            self.set_notes(cue.notes)
+            for bus_widget, bus in zip(self.buses, cue.buses):
+                bus_widget.set_values(bus)
+            self.sound.set_cue_routing(cue.audio_routing)
+        finally:
+            self.applying = False
+        self.changed('edited')
+
     def set_cue_name(self, name):
-        self.midpanel.cue_name.setText(name)
+        if name != self.midpanel.cue_name.text():
+            self.midpanel.cue_name.setText(name)
 
     def set_notes(self, notes):
         self.notes.setPlainText(notes)
@@ -191,6 +212,77 @@ class SettingsDialog(QDialog):
 
 
 
+class ShowSwitcher(QDialog):
+    def __init__(self, parent, shows, current=None):
+        super().__init__(parent)
+        self.shows = shows
+        self.initUI(current)
+
+    def initUI(self, current):
+        self.setWindowTitle('Switch Show')
+        vbox = QVBoxLayout()
+
+        self.filter = QLineEdit()
+        self.filter.setPlaceholderText('Type to filter')
+        self.filter.textChanged.connect(self.apply_filter)
+        vbox.addWidget(self.filter)
+
+        self.table = QTableWidget(len(self.shows), 5)
+        self.table.setHorizontalHeaderLabels(['Show', 'Cues', 'Media', 'Modified', 'Last fired'])
+        self.table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeToContents)
+        self.table.horizontalHeader().setStretchLastSection(True)
+        self.table.verticalHeader().hide()
+        self.table.setSelectionBehavior(QTableWidget.SelectRows)
+        self.table.setSelectionMode(QTableWidget.SingleSelection)
+        self.table.setEditTriggers(QTableWidget.NoEditTriggers)
+        for row, show in enumerate(self.shows):
+            last_fired = show.get('last_fired')
+            values = [show['name'], str(show['cues']), str(show['media']),
+                time.strftime('%Y-%m-%d %H:%M', time.localtime(show['modified'])),
+                '' if last_fired is None else '%i: %s' % (last_fired[0] + 1, last_fired[1])]
+            for col, value in enumerate(values):
+                self.table.setItem(row, col, QTableWidgetItem(value))
+            if show['path'] == current:
+                self.table.selectRow(row)
+        if self.table.currentRow() < 0 and self.shows:
+            self.table.selectRow(0)
+        self.table.cellDoubleClicked.connect(self.accept)
+        vbox.addWidget(self.table)
+
+        buttons = QDialogButtonBox(QDialogButtonBox.Open | QDialogButtonBox.Cancel)
+        buttons.accepted.connect(self.accept)
+        buttons.rejected.connect(self.reject)
+        vbox.addWidget(buttons)
+
+        self.setLayout(vbox)
+        self.resize(600, 400)
+        self.filter.setFocus()
+
+    def apply_filter(self, text):
+        first = None
+        for row, show in enumerate(self.shows):
+            hidden = text.lower() not in show['name'].lower()
+            self.table.setRowHidden(row, hidden)
+            if not hidden and first is None:
+                first = row
+        if first is not None:
+            self.table.selectRow(first)
+
+    def keyPressEvent(self, event):
+        # up and down move through the list while typing in the filter
+        if event.key() in (Qt.Key_Up, Qt.Key_Down):
+            self.table.keyPressEvent(event)
+        else:
+            super().keyPressEvent(event)
+
+    def get_path(self):
+        row = self.table.currentRow()
+        if row < 0 or self.table.isRowHidden(row):
+            return None
+        return self.shows[row]['path']
+
+
+
 class MainWindow(QMainWindow, Publisher):
 
     def __init__(self):
@@ -213,6 +305,10 @@ class MainWindow(QMainWindow, Publisher):
         open.triggered.connect(self.open)
         open.setShortcut('Ctrl+O')
 
+        switch = QAction('S&witch Show...', self)
+        switch.triggered.connect(self.switch_show)
+        switch.setShortcut('Shift+Ctrl+O')
+
         refresh = QAction(QIcon('icons/refresh.png'), '&Refresh Cue List', self)
         refresh.triggered.connect(self.refresh)
         refresh.setShortcut('Ctrl+R')
@@ -253,6 +349,14 @@ class MainWindow(QMainWindow, Publisher):
         close.triggered.connect(self.close)
         close.setShortcut('Ctrl+W')
 
+        self.undo_action = QAction('&Undo', self)
+        self.undo_action.triggered.connect(self.undo)
+        self.undo_action.setShortcut('Ctrl+Z')
+
+        self.redo_action = QAction('&Redo', self)
+        self.redo_action.triggered.connect(self.redo)
+        self.redo_action.setShortcut('Shift+Ctrl+Z')
+
         update_fire = QAction('&Update And Fire', self)
         update_fire.triggered.connect(self.update_fire)
         update_fire.setShortcut('Ctrl+G')
@@ -265,6 +369,10 @@ class MainWindow(QMainWindow, Publisher):
         go.triggered.connect(self.go)
         go.setShortcut('Ctrl+Shift+Space')
 
+        self.fire_tracked_action = QAction('&Fire As Tracked State', self)
+        self.fire_tracked_action.setCheckable(True)
+        self.fire_tracked_action.toggled.connect(self.fire_tracked)
+
         settings = QAction(QIcon('icons/open-window-with-gear-sign.png'), '&Cue List Settings...', self)
         settings.triggered.connect(self.settings)
         settings.setShortcut('Ctrl+,')
@@ -273,6 +381,7 @@ class MainWindow(QMainWindow, Publisher):
         fileMenu = menubar.addMenu('&File')
         fileMenu.addAction(new)
         fileMenu.addAction(open)
+        fileMenu.addAction(switch)
         #fileMenu.addAction(refresh)
         fileMenu.addSeparator()
         fileMenu.addAction(save)
@@ -282,6 +391,10 @@ class MainWindow(QMainWindow, Publisher):
         fileMenu.addSeparator()
         fileMenu.addAction(close)
 
+        editMenu = menubar.addMenu('&Edit')
+        editMenu.addAction(self.undo_action)
+        editMenu.addAction(self.redo_action)
+
         cueMenu = menubar.addMenu('&Cue')
         cueMenu.addAction(move_up)
         cueMenu.addAction(move_down)
@@ -294,6 +407,7 @@ class MainWindow(QMainWindow, Publisher):
         cueMenu.addSeparator()
         cueMenu.addAction(update_fire)
         cueMenu.addAction(go)
+        cueMenu.addAction(self.fire_tracked_action)
 
         toolbar = self.addToolBar('Util')
         toolbar.addAction(new)
@@ -330,6 +444,17 @@ class MainWindow(QMainWindow, Publisher):
             if filename != '':
                 self.changed('open', filename)
 
+    def switch_show(self):
+        if self.confirm_close():
+            self.changed('switch_show')
+
+    def show_switcher(self, shows, current=None):
+        dialog = ShowSwitcher(self, shows, current)
+        if dialog.exec_():
+            path = dialog.get_path()
+            if path is not None:
+                self.changed('open', path)
+
     def refresh(self):
         return None
 
@@ -360,8 +485,21 @@ class MainWindow(QMainWindow, Publisher):
     def delete(self):
         self.changed('delete_current')
 
+    def undo(self):
+        self.changed('undo')
+
+    def redo(self):
+        self.changed('redo')
+
+    def set_history(self, can_undo, can_redo):
+        self.undo_action.setEnabled(can_undo)
+        self.redo_action.setEnabled(can_redo)
+
     def go(self):
-        self.changed('go')
+        self.changed('go', time.perf_counter())
+
+    def fire_tracked(self, checked):
+        self.changed('fire_tracked', checked)
 
     def settings(self):
         self.changed('settings')
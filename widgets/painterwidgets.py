@@ -3,56 +3,90 @@ Custom painter widgets for TWG video cueing
 
 - LevelMeter
 
+A LevelMeter shows the left and right channels of a MeterBank (see
+controller/meterbank.py), which refreshes it once per frame. The bar is
+a gradient rendered once into a pixmap for the meter's size, and a paint
+copies the lit part of it for each channel, plus a slice for the peak
+line.
+
 Author: Eric Sluyter
 Last edited: July 2018
 """
 
-import math
 from PyQt5.QtWidgets import QWidget
-from PyQt5.QtGui import QPainter, QPen, QColor, QBrush
-from PyQt5.QtCore import QPoint, QSize, QRect
+from PyQt5.QtGui import QPainter, QPixmap, QColor, QLinearGradient
+from PyQt5.QtCore import Qt
+
+FLOOR = -60.0
+CEILING = 10.0
+PEAK_LINE = 2
+# (dB, colour) stops of the bar, bottom to top
+GRADIENT = [(-60, QColor(0, 200, 100)), (-12, QColor(0, 200, 100)),
+    (-6, QColor(230, 210, 0)), (0, QColor(240, 120, 0)), (10, QColor(230, 0, 0))]
 
 
 class LevelMeter(QWidget):
     def __init__(self):
         super().__init__()
-        self.pen = QPen(QColor(0, 0, 0, 0))
-        self.pen.setWidth(0)
-        self.left_db = -60
-        self.right_db = -60
+        self.channels = None
         self.gap = 5
+        # bar and peak heights in pixels of each channel, as last painted
+        self.heights = (0, 0, 0, 0)
+        self.bar = None
 
-    def set_dbs(self, l, r):
-        if self.left_db != l or self.right_db != r:
-            self.left_db = l
-            self.right_db = r
-            self.update()
-
-    def set_left_db(self, db):
-        if self.left_db != db:
-            self.left_db = db
-            self.update()
-
-    def set_right_db(self, db):
-        if self.right_db != db:
-            self.right_db = db
-            self.update()
+    def set_channels(self, left, right):
+        self.channels = (left, right)
 
     def set_gap(self, gap):
         self.gap = gap
+        self.bar = None
 
-    def paintEvent(self, event):
-        painter = QPainter(self)
-        painter.setPen(self.pen)
+    def to_pixels(self, db):
+        height = self.height()
+        return max(0, min(height, int((db - FLOOR) / (CEILING - FLOOR) * height)))
+
+    def refresh(self):
+        # called by the MeterBank on every frame tick
+        if self.channels is None:
+            return
+        left, right = self.channels
+        heights = (self.to_pixels(left.level), self.to_pixels(left.peak),
+            self.to_pixels(right.level), self.to_pixels(right.peak))
+        if heights != self.heights:
+            self.heights = heights
+            self.update()
 
-        left_height = ((self.left_db + 60) / 70) * self.height()
-        right_height = ((self.right_db + 60) / 70) * self.height()
+    def resizeEvent(self, event):
+        self.bar = None
+        self.heights = (0, 0, 0, 0)
+        self.refresh()
 
-        left = QRect(QPoint(0, self.height() - left_height),
-            QSize((self.width() - self.gap) / 2, left_height))
-        right = QRect(QPoint((self.width() + self.gap) / 2, self.height() - right_height),
-            QSize((self.width() - self.gap) / 2, right_height))
+    def render_bar(self):
+        width = max(1, (self.width() - self.gap) // 2)
+        height = max(1, self.height())
+        bar = QPixmap(width, height)
+        bar.fill(Qt.transparent)
+        gradient = QLinearGradient(0, height, 0, 0)
+        for db, colour in GRADIENT:
+            gradient.setColorAt((db - FLOOR) / (CEILING - FLOOR), colour)
+        painter = QPainter(bar)
+        painter.fillRect(0, 0, width, height, gradient)
+        painter.end()
+        return bar
 
-        painter.setBrush(QBrush(QColor(0, 200, 100, 255)))
-        painter.drawRect(left)
-        painter.drawRect(right)
+    def paintEvent(self, event):
+        if self.channels is None:
+            return
+        if self.bar is None:
+            self.bar = self.render_bar()
+        painter = QPainter(self)
+        width = self.bar.width()
+        height = self.height()
+        left_level, left_peak, right_level, right_peak = self.heights
+        for x, level, peak in ((0, left_level, left_peak),
+                (self.width() - width, right_level, right_peak)):
+            if level > 0:
+                painter.drawPixmap(x, height - level, self.bar, 0, height - level, width, level)
+            if peak > level:
+                top = height - peak
+                painter.drawPixmap(x, top, self.bar, 0, top, width, min(PEAK_LINE, peak))